@@ -13,6 +13,7 @@
 from src.utility.loader.Front3DLoader import Front3DLoader
 from src.utility.sampler.Front3DPointInRoomSampler import Front3DPointInRoomSampler
 from src.utility.MeshObjectUtility import MeshObject
+from src.utility.BVHUtility import TriangleBVH
 from src.utility.MathUtility import MathUtility
 from src.utility.camera.CameraValidation import CameraValidation
 from src.utility.CameraUtility import CameraUtility
@@ -53,8 +54,9 @@
 # Init sampler for sampling locations inside the loaded front3D house
 point_sampler = Front3DPointInRoomSampler(loaded_objects)
 
-# Init bvh tree containing all mesh objects
-bvh_tree = MeshObject.create_bvh_tree_multi_objects([o for o in loaded_objects if isinstance(o, MeshObject)])
+# Init bvh trees containing all mesh objects, they allow to cast all rays of a camera pose at once
+bvh_tree = TriangleBVH.from_mesh_objects([o for o in loaded_objects if isinstance(o, MeshObject)])
+scene_bvh = TriangleBVH.from_scene()
 
 poses = 0
 tries = 0
@@ -81,7 +83,7 @@ def check_name(name):
 
     # Check that obstacles are at least 1 meter away from the camera and have an average distance between 2.5 and 3.5
     # meters and make sure that no background is visible, finally make sure the view is interesting enough
-    if CameraValidation.scene_coverage_score(cam2world_matrix, special_objects, special_objects_weight=10.0) > 0.8 \
+    if CameraValidation.scene_coverage_score(cam2world_matrix, special_objects, special_objects_weight=10.0, scene_bvh=scene_bvh) > 0.8 \
             and CameraValidation.perform_obstacle_in_view_check(cam2world_matrix, proximity_checks, bvh_tree):
         CameraUtility.add_camera_pose(cam2world_matrix)
         poses += 1
@@ -16,17 +16,25 @@
 # NOTE: requires/calls Khaled Mamou's VHACD executable found here: https://github.com/kmammou/v-hacd/
 # We specifically asked for the permission to use this inside BlenderProc. All rights are still with Khaled Mamou.
 
+import hashlib
+import io
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen
 from sys import platform
+from typing import List
 
 import git
+import numpy as np
 
+from src.utility.FileLock import FileLock
 from src.utility.Utility import Utility
 import bpy
 from mathutils import Matrix
 import bmesh
-from subprocess import Popen
-import shutil
+
 
 def convex_decomposition(ob, temp_dir, resolution=1000000, name_template="?_hull_#", remove_doubles=True, apply_modifiers=True, apply_transforms="NONE", depth=20, concavity=0.0025, plane_downsampling=4, convexhull_downsampling=4, alpha=0.05, beta=0.05, gamma=0.00125, pca=False, mode="VOXEL", max_num_vertices_per_ch=32, min_volume_per_ch=0.0001, cache_dir=None):
     """ Uses V-HACD to decompose the given object.
@@ -52,10 +60,92 @@ def convex_decomposition(ob, temp_dir, resolution=1000000, name_template="?_hull
     :param cache_dir: If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped.
     :return: The list of convex parts composing the given object.
     """
+    return convex_decompositions([ob], temp_dir, num_processes=1, resolution=resolution, name_template=name_template, remove_doubles=remove_doubles, apply_modifiers=apply_modifiers, apply_transforms=apply_transforms,
+                                 depth=depth, concavity=concavity, plane_downsampling=plane_downsampling, convexhull_downsampling=convexhull_downsampling, alpha=alpha, beta=beta, gamma=gamma, pca=pca, mode=mode,
+                                 max_num_vertices_per_ch=max_num_vertices_per_ch, min_volume_per_ch=min_volume_per_ch, cache_dir=cache_dir)[0]
+
+
+def convex_decompositions(objects, temp_dir, num_processes=None, resolution=1000000, name_template="?_hull_#", remove_doubles=True, apply_modifiers=True, apply_transforms="NONE", depth=20, concavity=0.0025, plane_downsampling=4, convexhull_downsampling=4, alpha=0.05, beta=0.05, gamma=0.00125, pca=False, mode="VOXEL", max_num_vertices_per_ch=32, min_volume_per_ch=0.0001, cache_dir=None) -> List[list]:
+    """ Uses V-HACD to decompose all given objects, while running up to `num_processes` V-HACD processes in parallel.
+
+    The meshes are prepared and the convex parts are imported in the main thread, as blender is not thread safe.
+    Only the V-HACD processes run in parallel, each with its own input and output files.
+
+    The cache is content addressed: A decomposition is stored under the hash of the V-HACD input file and the V-HACD
+    parameters, so it does not depend on the object name or pose. Every cache entry is computed under a file lock and
+    is moved into place atomically, so multiple processes can share one cache dir without computing the same
+    decomposition twice or reading half written files.
+
+    :param objects: The list of blender objects to decompose.
+    :param temp_dir: The temp directory where to store the convex parts.
+    :param num_processes: The maximum number of V-HACD processes which run in parallel. Per default, the number of cpus is used.
+    :param resolution: maximum number of voxels generated during the voxelization stage
+    :param name_template: The template how to name the convex parts.
+    :param remove_doubles: Remove double vertices before decomposition.
+    :param apply_modifiers: Apply modifiers before decomposition.
+    :param apply_transforms: Apply transforms before decomposition.
+    :param depth: maximum number of clipping stages. During each split stage, all the model parts (with a concavity higher than the user defined threshold) are clipped according the "best" clipping plane
+    :param concavity: maximum concavity
+    :param plane_downsampling: controls the granularity of the search for the "best" clipping plane
+    :param convexhull_downsampling: controls the precision of the convex-hull generation process during the clipping plane selection stage
+    :param alpha: controls the bias toward clipping along symmetry planes
+    :param beta: controls the bias toward clipping along revolution axes
+    :param gamma: maximum allowed concavity during the merge stage
+    :param pca: enable/disable normalizing the mesh before applying the convex decomposition
+    :param mode: 0: voxel-based approximate convex decomposition, 1: tetrahedron-based approximate convex decomposition
+    :param max_num_vertices_per_ch: controls the maximum number of triangles per convex-hull
+    :param min_volume_per_ch: controls the adaptive sampling of the generated convex-hulls
+    :param cache_dir: If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped.
+    :return: For every given object the list of convex parts composing it.
+    """
     if platform != "linux" and platform != "linux2":
         raise Exception("Convex decomposition is at the moment only available on linux.")
 
-    # Download v-hacd library if necessary
+    vhacd_binary = _get_vhacd_binary()
+    vhacd_args = ["--resolution", str(resolution), "--depth", str(depth),
+                  "--concavity", "{:g}".format(concavity), "--planeDownsampling", str(plane_downsampling), "--convexhullDownsampling", str(convexhull_downsampling),
+                  "--alpha", "{:g}".format(alpha), "--beta", "{:g}".format(beta), "--gamma", "{:g}".format(gamma), "--pca", "{:b}".format(pca), "--mode", "{:b}".format(mode == 'TETRAHEDRON'),
+                  "--maxNumVerticesPerCH", str(max_num_vertices_per_ch), "--minVolumePerCH", "{:g}".format(min_volume_per_ch)]
+
+    # Every call gets its own directory, s.t. parallel calls with the same temp dir do not overwrite each others files
+    os.makedirs(temp_dir, exist_ok=True)
+    call_temp_dir = tempfile.mkdtemp(prefix="vhacd_", dir=temp_dir)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    try:
+        # Prepare the V-HACD inputs of all objects in the main thread
+        mesh_hashes, post_matrices, off_files = [], [], {}
+        for ob in objects:
+            off_content, post_matrix = _prepare_vhacd_input(ob, remove_doubles, apply_modifiers, apply_transforms)
+            # Identical meshes with identical parameters lead to the same decomposition, so they share one hash
+            mesh_hash = hashlib.sha256(off_content + " ".join(vhacd_args).encode()).hexdigest()
+            mesh_hashes.append(mesh_hash)
+            post_matrices.append(post_matrix)
+            off_files.setdefault(mesh_hash, off_content)
+
+        # Run V-HACD for all distinct meshes in parallel
+        with ThreadPoolExecutor(max_workers=max(num_processes or os.cpu_count() or 1, 1)) as executor:
+            futures = {mesh_hash: executor.submit(_decompose_cached, vhacd_binary, vhacd_args, off_content, mesh_hash, call_temp_dir, cache_dir)
+                       for mesh_hash, off_content in off_files.items()}
+            decomposition_files = {mesh_hash: future.result() for mesh_hash, future in futures.items()}
+
+        # Import the convex parts in the main thread
+        all_parts = []
+        for ob, mesh_hash, post_matrix in zip(objects, mesh_hashes, post_matrices):
+            if decomposition_files[mesh_hash] is None:
+                raise Exception("No output produced by convex decomposition of object " + ob.name)
+            all_parts.append(_import_convex_parts(ob, decomposition_files[mesh_hash], post_matrix, name_template))
+    finally:
+        shutil.rmtree(call_temp_dir, ignore_errors=True)
+    return all_parts
+
+
+def _get_vhacd_binary():
+    """ Returns the path to the V-HACD binary, which is downloaded and build, if necessary.
+
+    :return: The path to the binary.
+    """
     vhacd_path = Utility.resolve_path("external/vhacd")
     if not os.path.exists(os.path.join(vhacd_path, "v-hacd")):
         print("Downloading v-hacd library into " + str(vhacd_path))
@@ -63,13 +153,19 @@ def convex_decomposition(ob, temp_dir, resolution=1000000, name_template="?_hull
 
         print("Building v-hacd")
         os.system(os.path.join(vhacd_path, "build_linux.sh"))
+    return os.path.join(vhacd_path, "v-hacd", 'bin', "test", "testVHACD")
 
-    off_filename = os.path.join(temp_dir, 'vhacd.off')
-    outFileName = os.path.join(temp_dir, 'vhacd.wrl')
-    logFileName = os.path.join(temp_dir, 'vhacd_log.txt')
 
+def _prepare_vhacd_input(ob, remove_doubles, apply_modifiers, apply_transforms):
+    """ Builds the triangulated mesh of the given object, which is handed to V-HACD.
+
+    :param ob: The blender object to decompose.
+    :param remove_doubles: Remove double vertices before decomposition.
+    :param apply_modifiers: Apply modifiers before decomposition.
+    :param apply_transforms: Apply transforms before decomposition.
+    :return: The content of the .off file and the matrix, which has to be applied to the convex parts afterwards.
+    """
     # Apply modifiers
-    bpy.ops.object.select_all(action='DESELECT')
     if apply_modifiers:
         mesh = ob.evaluated_get(bpy.context.evaluated_depsgraph_get()).data.copy()
     else:
@@ -104,46 +200,80 @@ def convex_decomposition(ob, temp_dir, resolution=1000000, name_template="?_hull
     bm.to_mesh(mesh)
     bm.free()
 
-    # Build a hash for the given mesh
-    mesh_hash = 0
-    for vert in mesh.vertices:
-        # Combine the hashes of the local coordinates of all vertices
-        mesh_hash = hash((mesh_hash, hash(vert.co[:])))
-
-    if cache_dir is None or not os.path.exists(os.path.join(cache_dir, str(mesh_hash) + ".wrl")):
-        vhacd_binary = os.path.join(vhacd_path, "v-hacd", 'bin', "test", "testVHACD")
-
-        # Run V-HACD
-        print('\nExporting mesh for V-HACD: {}...'.format(off_filename))
-        off_export(mesh, off_filename)
-        bpy.data.meshes.remove(mesh)
-        cmd_line = ('"{}" --input "{}" --resolution {} --depth {} '
-                    '--concavity {:g} --planeDownsampling {} --convexhullDownsampling {} '
-                    '--alpha {:g} --beta {:g} --gamma {:g} --pca {:b} --mode {:b} '
-                    '--maxNumVerticesPerCH {} --minVolumePerCH {:g} --output "{}" --log "{}"').format(
-            vhacd_binary, off_filename, resolution, depth,
-            concavity, plane_downsampling, convexhull_downsampling,
-            alpha, beta, gamma, pca, mode == 'TETRAHEDRON',
-            max_num_vertices_per_ch, min_volume_per_ch, outFileName, logFileName)
-
-        print('Running V-HACD...\n{}\n'.format(cmd_line))
-        vhacd_process = Popen(cmd_line, bufsize=-1, close_fds=True, shell=True)
-        vhacd_process.wait()
-
-        # Import convex parts
-        if not os.path.exists(outFileName):
-            raise Exception("No output produced by convex decomposition of object " + ob.name)
-
-        if cache_dir is not None:
-            # Create cache dir, if it not exists yet
-            if not os.path.exists(cache_dir):
-                os.makedirs(cache_dir, exist_ok=True)
-            # Copy decomposition into cache dir
-            shutil.copyfile(outFileName, os.path.join(cache_dir, str(mesh_hash) + ".wrl"))
-    else:
-        outFileName = os.path.join(cache_dir, str(mesh_hash) + ".wrl")
+    off_content = off_to_bytes(mesh)
+    bpy.data.meshes.remove(mesh)
+    return off_content, post_matrix
+
+
+def _decompose_cached(vhacd_binary, vhacd_args, off_content, mesh_hash, temp_dir, cache_dir):
+    """ Returns the decomposition of the given mesh from the cache or computes it via V-HACD.
+
+    This function does not use blender, so it can run in parallel to other calls.
+
+    :param vhacd_binary: The path to the V-HACD binary.
+    :param vhacd_args: The V-HACD parameters as list of command line arguments.
+    :param off_content: The content of the .off file describing the mesh.
+    :param mesh_hash: The hash of the mesh and the parameters.
+    :param temp_dir: The directory where to store the V-HACD input and output files.
+    :param cache_dir: The cache dir or None, if no cache should be used.
+    :return: The path to the .wrl file containing the convex parts or None, if V-HACD did not produce an output.
+    """
+    if cache_dir is None:
+        return _run_vhacd(vhacd_binary, vhacd_args, off_content, os.path.join(temp_dir, mesh_hash))
+
+    cache_path = os.path.join(cache_dir, mesh_hash + ".wrl")
+    # Fast path, cache entries are only created via atomic renames, so an existing file is always complete
+    if os.path.exists(cache_path):
+        return cache_path
 
-    bpy.ops.import_scene.x3d(filepath=outFileName, axis_forward='Y', axis_up='Z')
+    # Make sure only one process computes the decomposition, all others wait and then use its result
+    with FileLock(cache_path + ".lock"):
+        if not os.path.exists(cache_path):
+            output_path = _run_vhacd(vhacd_binary, vhacd_args, off_content, os.path.join(temp_dir, mesh_hash))
+            if output_path is None:
+                return None
+            tmp_cache_path = "{}.{}.tmp".format(cache_path, os.getpid())
+            shutil.copyfile(output_path, tmp_cache_path)
+            os.replace(tmp_cache_path, cache_path)
+    return cache_path
+
+
+def _run_vhacd(vhacd_binary, vhacd_args, off_content, file_prefix):
+    """ Runs V-HACD on the given mesh.
+
+    :param vhacd_binary: The path to the V-HACD binary.
+    :param vhacd_args: The V-HACD parameters as list of command line arguments.
+    :param off_content: The content of the .off file describing the mesh.
+    :param file_prefix: The path prefix of the input, output and log files.
+    :return: The path to the .wrl file containing the convex parts or None, if V-HACD did not produce an output.
+    """
+    off_filename = file_prefix + ".off"
+    out_filename = file_prefix + ".wrl"
+    log_filename = file_prefix + "_log.txt"
+
+    print('\nExporting mesh for V-HACD: {}...'.format(off_filename))
+    with open(off_filename, "wb") as off:
+        off.write(off_content)
+
+    cmd_line = [vhacd_binary, "--input", off_filename] + vhacd_args + ["--output", out_filename, "--log", log_filename]
+    print('Running V-HACD...\n{}\n'.format(" ".join(cmd_line)))
+    vhacd_process = Popen(cmd_line, bufsize=-1, close_fds=True)
+    vhacd_process.wait()
+
+    return out_filename if os.path.exists(out_filename) else None
+
+
+def _import_convex_parts(ob, decomposition_file, post_matrix, name_template):
+    """ Imports the convex parts of the given object.
+
+    :param ob: The decomposed blender object.
+    :param decomposition_file: The path to the .wrl file containing the convex parts.
+    :param post_matrix: The matrix, which is set as pose of the convex parts.
+    :param name_template: The template how to name the convex parts.
+    :return: The list of convex parts.
+    """
+    bpy.ops.object.select_all(action='DESELECT')
+    bpy.ops.import_scene.x3d(filepath=decomposition_file, axis_forward='Y', axis_up='Z')
     imported = bpy.context.selected_objects
 
     # Name and transform the loaded parts
@@ -160,12 +290,24 @@ def convex_decomposition(ob, temp_dir, resolution=1000000, name_template="?_hull
 
     return imported
 
+
+def off_to_bytes(mesh):
+    """ Returns the triangulated mesh in the Object File Format """
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    # All polygons are triangles, so their vertex indices can be read from the loops
+    faces = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", faces)
+
+    off = io.BytesIO()
+    off.write(b'OFF\n')
+    off.write(str.encode('{} {} 0\n'.format(len(mesh.vertices), len(mesh.polygons))))
+    np.savetxt(off, vertices.reshape(-1, 3), fmt="%g")
+    np.savetxt(off, np.concatenate([np.full((len(faces) // 3, 1), 3), faces.reshape(-1, 3)], axis=1), fmt="%d")
+    return off.getvalue()
+
+
 def off_export(mesh, fullpath):
     """ Export triangulated mesh to Object File Format """
     with open(fullpath, 'wb') as off:
-        off.write(b'OFF\n')
-        off.write(str.encode('{} {} 0\n'.format(len(mesh.vertices), len(mesh.polygons))))
-        for vert in mesh.vertices:
-            off.write(str.encode('{:g} {:g} {:g}\n'.format(*vert.co)))
-        for face in mesh.polygons:
-            off.write(str.encode('3 {} {} {}\n'.format(*face.vertices)))
+        off.write(off_to_bytes(mesh))
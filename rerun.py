@@ -2,11 +2,18 @@
 import os
 import argparse
 import random
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
 parser = argparse.ArgumentParser("Rerun script for BlenderProc")
 parser.add_argument("--seed",  help="Seed used for the generation")
 parser.add_argument("--skip",  help="Skip the first n BlenderProc runs", default=0, type=int)
 parser.add_argument("--runs",  help="Run the BlenderProc pipeline n times", default=100, type=int)
+parser.add_argument("--processes", help="The number of BlenderProc runs which are executed at the same time", default=1, type=int)
+parser.add_argument("--cpu-threads", dest="cpu_threads", help="The number of cpu threads each run may use for rendering. Per default the available cores are split evenly between the parallel runs, if more than one process is used.", default=None, type=int)
+parser.add_argument("--retries", help="How often a failed run is restarted, before it is given up", default=0, type=int)
 parser.add_argument("params", help="The params which are handed over to the run.py script", nargs='+')
 args = parser.parse_args()
 
@@ -31,15 +38,68 @@
 # the first one is the rerun.py script, the last is the output
 used_arguments = list(args.params)
 output_location = os.path.abspath(used_arguments[-1])
-for run_id in range(skip_runs, amount_of_runs):
-    run_seed = random.randint(0, 1000000)
+
+# split the cpu cores between all parallel runs, the budget is handed over to RendererUtility.set_cpu_threads()
+cpu_threads = args.cpu_threads
+if cpu_threads is None and args.processes > 1:
+    cpu_threads = max(1, multiprocessing.cpu_count() // args.processes)
+
+# the manifest stores all successfully finished runs, s.t. an interrupted rerun with the same seed can be resumed
+manifest_path = os.path.join(output_location, str(seed), "rerun_manifest.jsonl")
+manifest_lock = threading.Lock()
+finished_run_seeds = set()
+if os.path.exists(manifest_path):
+    with open(manifest_path, "r") as f:
+        for line in f:
+            if line.strip():
+                finished_run_seeds.add(json.loads(line)["run_seed"])
+
+
+def execute_run(run_id, run_seed):
     # in each run, the arguments are reused
     cmd = ["python", os.path.join(rerun_folder, "run.py")]
     cmd.extend(used_arguments[:-1])
     # the only exception is the output, which gets changed for each run, so that the examples are not overwritten
-    cmd.append(os.path.join(output_location, str(seed), str(run_seed)))
+    run_output = os.path.join(output_location, str(seed), str(run_seed))
+    cmd.append(run_output)
+    run_env = dict(env)
     if seed:
-        env["BLENDER_PROC_RANDOM_SEED"] = str(run_seed)
-    print(" ".join(cmd))
-    # execute one BlenderProc run
-    subprocess.call(" ".join(cmd), shell=True, env=env)
\ No newline at end of file
+        run_env["BLENDER_PROC_RANDOM_SEED"] = str(run_seed)
+    if cpu_threads is not None:
+        run_env["BLENDER_PROC_CPU_THREADS"] = str(cpu_threads)
+        # also limit the threads of numpy & co. inside the blender python
+        run_env["OMP_NUM_THREADS"] = str(cpu_threads)
+
+    for attempt in range(args.retries + 1):
+        print(" ".join(cmd))
+        # execute one BlenderProc run
+        return_code = subprocess.call(" ".join(cmd), shell=True, env=run_env)
+        if return_code == 0:
+            with manifest_lock:
+                with open(manifest_path, "a") as f:
+                    f.write(json.dumps({"run_id": run_id, "run_seed": run_seed, "output": run_output, "attempts": attempt + 1}) + "\n")
+            return True
+        print("Run {} with seed {} failed with return code {} (attempt {}/{})".format(run_id, run_seed, return_code, attempt + 1, args.retries + 1))
+    return False
+
+
+os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+pending_runs = []
+for run_id in range(skip_runs, amount_of_runs):
+    run_seed = random.randint(0, 1000000)
+    if run_seed in finished_run_seeds:
+        print("Skipping run {} with seed {}, it is already in the manifest".format(run_id, run_seed))
+        continue
+    pending_runs.append((run_id, run_seed))
+
+failed_runs = 0
+if pending_runs and args.processes > 1:
+    # the first run installs blender and the required pip packages, parallel runs would race on that, so it runs alone
+    failed_runs += not execute_run(*pending_runs.pop(0))
+with ThreadPoolExecutor(max_workers=max(1, args.processes)) as executor:
+    futures = [executor.submit(execute_run, run_id, run_seed) for run_id, run_seed in pending_runs]
+    failed_runs += sum(not future.result() for future in futures)
+
+if failed_runs > 0:
+    print("{} runs failed, rerun with the same seed to retry them".format(failed_runs))
+    exit(1)
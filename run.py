@@ -24,7 +24,10 @@
 parser.add_argument('args', metavar='arguments', nargs='*', help='Additional arguments which are used to replace placeholders inside the configuration. <args:i> is hereby replaced by the i-th argument.')
 parser.add_argument('--reinstall-blender', dest='reinstall_blender', action='store_true', help='If given, the blender installation is deleted and reinstalled. Is ignored, if a "custom_blender_path" is configured in the configuration file.')
 parser.add_argument('--batch_process', help='Renders a batch of house-cam combinations, by reading a file containing the combinations on each line, where each line is the standard placeholder arguments for rendering a single scene separated by spaces. The value of this option is the path to the index file, no need to add placeholder arguments.')
+parser.add_argument('--worker', dest='worker_queue_dir', default=None, help="Starts a long living worker, which executes the jobs of the job queue in the given directory one after another inside one blender instance. The given file is only used to setup blender. Jobs can be submitted via src.utility.JobQueue or scripts/submit_worker_jobs.py.")
+parser.add_argument('--worker-idle-timeout', dest='worker_idle_timeout', default=None, type=float, help="If given, the worker stops after its job queue has been empty for this amount of seconds. Per default the worker waits until a stop is requested.")
 parser.add_argument('--temp-dir', dest='temp_dir', default=None, help="The path to a directory where all temporary output files should be stored. If it doesn't exist, it is created automatically. Type: string. Default: \"/dev/shm\" or \"/tmp/\" depending on which is available.")
+parser.add_argument('--trace-dir', dest='trace_dir', default=None, help="If given, the runtime of all modules, loaders, rendered frames, bvh builds, ray casts and writers is traced and written into this directory as chrome trace (.json) and summary (.csv), see src/utility/Tracer.py.")
 parser.add_argument('--keep-temp-dir', dest='keep_temp_dir', action='store_true', help="If set, the temporary directory is not removed in the end.")
 parser.add_argument('--blender-install-path', dest='blender_install_path', default=None, help="Set path where blender should be installed. If None is given, /home_local/<env:USER>/blender/ is used per default. This argument is ignored if it is specified in the given YAML config.")
 parser.add_argument('--custom-blender-path', dest='custom_blender_path', default=None, help="Set, if you want to use a custom blender installation to run BlenderProc. If None is given, blender is installed into the configured blender_install_path. This argument is ignored if it is specified in the given YAML config.")
@@ -186,7 +189,7 @@ def __call__(self, block_num, block_size, total_size):
     raise Exception("This system is not supported yet: {}".format(platform))
 
 repo_root_directory = os.path.dirname(os.path.realpath(__file__))
-if is_config:
+if is_config or args.worker_queue_dir is not None:
     path_src_run = os.path.join(repo_root_directory, "src/run.py")
 else:
     path_src_run = args.file
@@ -210,10 +213,20 @@ def __call__(self, block_num, block_size, total_size):
 if not os.path.exists(temp_dir):
     os.makedirs(temp_dir)
 
+if args.trace_dir is not None:
+    # The tracer inside blender is enabled via this environment variable
+    os.environ["BLENDER_PROC_TRACE_DIR"] = os.path.abspath(args.trace_dir)
+
 if args.debug:
     p = subprocess.Popen([blender_run_path, "--python-use-system-env", "--python-exit-code", "0", "--python", "src/debug_startup.py", "--", path_src_run if not is_config else args.file, temp_dir] + args.args, env=dict(os.environ, PYTHONPATH=os.getcwd(), PYTHONNOUSERSITE="1"), cwd=repo_root_directory)
 else:
-    if not args.batch_process:
+    if args.worker_queue_dir is not None:
+        worker_args = ["--worker", os.path.abspath(args.worker_queue_dir)]
+        if args.worker_idle_timeout is not None:
+            worker_args += ["--worker-idle-timeout", str(args.worker_idle_timeout)]
+        p = subprocess.Popen([blender_run_path, "--background", "--python-use-system-env", "--python-exit-code", "2", "--python", path_src_run, "--", args.file, temp_dir] + worker_args,
+                             env=dict(os.environ, PYTHONPATH=os.getcwd(), PYTHONNOUSERSITE="1"), cwd=repo_root_directory)
+    elif not args.batch_process:
         p = subprocess.Popen([blender_run_path, "--background", "--python-use-system-env", "--python-exit-code", "2", "--python", path_src_run, "--", args.file, temp_dir] + args.args,
                              env=dict(os.environ, PYTHONPATH=os.getcwd(), PYTHONNOUSERSITE="1"), cwd=repo_root_directory)
     else:  # Pass the index file path containing placeholder args for all input combinations (cam, house, output path)
@@ -0,0 +1,311 @@
+""" Benchmarks the numpy hot paths of BlenderProc without blender.
+
+The benchmarked functions only work on arrays, so they are run with synthetic inputs of realistic sizes (720p, 1080p,
+4k and 10 to 1000 instances) in a plain python environment. The blender modules (bpy, mathutils, ...) are replaced by
+placeholders, only the camera of the scene is set up, as it is read by dist2depth. All other required packages
+(numpy, opencv, scikit-image, pypng, pillow, h5py, gitpython) have to be installed in the used python environment.
+
+For every benchmark the median and minimal runtime, the throughput in megapixels per second and the peak memory
+allocated by python/numpy are measured. The results are appended to a json history and every benchmark is compared to
+its last result in the history, s.t. regressions become visible.
+
+Input parameters:
+    * --history: path to the .json history file. Default: benchmark_history.json
+    * --sizes: image sizes to use. Default: 720p 1080p 4k
+    * --instances: numbers of instances to use. Default: 10 100 1000
+    * --filter: only run benchmarks, whose name contains one of the given strings.
+    * --repeats: number of timed calls per benchmark. Default: 5
+    * --threshold: relative slowdown, which is reported as regression. Default: 0.1
+    * --fail-on-regression: exit with code 1, if there is a regression.
+    * --no-save: do not append the results to the history.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from sys import path
+
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--history', type=str, default="benchmark_history.json", help='path to the .json history file')
+parser.add_argument('--sizes', nargs='+', default=["720p", "1080p", "4k"], help='image sizes to use')
+parser.add_argument('--instances', nargs='+', type=int, default=[10, 100, 1000], help='numbers of instances to use')
+parser.add_argument('--filter', nargs='+', default=None, help='only run benchmarks, whose name contains one of these strings')
+parser.add_argument('--repeats', type=int, default=5, help='number of timed calls per benchmark')
+parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown, which is reported as regression')
+parser.add_argument('--fail-on-regression', dest='fail_on_regression', action='store_true', help='exit with code 1, if there is a regression')
+parser.add_argument('--no-save', dest='no_save', action='store_true', help='do not append the results to the history')
+args = parser.parse_args()
+
+image_sizes = {"720p": (720, 1280), "1080p": (1080, 1920), "4k": (2160, 3840)}
+
+
+class BlenderPlaceholder(type):
+    """ A class, whose attributes are again placeholder classes.
+
+    So module level code like type annotations, isinstance() checks or subclassing of blender types works, as long as
+    nothing of it is actually executed.
+    """
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        placeholder = BlenderPlaceholder(name, (), {})
+        setattr(cls, name, placeholder)
+        return placeholder
+
+
+class BlenderPlaceholderModule(types.ModuleType):
+    """ A module, whose attributes are placeholder classes. """
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        placeholder = BlenderPlaceholder(name, (), {})
+        setattr(self, name, placeholder)
+        return placeholder
+
+
+for module_name in ["bpy", "bpy_extras", "bpy_extras.object_utils", "bmesh", "mathutils", "mathutils.bvhtree",
+                    "mathutils.kdtree", "addon_utils"]:
+    sys.modules[module_name] = BlenderPlaceholderModule(module_name)
+# dist2depth reads the intrinsics of the active camera
+sys.modules["bpy"].context = types.SimpleNamespace(scene=types.SimpleNamespace(
+    camera=types.SimpleNamespace(data=types.SimpleNamespace(angle=0.691111, shift_x=0.0, shift_y=0.0))))
+
+path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.utility.SetupUtility import SetupUtility
+# The packages have to be installed in this python environment already
+SetupUtility.setup_pip = staticmethod(lambda *args, **kwargs: None)
+
+from src.utility.PostProcessingUtility import PostProcessingUtility
+from src.utility.Utility import Utility
+from src.utility.CocoWriterUtility import CocoWriterUtility
+from src.utility.BopWriterUtility import BopWriterUtility
+from src.utility.SGMUtility import fill_in_fast
+
+
+def synthetic_segmap(height: int, width: int, num_instances: int, noise_ratio: float = 0.0) -> np.ndarray:
+    """ Creates an instance segmentation map with rectangular instances of different sizes.
+
+    :param height: The height of the image.
+    :param width: The width of the image.
+    :param num_instances: The number of instances including the background (0).
+    :param noise_ratio: The ratio of pixels, which are set to values between two instances, like anti-aliased segmaps.
+    :return: The segmap as float32 array of shape [height, width].
+    """
+    rng = np.random.default_rng(num_instances)
+    grid_size = int(np.ceil(np.sqrt(num_instances)))
+    # Random cuts, s.t. the instances have different sizes
+    row_cuts = np.sort(rng.choice(np.arange(1, height), grid_size - 1, replace=False)) if grid_size > 1 else []
+    col_cuts = np.sort(rng.choice(np.arange(1, width), grid_size - 1, replace=False)) if grid_size > 1 else []
+    row_ids = np.searchsorted(row_cuts, np.arange(height), side="right")
+    col_ids = np.searchsorted(col_cuts, np.arange(width), side="right")
+    cell_labels = rng.permutation(grid_size * grid_size) % num_instances
+    segmap = cell_labels[row_ids[:, None] * grid_size + col_ids[None, :]].astype(np.float32)
+
+    if noise_ratio > 0:
+        noisy = rng.random((height, width)) < noise_ratio
+        segmap[noisy] += 0.5
+    return segmap
+
+
+def synthetic_distance(height: int, width: int) -> np.ndarray:
+    """ Creates a smooth distance image with some holes.
+
+    :param height: The height of the image.
+    :param width: The width of the image.
+    :return: The distance image as float32 array of shape [height, width].
+    """
+    rng = np.random.default_rng(0)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    distance = 2.0 + np.sin(xs / 97.0) + np.cos(ys / 61.0) + rng.random((height, width), dtype=np.float32) * 0.01
+    distance[rng.random((height, width)) < 0.05] = 0
+    return distance.astype(np.float32)
+
+
+def synthetic_color(height: int, width: int) -> np.ndarray:
+    """ Creates a color image consisting of a gradient and noise.
+
+    :param height: The height of the image.
+    :param width: The width of the image.
+    :return: The color image as uint8 array of shape [height, width, 3].
+    """
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    return np.clip(gradient + rng.normal(0, 20, (height, width, 3)), 0, 255).astype(np.uint8)
+
+
+def bench_dist2depth(height, width, num_instances):
+    distance = synthetic_distance(height, width)
+    return lambda: PostProcessingUtility.dist2depth(distance)
+
+
+def bench_trim_redundant_channels(height, width, num_instances):
+    distance = np.repeat(synthetic_distance(height, width)[:, :, None], 3, axis=2)
+    # Trimming only returns a view, so copy the result to measure a realistic usage
+    return lambda: np.ascontiguousarray(PostProcessingUtility.trim_redundant_channels(distance))
+
+
+def bench_remove_segmap_noise(height, width, num_instances):
+    segmap = synthetic_segmap(height, width, num_instances, noise_ratio=0.01)
+    return lambda: PostProcessingUtility.remove_segmap_noise(segmap.copy())
+
+
+def bench_oil_paint_filter(height, width, num_instances):
+    color = synthetic_color(height, width)
+    return lambda: PostProcessingUtility.oil_paint_filter(color, filter_size=5, edges_only=True)
+
+
+def bench_equidistant_values(height, width, num_instances):
+    return lambda: Utility.generate_equidistant_values(num_instances, 255)
+
+
+def bench_map_back_equidistant_values(height, width, num_instances):
+    values, num_splits_per_dimension = Utility.generate_equidistant_values(num_instances, 255)
+    segmap = synthetic_segmap(height, width, num_instances).astype(np.int64)
+    colors = np.array(values, dtype=np.float64)[segmap]
+    return lambda: Utility.map_back_from_equally_spaced_equidistant_values(colors.copy(), num_splits_per_dimension, 255)
+
+
+def _coco_inputs(height, width, num_instances):
+    segmap = synthetic_segmap(height, width, num_instances).astype(np.int32)
+    attribute_map = [{"idx": idx, "category_id": 1 + idx % 20} for idx in range(num_instances)]
+    return segmap, attribute_map
+
+
+def bench_coco_rle(height, width, num_instances):
+    segmap, attribute_map = _coco_inputs(height, width, num_instances)
+    return lambda: CocoWriterUtility.generate_coco_annotations([segmap], [attribute_map], ["rgb_0000.png"],
+                                                               "coco_annotations", "rle")
+
+
+def bench_coco_polygon(height, width, num_instances):
+    segmap, attribute_map = _coco_inputs(height, width, num_instances)
+    return lambda: CocoWriterUtility.generate_coco_annotations([segmap], [attribute_map], ["rgb_0000.png"],
+                                                               "coco_annotations", "polygon")
+
+
+def bench_fill_in_fast(height, width, num_instances):
+    depth = synthetic_distance(height, width)
+    # The depth map is changed in place
+    return lambda: fill_in_fast(depth.copy(), max_depth=100.0)
+
+
+def bench_bop_save_depth(height, width, num_instances):
+    depth = synthetic_distance(height, width) * 1000
+    depth_path = os.path.join(tempfile.mkdtemp(), "depth.png")
+    # The depth image is clipped in place
+    return lambda: BopWriterUtility._save_depth(depth_path, depth.copy())
+
+
+# name -> (function creating the benchmark, whether it depends on the image size, whether it depends on the instances)
+benchmarks = {
+    "dist2depth": (bench_dist2depth, True, False),
+    "trim_redundant_channels": (bench_trim_redundant_channels, True, False),
+    "remove_segmap_noise": (bench_remove_segmap_noise, True, True),
+    "oil_paint_filter": (bench_oil_paint_filter, True, False),
+    "generate_equidistant_values": (bench_equidistant_values, False, True),
+    "map_back_from_equally_spaced_equidistant_values": (bench_map_back_equidistant_values, True, True),
+    "coco_annotations_rle": (bench_coco_rle, True, True),
+    "coco_annotations_polygon": (bench_coco_polygon, True, True),
+    "fill_in_fast": (bench_fill_in_fast, True, False),
+    "bop_save_depth": (bench_bop_save_depth, True, False),
+}
+
+
+def measure(function, repeats: int) -> dict:
+    """ Measures the runtime and the peak memory of the given function.
+
+    :param function: The function to benchmark.
+    :param repeats: The number of timed calls.
+    :return: A dict with the median and minimal runtime and the peak memory.
+    """
+    # Warm up, e.g. to load lazy imports
+    function()
+    runtimes = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        runtimes.append(time.perf_counter() - start)
+
+    # tracemalloc slows down the call, so the memory is measured in a separate call
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_seconds": float(np.median(runtimes)), "min_seconds": float(np.min(runtimes)),
+            "peak_memory_mb": peak_memory / (1024 * 1024)}
+
+
+def get_commit() -> str:
+    """ Returns the current git commit of the repository or an empty string. """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+history = {"runs": []}
+if os.path.exists(args.history):
+    with open(args.history, "r") as f:
+        history = json.load(f)
+# The latest result of each benchmark, runs with --filter only contain some of the benchmarks
+previous_results = {}
+for run in history["runs"]:
+    previous_results.update(run["results"])
+
+results = {}
+regressions = []
+for name, (create_benchmark, depends_on_size, depends_on_instances) in benchmarks.items():
+    if args.filter is not None and not any(pattern in name for pattern in args.filter):
+        continue
+    for size_name in (args.sizes if depends_on_size else [None]):
+        for num_instances in (args.instances if depends_on_instances else [None]):
+            height, width = image_sizes[size_name] if size_name is not None else (0, 0)
+            key = name + "".join("[{}]".format(param) for param in [size_name, num_instances] if param is not None)
+
+            result = measure(create_benchmark(height, width, num_instances), args.repeats)
+            if size_name is not None:
+                result["megapixels_per_second"] = height * width / 1e6 / result["median_seconds"]
+            results[key] = result
+
+            line = "{:70s} {:9.4f}s  {:8.1f} MB".format(key, result["median_seconds"], result["peak_memory_mb"])
+            if "megapixels_per_second" in result:
+                line += "  {:9.1f} MP/s".format(result["megapixels_per_second"])
+            if key in previous_results:
+                change = result["median_seconds"] / previous_results[key]["median_seconds"] - 1
+                line += "  {:+6.1%}".format(change)
+                if change > args.threshold:
+                    line += "  REGRESSION"
+                    regressions.append(key)
+            print(line)
+
+if not args.no_save:
+    history["runs"].append({
+        "date": datetime.datetime.now().isoformat(" "),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform() + " " + platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "repeats": args.repeats,
+        "results": results
+    })
+    with open(args.history, "w") as f:
+        json.dump(history, f, indent=2)
+    print("Appended results to " + args.history)
+
+if regressions:
+    print("{} benchmarks are more than {:.0%} slower than in their last run: {}".format(len(regressions), args.threshold,
+                                                                                      ", ".join(regressions)))
+    if args.fail_on_regression:
+        sys.exit(1)
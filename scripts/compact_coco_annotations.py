@@ -0,0 +1,30 @@
+""" Writes the coco annotations .json file from the append-only annotation store.
+
+When the coco annotations are written with "use_annotation_store" (and "compact_annotation_store" is not set), each
+run only appends its images and annotations to coco_data/annotation_store. This script merges all of them once into
+the standard coco_annotations.json.
+
+Input parameters:
+    * coco_data: path to the coco_data/ folder of the generated data.
+    * -o, --output: path of the .json file, which should be written. Default: coco_data/coco_annotations.json
+"""
+
+import argparse
+import os
+from sys import path
+
+parser = argparse.ArgumentParser()
+parser.add_argument('coco_data', type=str, help='path to the coco_data/ folder, which contains the annotation_store')
+parser.add_argument('-o', '--output', dest="output", type=str, default=None, help='path of the coco annotations .json file, which should be written')
+args = parser.parse_args()
+
+path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.utility.CocoAnnotationStore import CocoAnnotationStore
+
+store_dir = os.path.join(args.coco_data, "annotation_store")
+if not os.path.exists(os.path.join(store_dir, "ledger.json")):
+    raise Exception("There is no annotation store in " + args.coco_data)
+
+output = args.output if args.output is not None else os.path.join(args.coco_data, "coco_annotations.json")
+CocoAnnotationStore(store_dir).compact(output)
+print("Wrote coco annotations to " + output)
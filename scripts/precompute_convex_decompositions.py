@@ -0,0 +1,68 @@
+""" Fills the convex decomposition cache for all models of a dataset ahead of time.
+
+The physics simulation decomposes every object with the collision shape CONVEX_DECOMPOSITION via V-HACD, which can
+take minutes for new models. This script decomposes all .ply/.obj models inside the given directory (e.g. a BOP
+dataset or ShapeNet) in parallel and stores the results in the decomposition cache, which is then used by the
+PhysicsPositioning module. As the cache is keyed by the mesh content, the models are read and prepared in the same
+way as by the BOP loader (.ply) and the ShapeNet loader (.obj), which rotates the meshes and, unless
+--no-move-object-origin is given, moves their origins. Models which are already cached are not decomposed again.
+
+Needs to be run inside blender via:
+
+    python run.py scripts/precompute_convex_decompositions.py <model_dir> [--cache-dir <cache_dir>]
+
+Input parameters:
+    * model_dir: path to the directory, which is searched recursively for models.
+    * --cache-dir: path to the decomposition cache. Default: resources/decomposition_cache
+    * --num-processes: the number of V-HACD processes, which run in parallel. Default: the number of cpus
+    * --batch-size: the number of models, which are loaded into blender at the same time. Default: 64
+    * --extensions: the file extensions of the models, which should be decomposed. Default: .ply .obj
+    * --no-move-object-origin: set this, if the ShapeNet loader is used with move_object_origin set to False.
+"""
+
+from src.utility.SetupUtility import SetupUtility
+SetupUtility.setup([])
+
+import argparse
+import os
+
+from external.vhacd.decompose import convex_decompositions
+from src.utility.EntityUtility import Entity
+from src.utility.Initializer import Initializer
+from src.utility.MeshObjectUtility import MeshObject
+from src.utility.PlyUtility import PlyUtility
+from src.utility.Utility import Utility
+from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.loader.ShapeNetLoader import ShapeNetLoader
+
+parser = argparse.ArgumentParser()
+parser.add_argument('model_dir', help="path to the directory, which is searched recursively for models")
+parser.add_argument('--cache-dir', dest='cache_dir', default="resources/decomposition_cache", help="path to the decomposition cache")
+parser.add_argument('--num-processes', dest='num_processes', type=int, default=None, help="the number of V-HACD processes, which run in parallel")
+parser.add_argument('--batch-size', dest='batch_size', type=int, default=64, help="the number of models, which are loaded into blender at the same time")
+parser.add_argument('--extensions', nargs='+', default=[".ply", ".obj"], help="the file extensions of the models, which should be decomposed")
+parser.add_argument('--no-move-object-origin', dest='move_object_origin', action='store_false', help="set this, if the ShapeNet loader is used with move_object_origin set to False")
+args = parser.parse_args()
+
+Initializer.init()
+
+model_paths = sorted(os.path.join(root, file_name) for root, _, file_names in os.walk(args.model_dir)
+                     for file_name in file_names if os.path.splitext(file_name)[1].lower() in args.extensions)
+print("Found {} models in {}".format(len(model_paths), args.model_dir))
+
+for batch_start in range(0, len(model_paths), args.batch_size):
+    objects = []
+    for model_path in model_paths[batch_start:batch_start + args.batch_size]:
+        if model_path.lower().endswith(".ply"):
+            objects.append(MeshObject(PlyUtility.load(model_path)))
+        else:
+            # The ShapeNet loader changes the meshes after importing them, so the cache keys only match, if the same
+            # changes are applied here
+            loaded_objects = ObjectLoader.load(model_path)
+            ShapeNetLoader.normalize_meshes(loaded_objects, args.move_object_origin)
+            objects.extend(loaded_objects)
+
+    # Decompose the whole batch in parallel, the results are kept in the cache
+    all_parts = convex_decompositions([obj.blender_obj for obj in objects], Utility.get_temporary_directory(), num_processes=args.num_processes, cache_dir=Utility.resolve_path(args.cache_dir))
+    Entity.delete_multiple(objects + [Entity(part) for parts in all_parts for part in parts])
+    print("Decomposed {} of {} models".format(min(batch_start + args.batch_size, len(model_paths)), len(model_paths)))
@@ -0,0 +1,37 @@
+import os
+import random
+import argparse
+from sys import path
+
+parser = argparse.ArgumentParser("Submits BlenderProc runs to the job queue of one or several workers (see run.py --worker)")
+parser.add_argument("queue_dir", help="The directory of the job queue, the workers were started with.")
+parser.add_argument("params", help="The config file or python script followed by its arguments. The last argument is treated as output dir and is changed per run, like in rerun.py.", nargs='*')
+parser.add_argument("--seed", help="Seed used for the generation", type=int, default=None)
+parser.add_argument("--runs", help="Submit n runs", default=1, type=int)
+parser.add_argument("--stop", help="Tells all workers of this queue to stop after their current job", action="store_true")
+args = parser.parse_args()
+
+path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.utility.JobQueue import JobQueue
+
+queue = JobQueue(args.queue_dir)
+
+if args.stop:
+    queue.request_stop()
+    exit(0)
+
+if len(args.params) < 2:
+    print(parser.format_help())
+    exit(0)
+
+seed = args.seed if args.seed is not None else random.randint(0, 1000000)
+random.seed(seed)
+
+file, used_arguments = args.params[0], args.params[1:]
+output_location = os.path.abspath(used_arguments[-1])
+for run_id in range(args.runs):
+    run_seed = random.randint(0, 1000000)
+    # the output gets changed for each run, so that the runs do not overwrite each other
+    job_args = used_arguments[:-1] + [os.path.join(output_location, str(seed), str(run_seed))]
+    job_name = queue.submit(file, job_args, run_seed)
+    print("Submitted", job_name, " ".join(job_args))
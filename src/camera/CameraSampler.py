@@ -8,6 +8,7 @@
 from mathutils import Matrix
 
 from src.camera.CameraInterface import CameraInterface
+from src.utility.BVHUtility import TriangleBVH
 from src.utility.BlenderUtility import get_all_blender_mesh_objects
 from src.utility.CameraUtility import CameraUtility
 from src.utility.Config import Config
@@ -214,9 +215,14 @@ def _sample_cam_poses(self, config):
         self._set_cam_intrinsics(cam, Config(self.config.get_raw_dict("intrinsics", {})))
 
         if self.proximity_checks:
-            # needs to build an bvh tree
+            # needs to build an bvh tree, which allows casting all rays of one pose at once
             mesh_objects = [MeshObject(obj) for obj in get_all_blender_mesh_objects() if obj not in self.excluded_objects_in_proximity_check]
-            self.bvh_tree = MeshObject.create_bvh_tree_multi_objects(mesh_objects)
+            self.bvh_tree = TriangleBVH.from_mesh_objects(mesh_objects)
+
+        # The scene does not change while sampling, so one tree over the whole scene can be used for all ray casts
+        self.scene_bvh = None
+        if self.interest_score_range > 0 or self.check_visible_objects or self.auto_override_focal_object:
+            self.scene_bvh = TriangleBVH.from_scene()
 
         if self.interest_score_step <= 0.0:
             raise Exception("Must have an interest score step size bigger than 0")
@@ -245,7 +251,7 @@ def _sample_cam_poses(self, config):
                     if self.auto_override_focal_object:
                         print("Overriding focal object to a random object in view.")
                         cam2world_matrix = self._cam2world_matrix_from_cam_extrinsics(config)
-                        visible_objects = CameraValidation.visible_objects(cam2world_matrix, self.sqrt_number_of_rays)
+                        visible_objects = CameraValidation.visible_objects(cam2world_matrix, self.sqrt_number_of_rays, self.scene_bvh)
                         focal_object = choice(tuple(visible_objects)).blender_obj
 
                         cam.dof.focus_object = focal_object
@@ -308,11 +314,11 @@ def _is_pose_valid(self, cam2world_matrix: np.ndarray, existing_poses: List[np.n
         if not CameraValidation.perform_obstacle_in_view_check(cam2world_matrix, self.proximity_checks, self.bvh_tree, self.sqrt_number_of_rays):
             return False
 
-        if self.interest_score > 0 and CameraValidation.scene_coverage_score(cam2world_matrix, self.special_objects, self.special_objects_weight, self.sqrt_number_of_rays) < self.interest_score:
+        if self.interest_score > 0 and CameraValidation.scene_coverage_score(cam2world_matrix, self.special_objects, self.special_objects_weight, self.sqrt_number_of_rays, self.scene_bvh) < self.interest_score:
             return False
 
         if len(self.check_visible_objects) > 0:
-            visible_objects = CameraValidation.visible_objects(cam2world_matrix, self.sqrt_number_of_rays)
+            visible_objects = CameraValidation.visible_objects(cam2world_matrix, self.sqrt_number_of_rays, self.scene_bvh)
             for obj in self.check_visible_objects:
                 if obj not in visible_objects:
                     return False
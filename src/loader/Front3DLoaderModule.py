@@ -51,6 +51,10 @@ class Front3DLoaderModule(LoaderInterface):
         * - lamp_light_strength
           - Strength of the emission shader used in each lamp. Default: 7.0
           - float
+        * - cache_dir
+          - If given, each parsed house is stored as .npz file in this directory, s.t. rendering the same house
+            again does not require to parse its json file. Default: None
+          - string
    """
 
     def __init__(self, config: Config):
@@ -71,6 +75,7 @@ def run(self):
             front_3D_texture_path=self.config.get_string("3D_front_texture_path"),
             label_mapping=label_mapping,
             ceiling_light_strength=self.config.get_float("ceiling_light_strength", 0.8),
-            lamp_light_strength=self.config.get_float("lamp_light_strength", 7.0)
+            lamp_light_strength=self.config.get_float("lamp_light_strength", 7.0),
+            cache_dir=self.config.get_string("cache_dir", None)
         )
         self._set_properties(loaded_objects)
@@ -24,6 +24,10 @@ class GlobalStorage(object):
           - This key is saved by the Renderer during distance rendering and is used in the
             StereoGlobalMatchingWriter. 
           - string
+        * - bvh_cache
+          - The BVHCache of the current scene, which holds the bvh trees used for collision checks. It is created
+            by BVHCache.get_scene_cache().
+          - BVHCache
          
     Please add all new keys you create to this list.
     
@@ -166,3 +170,14 @@ def get_global_config():
             return GlobalStorage._global_config
         else:
             raise RuntimeError("The global config was not initialized!")
+
+    @staticmethod
+    def reset():
+        """
+        Removes all stored values and the global config, s.t. a new pipeline can be inited in the same process.
+
+        This is used by the worker mode, which executes several pipelines one after another in one blender instance.
+        """
+        GlobalStorage._storage_dict = {}
+        GlobalStorage._global_config = None
+        GlobalStorage._add_to_global_config_at_init = {}
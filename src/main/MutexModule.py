@@ -34,6 +34,6 @@ def run(self):
             module_list = self.config.get_list("modules")
             modules = Utility.initialize_modules(module_list)
             for module in modules:
-                with Utility.BlockStopWatch("Running module " + module.__class__.__name__):
+                with Utility.BlockStopWatch("Running module " + module.__class__.__name__, "module"):
                     module.run()
 
@@ -37,7 +37,7 @@ def __init__(self, config_path, args, working_dir, temp_dir, avoid_output=False)
 
     def run(self):
         """ Runs each module and measuring their execution time. """
-        with Utility.BlockStopWatch("Running blender pipeline"):
+        with Utility.BlockStopWatch("Running blender pipeline", "pipeline"):
             for module in self.modules:
-                with Utility.BlockStopWatch("Running module " + module.__class__.__name__):
+                with Utility.BlockStopWatch("Running module " + module.__class__.__name__, "module"):
                     module.run()
@@ -0,0 +1,122 @@
+import os
+import runpy
+import shutil
+import sys
+import time
+
+import bpy
+
+from src.main.GlobalStorage import GlobalStorage
+from src.main.Pipeline import Pipeline
+from src.utility.JobQueue import JobQueue
+from src.utility.Tracer import Tracer
+from src.utility.Utility import Utility
+
+
+class Worker:
+    """ Executes the jobs of a JobQueue one after another inside one long living blender process.
+
+    In contrast to starting a new blender instance per scene, the worker only pays once for the startup of blender,
+    the pip setup and the import of all python modules. Between two jobs blender is reset to its factory settings
+    and all global state of BlenderProc is cleared, s.t. each job starts from a clean scene.
+
+    A job can either be a config file or a python script which uses the BlenderProc API. Each job gets its own
+    temporary directory inside the temp dir of the worker and if a seed was given for a job, it is set via the
+    "BLENDER_PROC_RANDOM_SEED" environment variable during the execution of this job.
+    """
+
+    def __init__(self, queue_dir: str, working_dir: str, temp_dir: str, poll_interval: float = 1.0, idle_timeout: float = None):
+        """
+        :param queue_dir: The path to the directory of the JobQueue.
+        :param working_dir: The current working dir usually the place where the run.py sits.
+        :param temp_dir: The directory where to put temporary files during the execution.
+        :param poll_interval: The time in seconds to wait before checking the queue again, if it was empty.
+        :param idle_timeout: The worker stops after the queue has been empty for this amount of seconds. If None is given, it waits until a stop is requested.
+        """
+        self._queue = JobQueue(queue_dir)
+        self._working_dir = working_dir
+        self._temp_dir = temp_dir
+        self._poll_interval = poll_interval
+        self._idle_timeout = idle_timeout
+
+    def run(self):
+        """ Claims and executes jobs until a stop is requested or the idle timeout has been reached. """
+        idle_since = time.time()
+        while not self._queue.is_stop_requested():
+            claimed_job = self._queue.claim()
+            if claimed_job is None:
+                if self._idle_timeout is not None and time.time() - idle_since > self._idle_timeout:
+                    print("Worker was idle for more than {} seconds, stopping".format(self._idle_timeout))
+                    break
+                time.sleep(self._poll_interval)
+                continue
+
+            job_name, job = claimed_job
+            exception = None
+            with Utility.BlockStopWatch("Running job " + job_name, "job"):
+                try:
+                    self._execute_job(job_name, job)
+                except KeyboardInterrupt as e:
+                    # The worker is stopped, but the job should not stay in running/
+                    self._queue.finish(job_name, job, e)
+                    raise
+                except BaseException as e:
+                    # Also catch SystemExit, e.g. raised by argparse or sys.exit() inside a job script, which should
+                    # only fail the job and not stop the whole worker
+                    print("Job {} failed: {}".format(job_name, repr(e)))
+                    exception = e
+            # Write one trace per job, if tracing is enabled
+            Tracer.save(run_name=os.path.splitext(job_name)[0])
+            Tracer.reset()
+            self._queue.finish(job_name, job, exception)
+            idle_since = time.time()
+
+    def _execute_job(self, job_name: str, job: dict):
+        """ Resets blender and executes the given job in its own temporary directory.
+
+        :param job_name: The name of the job.
+        :param job: The job description, containing the file to execute, its arguments and an optional seed.
+        """
+        Worker.reset_scene()
+        job_temp_dir = os.path.join(self._temp_dir, os.path.splitext(job_name)[0])
+        os.makedirs(job_temp_dir, exist_ok=True)
+
+        previous_seed = os.environ.get("BLENDER_PROC_RANDOM_SEED")
+        if job.get("seed") is not None:
+            os.environ["BLENDER_PROC_RANDOM_SEED"] = str(job["seed"])
+        try:
+            if job["file"].endswith(".py"):
+                self._run_script(job["file"], job["args"], job_temp_dir)
+            else:
+                pipeline = Pipeline(job["file"], job["args"], self._working_dir, job_temp_dir)
+                pipeline.run()
+        finally:
+            if previous_seed is None:
+                os.environ.pop("BLENDER_PROC_RANDOM_SEED", None)
+            else:
+                os.environ["BLENDER_PROC_RANDOM_SEED"] = previous_seed
+            shutil.rmtree(job_temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _run_script(script_path: str, args: list, temp_dir: str):
+        """ Executes the given python script as if it would have been started directly via run.py.
+
+        All modules, which have been imported by previous jobs, stay loaded.
+
+        :param script_path: The path to the python script.
+        :param args: The arguments for the python script.
+        :param temp_dir: The temporary directory, which should be used by the script.
+        """
+        previous_argv = sys.argv
+        # Mimic the arguments of a blender call, as SetupUtility.setup() extracts the temp dir and the script arguments from them
+        sys.argv = sys.argv[:sys.argv.index("--")] + ["--", script_path, temp_dir] + list(args)
+        try:
+            runpy.run_path(script_path, run_name="__main__")
+        finally:
+            sys.argv = previous_argv
+
+    @staticmethod
+    def reset_scene():
+        """ Resets blender to its factory settings and clears all global state of BlenderProc. """
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        GlobalStorage.reset()
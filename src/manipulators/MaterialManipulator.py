@@ -1,4 +1,3 @@
-import os
 import random
 import warnings
 from typing import Any
@@ -480,8 +479,8 @@ def _load_textures(self, text_paths: dict) -> dict:
         """
         loaded_textures = {}
         for key in text_paths.keys():
-            bpy.ops.image.open(filepath=text_paths[key], directory=os.path.dirname(text_paths[key]))
-            loaded_textures.update({key: bpy.data.images.get(os.path.basename(text_paths[key]))})
+            # Images, which have already been loaded from the same path, are reused
+            loaded_textures.update({key: bpy.data.images.load(text_paths[key], check_existing=True)})
 
         return loaded_textures
 
@@ -1,5 +1,8 @@
+from typing import Tuple
+
 import bpy
 import mathutils
+import numpy as np
 
 from src.main.Module import Module
 from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_all_blender_mesh_objects
@@ -62,6 +65,12 @@ class ObjectPoseSamplerModule(Module):
           - Here call an appropriate Provider (Sampler) in order to sample rotation (Euler angles 3d vector) for
             each object. 
           - Provider
+        * - proposal_batch_size
+          - If bigger than 1, this number of candidate poses is sampled at once and the candidates, whose bounding
+            boxes overlap with no other object, are tried first. This speeds up placing many objects tightly, but
+            prefers poses which are not close to other objects. Only works for objects with the XYZ rotation mode.
+            Default: 1.
+          - int
     """
 
     def __init__(self, config):
@@ -82,9 +91,17 @@ def sample_pose(obj: MeshObject):
             obj.set_location(self.config.get_vector3d("pos_sampler"))
             obj.set_rotation_euler(self.config.get_vector3d("rot_sampler"))
 
+        def sample_poses(obj: MeshObject, num_poses: int) -> Tuple[np.ndarray, np.ndarray]:
+            locations = np.array([self.config.get_vector3d("pos_sampler") for _ in range(num_poses)])
+            rotations = np.array([self.config.get_vector3d("rot_sampler") for _ in range(num_poses)])
+            return locations, rotations
+
+        batch_size = self.config.get_int("proposal_batch_size", 1)
         ObjectPoseSampler.sample(
             objects_to_sample=MeshObject.convert_to_meshes(objects_to_sample),
             sample_pose_func=sample_pose,
             objects_to_check_collisions=MeshObject.convert_to_meshes(objects_to_check_collisions),
-            max_tries=max_tries
+            max_tries=max_tries,
+            sample_poses_func=sample_poses if batch_size > 1 else None,
+            batch_size=batch_size
         )
\ No newline at end of file
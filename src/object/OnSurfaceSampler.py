@@ -1,8 +1,12 @@
 import bpy
 import mathutils
+import numpy as np
 
 from src.main.Module import Module
-from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_bounds
+from src.utility.BVHUtility import BVHCache
+from src.utility.BlenderUtility import check_bb_intersection, get_bounds
+from src.utility.CollisionUtility import CollisionUtility, AABBIndex
+from src.utility.MeshObjectUtility import MeshObject
 
 
 class OnSurfaceSampler(Module):
@@ -49,6 +53,12 @@ class OnSurfaceSampler(Module):
         * - up_direction
           - Normal vector of the side of surface the objects should be placed on. Default: [0., 0., 1.].
           - mathutils.Vector
+        * - proposal_batch_size
+          - If bigger than 1, this number of candidate poses is sampled at once. Candidates which are certainly not
+            above the surface or violate the spacing are rejected via numpy on their bounding boxes, only the
+            remaining ones are applied to blender and checked in detail. Candidates, whose bounding boxes overlap
+            with no placed object, are tried first. Only works for objects with the XYZ rotation mode. Default: 1.
+          - int
     """
 
     def __init__(self, config):
@@ -60,6 +70,7 @@ def __init__(self, config):
         self.max_distance = config.get_float("max_distance", 0.6)
 
         self.placed_objects = []
+        self.placed_objects_index = AABBIndex()
         self.surface = None
         self.surface_height = None
 
@@ -107,8 +118,8 @@ def collision(first_obj, second_obj):
         """
         intersection = check_bb_intersection(first_obj, second_obj)
         if intersection:
-            # check for more refined collisions
-            intersection, cache = check_intersection(first_obj, second_obj)
+            # check for more refined collisions, the trees of already placed objects are reused via the scene cache
+            intersection, cache = CollisionUtility.check_mesh_intersection(MeshObject(first_obj), MeshObject(second_obj), bvh_cache=BVHCache.get_scene_cache())
 
         return intersection
 
@@ -118,8 +129,9 @@ def check_collision_free(self, obj):
         :param obj: Object for which the check is carried out. Type: blender object.
         :return: True if object is collision free, if not - False.
         """
-        for already_placed in self.placed_objects:
-            if self.collision(obj, already_placed):
+        # only the placed objects with overlapping bounding boxes can collide
+        for already_placed in self.placed_objects_index.query_object(MeshObject(obj)):
+            if self.collision(obj, already_placed.blender_obj):
                 return False
 
         return True
@@ -135,6 +147,99 @@ def drop(self, obj):
 
         obj.location -= self.up_direction * (obj_height - self.surface_height)
 
+    def _try_pose(self, obj, position, rotation):
+        """ Puts the object at the given pose, drops it onto the surface and checks if it is placed correctly.
+
+        :param obj: Object to place. Type: blender object.
+        :param position: The sampled position. Type: mathutils.Vector.
+        :param rotation: The sampled rotation as euler angles. Type: mathutils.Vector.
+        :return: True, if the object has been placed successfully.
+        """
+        obj.location = position
+        obj.rotation_euler = rotation
+        bpy.context.view_layer.update()
+
+        if not self.check_collision_free(obj):
+            print("Collision detected, retrying!")
+            return False
+
+        if not self.check_above_surface(obj):
+            print("Not above surface, retrying!")
+            return False
+
+        self.drop(obj)
+        bpy.context.view_layer.update()
+
+        if not self.check_above_surface(obj):
+            print("Not above surface after drop, retrying!")
+            return False
+
+        if not self.check_spacing(obj):
+            print("Bad spacing after drop, retrying!")
+            return False
+
+        if not self.check_collision_free(obj):
+            print("Collision detected after drop, retrying!")
+            return False
+
+        return True
+
+    def _prefilter_candidates(self, obj, positions, rotations):
+        """ Rejects all candidate poses, which would certainly fail the checks in _try_pose(), at once via numpy.
+
+        A candidate is rejected, if one of its bounding box corners cannot hit the bounding box of the surface
+        (before or after the drop) or if its spacing to the placed objects is invalid after the drop. Collisions
+        cannot be decided on bounding boxes, so the candidates whose bounding boxes do not overlap with any placed
+        object are just returned first.
+
+        :param obj: Object to place. Type: blender object.
+        :param positions: The sampled positions. Type: numpy array of shape [K, 3].
+        :param rotations: The sampled rotations as euler angles. Type: numpy array of shape [K, 3].
+        :return: The indices of the remaining candidates in the order in which they should be tried.
+        """
+        up_direction = np.array(self.up_direction)
+        corners = CollisionUtility.get_candidate_bound_boxes(MeshObject(obj), positions, rotations)
+        surface_corners = np.array(get_bounds(self.surface))
+        # A ray which hits the surface also hits its axis aligned bounding box, the margin accounts for rounding errors
+        surface_min, surface_max = surface_corners.min(axis=0) - 1e-5, surface_corners.max(axis=0) + 1e-5
+        valid = np.all(OnSurfaceSampler._rays_hit_box(corners + up_direction, -up_direction, surface_min, surface_max), axis=1)
+
+        # Drop all candidates onto the surface
+        drop_distances = (corners @ up_direction).min(axis=1) - self.surface_height
+        corners = corners - drop_distances[:, None, None] * up_direction
+        positions = positions - drop_distances[:, None] * up_direction
+        valid &= np.all(OnSurfaceSampler._rays_hit_box(corners + up_direction, -up_direction, surface_min, surface_max), axis=1)
+
+        if self.placed_objects:
+            placed_locations = np.array([placed.location for placed in self.placed_objects])
+            closest_distances = np.linalg.norm(positions[:, None] - placed_locations[None], axis=2).min(axis=1)
+            # Keep a small margin, the exact check in _try_pose() decides about the candidates at the border
+            valid &= (closest_distances >= self.min_distance - 1e-5) & (closest_distances <= self.max_distance + 1e-5)
+
+        overlapping = self.placed_objects_index.overlaps_any(corners.min(axis=1), corners.max(axis=1))
+        candidates = np.flatnonzero(valid)
+        return candidates[np.argsort(overlapping[candidates], kind="stable")]
+
+    @staticmethod
+    def _rays_hit_box(origins, direction, box_min, box_max):
+        """ Checks for many rays with the same direction, whether they hit the given axis aligned box (slab test).
+
+        :param origins: The origins of the rays. Type: numpy array of shape [..., 3].
+        :param direction: The direction of all rays. Type: numpy array of shape [3].
+        :param box_min: The minimum point of the box. Type: numpy array of shape [3].
+        :param box_max: The maximum point of the box. Type: numpy array of shape [3].
+        :return: A boolean numpy array of shape [...], which is True for all rays hitting the box.
+        """
+        parallel = direction == 0
+        safe_direction = np.where(parallel, 1, direction)
+        t_first = (box_min - origins) / safe_direction
+        t_second = (box_max - origins) / safe_direction
+        # Rays which are parallel to a slab either always or never lie inside of it
+        inside = (origins >= box_min) & (origins <= box_max)
+        t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t_first, t_second)).max(axis=-1)
+        t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t_first, t_second)).min(axis=-1)
+        return (t_near <= t_far) & (t_far >= 0)
+
     def run(self):
         """ Samples the selected objects poses on a selected surface. """
         max_tries = self.config.get_int("max_iterations", 100)
@@ -150,6 +255,8 @@ def run(self):
         surface_bounds = get_bounds(self.surface)
         self.surface_height = max([self.up_direction.dot(corner) for corner in surface_bounds])
 
+        batch_size = self.config.get_int("proposal_batch_size", 1)
+
         for obj in objects:
             if obj.type == "MESH":
 
@@ -157,41 +264,29 @@ def run(self):
 
                 placed_successfully = False
 
-                for i in range(max_tries):
-                    position = self.config.get_vector3d("pos_sampler")
-                    rotation = self.config.get_vector3d("rot_sampler")
-
-                    obj.location = position
-                    obj.rotation_euler = rotation
-
-                    if not self.check_collision_free(obj):
-                        print("Collision detected, retrying!")
-                        continue
-
-                    if not self.check_above_surface(obj):
-                        print("Not above surface, retrying!")
-                        continue
-
-                    self.drop(obj)
-
-                    if not self.check_above_surface(obj):
-                        print("Not above surface after drop, retrying!")
-                        continue
-
-                    if not self.check_spacing(obj):
-                        print("Bad spacing after drop, retrying!")
-                        continue
-
-                    if not self.check_collision_free(obj):
-                        print("Collision detected after drop, retrying!")
-                        continue
-
-                    print("Placed object \"{}\" successfully at {} after {} iterations!".format(obj.name, obj.location,
-                                                                                                i + 1))
-                    self.placed_objects.append(obj)
-
-                    placed_successfully = True
-                    break
+                tries = 0
+                while tries < max_tries and not placed_successfully:
+                    num_candidates = min(batch_size, max_tries - tries)
+                    positions = np.array([self.config.get_vector3d("pos_sampler") for _ in range(num_candidates)])
+                    rotations = np.array([self.config.get_vector3d("rot_sampler") for _ in range(num_candidates)])
+
+                    if num_candidates > 1:
+                        candidates = self._prefilter_candidates(obj, positions, rotations)
+                        if len(candidates) < num_candidates:
+                            print("Rejected {} of {} candidates via their bounding boxes".format(num_candidates - len(candidates), num_candidates))
+                    else:
+                        candidates = range(num_candidates)
+
+                    for num_tried, i in enumerate(candidates):
+                        if self._try_pose(obj, positions[i], rotations[i]):
+                            print("Placed object \"{}\" successfully at {} after {} iterations!".format(obj.name, obj.location,
+                                                                                                        tries + num_tried + 1))
+                            self.placed_objects.append(obj)
+                            self.placed_objects_index.add(MeshObject(obj))
+
+                            placed_successfully = True
+                            break
+                    tries += num_candidates
 
                 if not placed_successfully:
                     print("Giving up on {}, deleting...".format(obj.name))
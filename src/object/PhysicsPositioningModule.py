@@ -1,3 +1,5 @@
+from typing import List
+
 from src.main.Module import Module
 from src.utility.BlenderUtility import get_all_blender_mesh_objects, get_bound_volume
 from src.utility.MeshObjectUtility import MeshObject
@@ -19,6 +21,12 @@ class PhysicsPositioningModule(Module):
     If an attribute for an object is not set via the custom properties, then the corresponding default value from this module's configuration is used.
     See the following table for detailed descriptions about each physics attribute.
 
+    Many small independent scenes (e.g. totes filled with objects) can be simulated together in one run by setting the
+    custom property `physics_cell` of their objects: All objects with the same value form one cell. The cells are
+    temporarily laid out next to each other, simulated together and afterwards moved back to their original places.
+    Passive objects without this custom property are simulated at their current place, active ones are simulated
+    together in an extra cell.
+
     **Configuration**:
 
     .. list-table::
@@ -33,8 +41,8 @@ class PhysicsPositioningModule(Module):
             an object is still recognized as 'stopped moving'. Default: 0.01
           - float
         * - object_stopped_rotation_threshold
-          - The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
-            that an object is still recognized as 'stopped moving'. Default: 0.1
+          - The maximum rotation angle (in radians) per second that is allowed, such that an object is still
+            recognized as 'stopped moving'. Default: 0.1
           - float
         * - min_simulation_time
           - The minimum number of seconds to simulate. Default: 4.0
@@ -84,10 +92,18 @@ class PhysicsPositioningModule(Module):
           - Amount of linear velocity that is lost over time. This value is used if for an object no custom property `physics_linear_damping` is set.
             Default: 0.04. Range: [0, 1]
           - float
+        * - cell_margin
+          - The minimum distance in meter between two cells, which are simulated together. Only used if objects
+            have the custom property `physics_cell`. Default: 1.0
+          - float
         * - convex_decomposition_cache_path
-          - If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped.
+          - If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped. The cache can be shared by multiple runs and can be filled ahead of time via scripts/precompute_convex_decompositions.py.
             Default: "resources/decomposition_cache"
           - string
+        * - convex_decomposition_processes
+          - The maximum number of V-HACD processes, which decompose objects in parallel. If 0 is given, the number
+            of cpus is used. Default: 0
+          - int
     """
 
     def __init__(self, config):
@@ -103,19 +119,37 @@ def __init__(self, config):
         self.angular_damping = self.config.get_float("angular_damping", 0.1)
         self.linear_damping = self.config.get_float("linear_damping", 0.04)
         self.convex_decomposition_cache_path = self.config.get_string("convex_decomposition_cache_path", "resources/decomposition_cache")
+        self.convex_decomposition_processes = self.config.get_int("convex_decomposition_processes", 0) or None
 
     def run(self):
         """ Performs physics simulation in the scene. """
         self._add_rigidbody()
-        PhysicsSimulation.simulate_and_fix_final_poses(
-            min_simulation_time=self.config.get_float("min_simulation_time", 4.0),
-            max_simulation_time=self.config.get_float("max_simulation_time", 40.0),
-            check_object_interval=self.config.get_float("check_object_interval", 2.0),
-            object_stopped_location_threshold=self.config.get_float("object_stopped_location_threshold", 0.01),
-            object_stopped_rotation_threshold=self.config.get_float("object_stopped_rotation_threshold", 0.1),
-            substeps_per_frame=self.config.get_int("substeps_per_frame", 10),
-            solver_iters=self.config.get_int("solver_iters", 10)
-        )
+        simulation_params = {
+            "min_simulation_time": self.config.get_float("min_simulation_time", 4.0),
+            "max_simulation_time": self.config.get_float("max_simulation_time", 40.0),
+            "check_object_interval": self.config.get_float("check_object_interval", 2.0),
+            "object_stopped_location_threshold": self.config.get_float("object_stopped_location_threshold", 0.01),
+            "object_stopped_rotation_threshold": self.config.get_float("object_stopped_rotation_threshold", 0.1),
+            "substeps_per_frame": self.config.get_int("substeps_per_frame", 10),
+            "solver_iters": self.config.get_int("solver_iters", 10)
+        }
+
+        cells = self._collect_cells()
+        if cells:
+            PhysicsSimulation.simulate_and_fix_final_poses_in_cells(cells, cell_margin=self.config.get_float("cell_margin", 1.0), **simulation_params)
+        else:
+            PhysicsSimulation.simulate_and_fix_final_poses(**simulation_params)
+
+    def _collect_cells(self) -> List[List[MeshObject]]:
+        """ Groups all mesh objects by their custom property `physics_cell`.
+
+        :return: The list of cells, each given as the list of its objects. Empty, if no object has the custom property.
+        """
+        cells = {}
+        for obj in get_all_blender_mesh_objects():
+            if "physics_cell" in obj:
+                cells.setdefault(obj["physics_cell"], []).append(MeshObject(obj))
+        return list(cells.values())
 
     def _add_rigidbody(self):
         """ Adds a rigidbody element to all mesh objects and sets their physics attributes depending on their custom properties """
@@ -127,6 +161,7 @@ def get_physics_attribute(obj, cp_name, default_value):
             else:
                 return default_value
 
+        objects_to_decompose = []
         # Go over all mesh objects and set their physics attributes based on the custom properties or (if not set) based on the module config
         for obj in get_all_blender_mesh_objects():
             mesh_obj = MeshObject(obj)
@@ -159,5 +194,9 @@ def get_physics_attribute(obj, cp_name, default_value):
 
                 # Check if object needs decomposition
                 if collision_shape == "CONVEX_DECOMPOSITION":
-                    mesh_obj.build_convex_decomposition_collision_shape(self._temp_dir, self.convex_decomposition_cache_path)
+                    objects_to_decompose.append(mesh_obj)
+
+        # Decompose all objects at once, s.t. the decompositions are computed in parallel
+        if objects_to_decompose:
+            MeshObject.build_convex_decomposition_collision_shapes(objects_to_decompose, self._temp_dir, self.convex_decomposition_cache_path, self.convex_decomposition_processes)
 
@@ -1,9 +1,11 @@
 import addon_utils
 import bpy
 
+from src.main.GlobalStorage import GlobalStorage
 from src.main.Module import Module
 from src.utility.Config import Config
 from src.utility.RendererUtility import RendererUtility
+from src.utility.SegMapRendererUtility import SegMapRendererUtility
 
 
 class RendererInterface(Module):
@@ -128,6 +130,30 @@ class RendererInterface(Module):
         * - render_diffuse_color
           - If true, the diffuse color image are also rendered. Default: False
           - bool
+        * - render_segmentation
+          - If true, segmentation maps are created from the object index pass of the same rendering, instead of
+            running the SegMapRenderer afterwards. Default: False
+          - bool
+        * - segmentation_map_by
+          - Method to be used for mapping the object indices. Available: [instance, class] or any custom property or
+            attribute, see the SegMapRenderer. Default: "class"
+          - string/list
+        * - segmentation_default_values
+          - The default values used for the keys used in segmentation_map_by. Default: {}
+          - dict
+        * - segmentation_output_file_prefix
+          - The file prefix that should be used when writing the segmentation maps. Default: `"segmap_"`
+          - string
+        * - segmentation_output_key
+          - The key which should be used for storing the segmentation maps in a merged file. Default: `"segmap"`
+          - string
+        * - segcolormap_output_file_prefix
+          - The file prefix that should be used when writing the instance attribute map. Default:
+            `"instance_attribute_map"`
+          - string
+        * - segcolormap_output_key
+          - The key which should be used for storing the instance attribute map. Default: `"segcolormap"`
+          - string
     """
 
     def __init__(self, config: Config):
@@ -215,11 +241,34 @@ def _render(self, default_prefix: str, default_key: str, output_key_parameter_na
                 self.config.get_string("diffuse_color_output_key", "diffuse")
             )
 
+        render_segmentation = self.config.get_bool("render_segmentation", False)
+        if render_segmentation:
+            RendererUtility.enable_segmentation_output(self._temp_dir, "instance_")
+
         RendererUtility.set_output_format(file_format, enable_transparency=enable_transparency)
         if not self._avoid_output:
+            background_writer = None
+            # A writer later in the pipeline might want to write the frames while the next frames are rendered
+            if GlobalStorage.is_in_storage("background_writer_factory"):
+                background_writer = GlobalStorage.get("background_writer_factory")()
+
             RendererUtility.render(
                 self._determine_output_dir(),
                 self.config.get_string(output_file_prefix_parameter_name, default_prefix),
                 self.config.get_string(output_key_parameter_name, default_key),
-                return_data=False
+                return_data=False,
+                background_writer=background_writer
             )
+
+            if render_segmentation:
+                SegMapRendererUtility.decode_index_pass(
+                    self._temp_dir,
+                    "instance_",
+                    self._determine_output_dir(),
+                    self.config.get_raw_dict("segmentation_map_by", "class"),
+                    self.config.get_raw_dict("segmentation_default_values", {}),
+                    self.config.get_string("segmentation_output_file_prefix", "segmap_"),
+                    self.config.get_string("segmentation_output_key", "segmap"),
+                    self.config.get_string("segcolormap_output_file_prefix", "instance_attribute_map"),
+                    self.config.get_string("segcolormap_output_key", "segcolormap")
+                )
@@ -23,9 +23,15 @@
 # Read args
 argv = sys.argv
 batch_index_file = None
+worker_queue_dir = None
+worker_idle_timeout = None
 
 if "--batch-process" in argv:
     batch_index_file = argv[argv.index("--batch-process") + 1]
+if "--worker" in argv:
+    worker_queue_dir = argv[argv.index("--worker") + 1]
+if "--worker-idle-timeout" in argv:
+    worker_idle_timeout = float(argv[argv.index("--worker-idle-timeout") + 1])
 
 argv = argv[argv.index("--") + 1:]
 working_dir = os.path.dirname(os.path.abspath(__file__))
@@ -40,14 +46,21 @@
 config_path = argv[0]
 temp_dir = argv[1]
 
-if batch_index_file == None:
+if worker_queue_dir is not None:
+    from src.main.Worker import Worker
+    worker = Worker(worker_queue_dir, working_dir, temp_dir, idle_timeout=worker_idle_timeout)
+    worker.run()
+elif batch_index_file == None:
     pipeline = Pipeline(config_path, argv[2:], working_dir, temp_dir)
     pipeline.run()
 else:
+    from src.main.Worker import Worker
     with open(Utility.resolve_path(batch_index_file), "r") as f:
         lines = f.readlines()
 
         for line in lines:
+            # Make sure every scene starts from a clean blender state
+            Worker.reset_scene()
             args = line.split(" ")
             pipeline = Pipeline(config_path, args, working_dir, temp_dir)
             pipeline.run()
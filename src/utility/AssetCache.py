@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Callable, List, Union
+
+import bpy
+
+
+class AssetCache:
+    """ A persistent on-disk cache of imported assets, which is shared between runs.
+
+    The first time a model file is imported, the resulting objects (together with their meshes, materials and custom
+    properties) are written into a .blend library. All later imports of the same file are appended from this library
+    via bpy.data.libraries.load, which is much faster than parsing .obj or .ply files again.
+
+    The cache is content-addressed: the name of a cached .blend file is the hash of the absolute source path, its
+    modification time and size, the name of the loader, the import options and the blender version. So changing
+    any of them automatically leads to a new import. Files referenced by the model file (e.g. .mtl files or textures)
+    are not part of the key, so the cache directory has to be cleared after changing them.
+
+    The cache is disabled by default. It is enabled by setting a cache directory, either via set_cache_dir() or via
+    the "BLENDER_PROC_ASSET_CACHE_DIR" environment variable. Several concurrent runs can share one cache directory,
+    as each cache file is written into a temporary file first and is then atomically moved into place.
+    """
+
+    _cache_dir = os.environ.get("BLENDER_PROC_ASSET_CACHE_DIR")
+
+    @staticmethod
+    def set_cache_dir(cache_dir: Union[str, None]):
+        """ Sets the directory of the asset cache.
+
+        :param cache_dir: The path to the cache directory. If None is given, the cache is disabled.
+        """
+        AssetCache._cache_dir = cache_dir
+
+    @staticmethod
+    def get_cache_dir() -> Union[str, None]:
+        """ Returns the directory of the asset cache.
+
+        :return: The path to the cache directory or None, if the cache is disabled.
+        """
+        return AssetCache._cache_dir
+
+    @staticmethod
+    def _get_cache_path(source_path: str, loader_name: str, import_options: dict) -> str:
+        """ Returns the path of the .blend file, which caches the given import.
+
+        :param source_path: The path to the imported model file.
+        :param loader_name: The name of the loader, which imports the file.
+        :param import_options: All options, which change the result of the import.
+        :return: The path to the .blend file in the cache directory.
+        """
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+        key = json.dumps([source_path, stat.st_mtime_ns, stat.st_size, loader_name, import_options,
+                          bpy.app.version_string], sort_keys=True, default=str)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(AssetCache._cache_dir, digest[:2], digest + ".blend")
+
+    @staticmethod
+    def import_cached(source_path: str, import_fct: Callable[[], List[bpy.types.Object]], loader_name: str,
+                      import_options: dict = None) -> List[bpy.types.Object]:
+        """ Imports the given model file via the asset cache.
+
+        If the import is already cached, the objects are appended from the cache, otherwise the given import function
+        is called and its result is written into the cache. In both cases, only the imported objects are selected
+        afterwards, as it is the case after calling a blender importer.
+
+        :param source_path: The path to the model file, which should be imported.
+        :param import_fct: A function, which imports the model file and returns the newly created objects.
+        :param loader_name: The name of the loader, s.t. different loaders of the same file do not share a cache entry.
+        :param import_options: All options, which change the result of the import.
+        :return: The list of imported objects.
+        """
+        if AssetCache._cache_dir is None:
+            return import_fct()
+
+        cache_path = AssetCache._get_cache_path(source_path, loader_name, import_options if import_options is not None else {})
+        if os.path.exists(cache_path):
+            try:
+                return AssetCache._load(cache_path)
+            except OSError as e:
+                print("Warning: Could not load {} from the asset cache, importing it again: {}".format(source_path, e))
+
+        objects = import_fct()
+        AssetCache._store(cache_path, objects)
+        return objects
+
+    @staticmethod
+    def _load(cache_path: str) -> List[bpy.types.Object]:
+        """ Appends all objects of the given cache file to the current scene and selects them.
+
+        :param cache_path: The path to the cached .blend file.
+        :return: The list of appended objects.
+        """
+        with bpy.data.libraries.load(cache_path, link=False) as (data_from, data_to):
+            data_to.objects = data_from.objects
+
+        for obj in bpy.context.selected_objects:
+            obj.select_set(False)
+        for obj in data_to.objects:
+            bpy.context.collection.objects.link(obj)
+            obj.select_set(True)
+        return list(data_to.objects)
+
+    @staticmethod
+    def _store(cache_path: str, objects: List[bpy.types.Object]):
+        """ Writes the given objects and all datablocks they depend on into the given cache file.
+
+        :param cache_path: The path to the .blend file, which should be written.
+        :param objects: The objects to store.
+        """
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write into a temporary file first, s.t. no other run can read a half written file
+        temp_path = "{}.{}.tmp".format(cache_path, uuid.uuid4().hex)
+        # Make paths to images absolute, as the cache file is not located next to the source file
+        bpy.data.libraries.write(temp_path, set(objects), path_remap="ABSOLUTE")
+        os.replace(temp_path, cache_path)
@@ -0,0 +1,341 @@
+import hashlib
+import weakref
+from typing import List, Tuple, Union
+
+import bpy
+import mathutils
+import numpy as np
+
+from src.main.GlobalStorage import GlobalStorage
+from src.utility.MeshObjectUtility import MeshObject
+from src.utility.Tracer import Tracer
+
+
+class TriangleBVH:
+    """ A bounding volume hierarchy over world-space triangles, which is built and traversed with numpy only.
+
+    In contrast to mathutils.bvhtree.BVHTree, which casts one ray per python call, this tree casts a whole batch of
+    rays at once. The traversal is done breadth first for all rays together, s.t. every level of the tree costs only
+    a few array operations.
+
+    The tree is built by sorting the triangles along a morton curve of their centroids. Consecutive triangles are then
+    grouped into leaves of leaf_size triangles and the leaves are merged pairwise level by level, until only the root
+    is left. Every triangle can carry an id (e.g. the index of the object it belongs to), which is returned for each hit.
+    """
+
+    @Tracer.traced("bvh", "TriangleBVH.build")
+    def __init__(self, triangles: np.ndarray, triangle_ids: np.ndarray = None, objects: list = None, leaf_size: int = 8):
+        """
+        :param triangles: The world-space triangles. Type: numpy array of shape [N, 3, 3].
+        :param triangle_ids: An id per triangle, which is returned for every hit. Per default the triangle index is used. Type: numpy array of shape [N].
+        :param objects: An optional list of objects, which can be indexed by the triangle ids.
+        :param leaf_size: The number of triangles per leaf.
+        """
+        triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+        if triangle_ids is None:
+            triangle_ids = np.arange(len(triangles))
+        self.objects = objects
+        self._leaf_size = leaf_size
+        self._levels = []
+
+        if len(triangles) == 0:
+            self._v0 = self._e1 = self._e2 = np.zeros((0, 3))
+            self._triangle_ids = np.zeros(0, dtype=np.int64)
+            return
+
+        # Sort the triangles along the morton curve, s.t. close triangles end up in the same leaves
+        order = np.argsort(TriangleBVH._morton_codes(triangles.mean(axis=1)), kind="stable")
+        triangles = triangles[order]
+        self._triangle_ids = np.asarray(triangle_ids)[order]
+        # Precompute everything the intersection test needs
+        self._v0 = triangles[:, 0]
+        self._e1 = triangles[:, 1] - self._v0
+        self._e2 = triangles[:, 2] - self._v0
+
+        # Bounding boxes of the leaves
+        starts = np.arange(0, len(triangles), leaf_size)
+        level_min = np.minimum.reduceat(triangles.min(axis=1), starts, axis=0)
+        level_max = np.maximum.reduceat(triangles.max(axis=1), starts, axis=0)
+        self._levels.append((level_min, level_max))
+        # Merge pairs of nodes until only the root is left, node i has the children 2i and 2i + 1 on the level below
+        while len(level_min) > 1:
+            pairs = np.arange(0, len(level_min), 2)
+            level_min = np.minimum.reduceat(level_min, pairs, axis=0)
+            level_max = np.maximum.reduceat(level_max, pairs, axis=0)
+            self._levels.append((level_min, level_max))
+
+    @staticmethod
+    def _morton_codes(points: np.ndarray) -> np.ndarray:
+        """ Computes a 30-bit morton code for each of the given points, based on their position in the bounding box of all points.
+
+        :param points: The points. Type: numpy array of shape [N, 3].
+        :return: The morton codes. Type: numpy array of shape [N].
+        """
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        quantized = ((points - lower) / np.maximum(upper - lower, 1e-12) * 1023).astype(np.uint64)
+        # Spread the 10 bits of each coordinate, s.t. there are two zero bits between each of them
+        quantized = (quantized * 0x00010001) & 0xFF0000FF
+        quantized = (quantized * 0x00000101) & 0x0F00F00F
+        quantized = (quantized * 0x00000011) & 0xC30C30C3
+        quantized = (quantized * 0x00000005) & 0x49249249
+        return (quantized[:, 0] << 2) | (quantized[:, 1] << 1) | quantized[:, 2]
+
+    @Tracer.traced("raycast")
+    def ray_cast(self, origins: np.ndarray, directions: np.ndarray, distance: Union[float, np.ndarray] = np.inf) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ Casts all given rays and returns the closest hit of each one.
+
+        Like mathutils.bvhtree.BVHTree.ray_cast() triangles are hit from both sides and the directions do not need
+        to be normalized, the returned distances are always measured in world units.
+
+        :param origins: The origins of the rays. Type: numpy array of shape [R, 3] or [3].
+        :param directions: The directions of the rays. Type: numpy array of shape [R, 3].
+        :param distance: The maximum distance per ray, hits further away are ignored.
+        :return: A tuple of the hit mask [R], the hit locations [R, 3], the face normals [R, 3], the triangle ids [R] and the distances [R].
+                 For rays which hit nothing the location and normal are nan, the id is -1 and the distance is inf.
+        """
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        ray_count = len(directions)
+        origins = np.broadcast_to(np.asarray(origins, dtype=np.float64), (ray_count, 3))
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        max_distance = np.broadcast_to(np.asarray(distance, dtype=np.float64), (ray_count,))
+
+        hit = np.zeros(ray_count, dtype=bool)
+        locations = np.full((ray_count, 3), np.nan)
+        normals = np.full((ray_count, 3), np.nan)
+        ids = np.full(ray_count, -1, dtype=self._triangle_ids.dtype)
+        distances = np.full(ray_count, np.inf)
+        if not self._levels or ray_count == 0:
+            return hit, locations, normals, ids, distances
+
+        # Avoid divisions by zero in the slab test, a tiny direction component is as good as zero
+        safe_directions = np.where(np.abs(directions) < 1e-12, 1e-12, directions)
+        inv_directions = 1.0 / safe_directions
+
+        # Start with all rays at the root and go down level by level, keeping only the (ray, node) pairs whose box is hit
+        ray_indices = np.arange(ray_count)
+        node_indices = np.zeros(ray_count, dtype=np.int64)
+        for level in range(len(self._levels) - 1, -1, -1):
+            level_min, level_max = self._levels[level]
+            ray_origins, ray_inv_directions = origins[ray_indices], inv_directions[ray_indices]
+            t1 = (level_min[node_indices] - ray_origins) * ray_inv_directions
+            t2 = (level_max[node_indices] - ray_origins) * ray_inv_directions
+            t_near = np.minimum(t1, t2).max(axis=1)
+            t_far = np.maximum(t1, t2).min(axis=1)
+            box_hit = (t_near <= t_far) & (t_far >= 0) & (t_near <= max_distance[ray_indices])
+            ray_indices, node_indices = ray_indices[box_hit], node_indices[box_hit]
+
+            if level > 0:
+                # Continue with both children of each hit node
+                ray_indices = np.repeat(ray_indices, 2)
+                node_indices = (node_indices[:, None] * 2 + np.arange(2)).ravel()
+                valid = node_indices < len(self._levels[level - 1][0])
+                ray_indices, node_indices = ray_indices[valid], node_indices[valid]
+
+        # Test all triangles of the hit leaves (Moeller-Trumbore)
+        ray_indices = np.repeat(ray_indices, self._leaf_size)
+        triangle_indices = (node_indices[:, None] * self._leaf_size + np.arange(self._leaf_size)).ravel()
+        valid = triangle_indices < len(self._v0)
+        ray_indices, triangle_indices = ray_indices[valid], triangle_indices[valid]
+
+        ray_directions = directions[ray_indices]
+        e1, e2 = self._e1[triangle_indices], self._e2[triangle_indices]
+        p = np.cross(ray_directions, e2)
+        det = np.einsum("ij,ij->i", e1, p)
+        not_parallel = np.abs(det) > 1e-12
+        inv_det = 1.0 / np.where(not_parallel, det, 1.0)
+        s = origins[ray_indices] - self._v0[triangle_indices]
+        u = np.einsum("ij,ij->i", s, p) * inv_det
+        q = np.cross(s, e1)
+        v = np.einsum("ij,ij->i", ray_directions, q) * inv_det
+        t = np.einsum("ij,ij->i", e2, q) * inv_det
+        triangle_hit = not_parallel & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0) & (t <= max_distance[ray_indices])
+        ray_indices, triangle_indices, t = ray_indices[triangle_hit], triangle_indices[triangle_hit], t[triangle_hit]
+
+        # Keep only the closest hit per ray
+        order = np.lexsort((t, ray_indices))
+        ray_indices, triangle_indices, t = ray_indices[order], triangle_indices[order], t[order]
+        ray_indices, first = np.unique(ray_indices, return_index=True)
+        triangle_indices, t = triangle_indices[first], t[first]
+
+        hit[ray_indices] = True
+        distances[ray_indices] = t
+        locations[ray_indices] = origins[ray_indices] + directions[ray_indices] * t[:, None]
+        face_normals = np.cross(self._e1[triangle_indices], self._e2[triangle_indices])
+        normals[ray_indices] = face_normals / np.linalg.norm(face_normals, axis=1, keepdims=True)
+        ids[ray_indices] = self._triangle_ids[triangle_indices]
+        return hit, locations, normals, ids, distances
+
+    @staticmethod
+    def get_world_triangles(mesh_object: MeshObject, depsgraph: bpy.types.Depsgraph = None) -> np.ndarray:
+        """ Returns all triangles of the evaluated mesh of the given object in world coordinates.
+
+        :param mesh_object: The mesh object.
+        :param depsgraph: The depsgraph to evaluate the object in. If None is given, the current one is used.
+        :return: The triangles. Type: numpy array of shape [N, 3, 3].
+        """
+        if depsgraph is None:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+        evaluated_obj = mesh_object.blender_obj.evaluated_get(depsgraph)
+        mesh = evaluated_obj.to_mesh()
+        mesh.calc_loop_triangles()
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", vertices)
+        triangle_vertices = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int64)
+        mesh.loop_triangles.foreach_get("vertices", triangle_vertices)
+        evaluated_obj.to_mesh_clear()
+
+        local2world = np.array(mesh_object.blender_obj.matrix_world)
+        vertices = vertices.reshape(-1, 3) @ local2world[:3, :3].T + local2world[:3, 3]
+        return vertices[triangle_vertices.reshape(-1, 3)]
+
+    @staticmethod
+    def from_mesh_objects(mesh_objects: List[MeshObject], leaf_size: int = 8) -> "TriangleBVH":
+        """ Builds a tree over all triangles of the given objects.
+
+        The id of each triangle is the index of its object in the given list, the list itself is available via the
+        objects attribute of the tree.
+
+        :param mesh_objects: The list of mesh objects that should be put into the tree.
+        :param leaf_size: The number of triangles per leaf.
+        :return: The built tree.
+        """
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        triangles, triangle_ids = [np.zeros((0, 3, 3))], [np.zeros(0, dtype=np.int64)]
+        for i, mesh_object in enumerate(mesh_objects):
+            object_triangles = TriangleBVH.get_world_triangles(mesh_object, depsgraph)
+            triangles.append(object_triangles)
+            triangle_ids.append(np.full(len(object_triangles), i, dtype=np.int64))
+        return TriangleBVH(np.concatenate(triangles), np.concatenate(triangle_ids), list(mesh_objects), leaf_size)
+
+    @staticmethod
+    def from_scene(leaf_size: int = 8) -> "TriangleBVH":
+        """ Builds a tree over all visible mesh objects of the scene, which are the objects bpy.types.Scene.ray_cast() would consider.
+
+        :param leaf_size: The number of triangles per leaf.
+        :return: The built tree.
+        """
+        return TriangleBVH.from_mesh_objects([MeshObject(obj) for obj in bpy.context.scene.objects if obj.type == "MESH" and obj.visible_get()], leaf_size)
+
+
+class BVHCache:
+    """ A scene-level cache of the bvh trees, which are used for collision checks.
+
+    The geometry of every mesh is read from blender only once and stored in local space. As duplicated objects
+    usually have their own copy of the same mesh, the geometry is addressed by its content and not by the name of
+    the mesh datablock, so all duplicates share one entry.
+
+    A world-space tree is only built when it is requested and is kept until the transformation or the geometry of
+    its object changes, so static objects are never rebuilt, no matter how often a pose sampler asks for them.
+
+    The geometry hash of every mesh datablock is only computed again, if the number of its vertices, loops or polygons
+    changes or if blender reports a geometry update of the mesh via the depsgraph. So a lookup of an unchanged object
+    does not read its geometry and only a changed transformation just transforms the cached local geometry.
+
+    The cache of the current scene is available via BVHCache.get_scene_cache().
+    """
+
+    # All existing caches, they are notified about changed meshes by the depsgraph handler
+    _instances = weakref.WeakSet()
+
+    def __init__(self):
+        # geometry hash -> (local vertices, polygons)
+        self._geometries = {}
+        # mesh name -> (mesh signature, geometry hash)
+        self._mesh_hashes = {}
+        # object name -> (geometry hash, local2world matrix, world tree)
+        self._world_trees = {}
+
+        BVHCache._instances.add(self)
+        if BVHCache._on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.append(BVHCache._on_depsgraph_update)
+
+    @staticmethod
+    def _on_depsgraph_update(scene: bpy.types.Scene, depsgraph: bpy.types.Depsgraph):
+        """ Forgets the geometry hashes of all meshes, whose geometry has been changed.
+
+        :param scene: The updated scene.
+        :param depsgraph: The depsgraph, which contains the updates.
+        """
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Mesh) and update.is_updated_geometry:
+                for cache in list(BVHCache._instances):
+                    cache._mesh_hashes.pop(update.id.name, None)
+
+    @staticmethod
+    def get_scene_cache() -> "BVHCache":
+        """ Returns the cache of the current scene, it is created at the first call.
+
+        :return: The scene-level bvh cache.
+        """
+        if not GlobalStorage.is_in_storage("bvh_cache"):
+            GlobalStorage.set("bvh_cache", BVHCache())
+        return GlobalStorage.get("bvh_cache")
+
+    def _get_geometry(self, obj: MeshObject) -> Tuple[str, np.ndarray, list]:
+        """ Returns the local geometry of the given object and its hash.
+
+        :param obj: The mesh object.
+        :return: The hash of the geometry, the local vertices of shape [V, 3] and the list of polygons.
+        """
+        mesh = obj.get_mesh()
+        # Counting the elements is cheap, all other geometry changes are reported by the depsgraph handler
+        signature = (mesh.as_pointer(), len(mesh.vertices), len(mesh.loops), len(mesh.polygons))
+        if mesh.name in self._mesh_hashes:
+            cached_signature, geometry_hash = self._mesh_hashes[mesh.name]
+            if cached_signature == signature and geometry_hash in self._geometries:
+                vertices, polygons = self._geometries[geometry_hash]
+                return geometry_hash, vertices, polygons
+
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", vertices)
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+
+        geometry_hash = hashlib.sha1(vertices.tobytes() + loop_vertices.tobytes() + loop_totals.tobytes()).hexdigest()
+        if geometry_hash not in self._geometries:
+            # Polygons are stored in loop order, so they can be cut out of the loop vertices
+            polygons = [polygon.tolist() for polygon in np.split(loop_vertices, np.cumsum(loop_totals)[:-1])] if len(loop_totals) > 0 else []
+            self._geometries[geometry_hash] = (vertices.reshape(-1, 3).astype(np.float64), polygons)
+        self._mesh_hashes[mesh.name] = (signature, geometry_hash)
+        vertices, polygons = self._geometries[geometry_hash]
+        return geometry_hash, vertices, polygons
+
+    def get_world_tree(self, obj: MeshObject) -> mathutils.bvhtree.BVHTree:
+        """ Returns a bvh tree of the given object in world space.
+
+        The tree is only rebuilt if the transformation or the geometry of the object has changed since the last call.
+
+        :param obj: The mesh object.
+        :return: The bvh tree in world coordinates.
+        """
+        geometry_hash, vertices, polygons = self._get_geometry(obj)
+        local2world = obj.get_local2world_mat()
+        name = obj.get_name()
+        if name in self._world_trees:
+            cached_hash, cached_local2world, tree = self._world_trees[name]
+            if cached_hash == geometry_hash and np.array_equal(cached_local2world, local2world):
+                return tree
+
+        with Tracer.span("BVHCache.build_world_tree", "bvh"):
+            world_vertices = vertices @ local2world[:3, :3].T + local2world[:3, 3]
+            tree = mathutils.bvhtree.BVHTree.FromPolygons(world_vertices.tolist(), polygons)
+        self._world_trees[name] = (geometry_hash, local2world, tree)
+        return tree
+
+    def invalidate(self, obj: MeshObject = None):
+        """ Removes the world tree of the given object or, if None is given, all cached data.
+
+        This is only necessary if the geometry should be freed or if the vertices of a mesh have been changed without
+        a depsgraph update, all other changes are detected automatically.
+
+        :param obj: The object whose tree should be removed.
+        """
+        if obj is None:
+            self._geometries = {}
+            self._mesh_hashes = {}
+            self._world_trees = {}
+        else:
+            self._mesh_hashes.pop(obj.get_mesh().name, None)
+            self._world_trees.pop(obj.get_name(), None)
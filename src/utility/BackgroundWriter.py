@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Any, Union
+
+import bpy
+
+from src.utility.Tracer import Tracer
+
+
+class BackgroundWriter:
+    """ Overlaps rendering and writing by handing every finished frame to a pool of writer threads.
+
+    While the writer is active, a render_write handler is registered, which blender calls after a frame of an
+    animation has been rendered and all its images have been written to disk. The handler only submits the frame
+    number to the writer threads, so blender can directly continue with rendering the next frame, while the previous
+    frames are loaded, compressed and written in the background.
+
+    To keep memory bounded, at most `max_pending_frames` frames are queued or written at the same time. If the writer
+    threads cannot keep up, the handler blocks until a frame is done, which also pauses the rendering.
+
+    The write function is called from a writer thread, so it must not change any blender data. All information,
+    which cannot be read from the rendered files, should be collected before the rendering starts.
+
+    Usage:
+
+    .. code-block:: python
+
+        with BackgroundWriter(lambda frame: write(frame)):
+            bpy.ops.render.render(animation=True, write_still=True)
+
+    When the with block is left, the remaining frames are written and the first exception raised by the write
+    function (if any) is raised again.
+    """
+
+    def __init__(self, write_frame: Callable[[int], Any], num_threads: int = 1, max_pending_frames: int = 2,
+                 on_start: Union[Callable[[], Any], None] = None):
+        """
+        :param write_frame: The function, which is called with the number of each rendered frame.
+        :param num_threads: The number of writer threads.
+        :param max_pending_frames: The maximum amount of frames, which are queued or written at the same time.
+        :param on_start: An optional function, which is called right before the rendering starts, e.g. to collect \
+                         the outputs which should be written.
+        """
+        self._write_frame = write_frame
+        self._on_start = on_start
+        self._num_threads = max(num_threads, 1)
+        self._free_slots = threading.BoundedSemaphore(max(max_pending_frames, 1))
+        self._executor = None
+        self._error: Union[BaseException, None] = None
+
+    def __enter__(self) -> "BackgroundWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # If rendering failed, the error of the rendering is more important than the one of the writer
+        self.finish(raise_errors=exc_type is None)
+
+    def start(self):
+        """ Starts the writer threads and registers the render_write handler. """
+        if self._executor is not None:
+            raise Exception("The background writer has already been started.")
+        if self._on_start is not None:
+            self._on_start()
+        self._executor = ThreadPoolExecutor(max_workers=self._num_threads)
+        bpy.app.handlers.render_write.append(self._on_render_write)
+
+    def submit(self, frame: int):
+        """ Hands the given frame to the writer threads.
+
+        Blocks as long as there are already `max_pending_frames` frames in flight.
+
+        :param frame: The number of the frame, which should be written.
+        """
+        if self._executor is None:
+            raise Exception("The background writer has not been started.")
+        self._free_slots.acquire()
+        future = self._executor.submit(self._write_traced_frame, frame)
+        future.add_done_callback(self._on_frame_done)
+
+    def finish(self, raise_errors: bool = True):
+        """ Unregisters the render_write handler and waits until all submitted frames are written.
+
+        :param raise_errors: If True, the first exception raised by the write function is raised again.
+        """
+        if self._on_render_write in bpy.app.handlers.render_write:
+            bpy.app.handlers.render_write.remove(self._on_render_write)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if raise_errors and self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_traced_frame(self, frame: int):
+        """ Calls the write function for the given frame and records it as span, if tracing is enabled.
+
+        :param frame: The number of the frame, which should be written.
+        """
+        with Tracer.span("background write frame", "writer", frame=frame):
+            self._write_frame(frame)
+
+    def _on_render_write(self, scene: bpy.types.Scene, *args):
+        """ The render_write handler, which submits the frame which has just been written by blender.
+
+        :param scene: The rendered scene.
+        """
+        # Exceptions in handlers do not stop the rendering, so just skip all remaining frames after an error
+        if self._error is None:
+            self.submit(scene.frame_current)
+
+    def _on_frame_done(self, future: Future):
+        """ Frees the slot of the written frame and remembers the first error.
+
+        :param future: The future of the written frame.
+        """
+        if self._error is None and future.exception() is not None:
+            self._error = future.exception()
+        self._free_slots.release()
@@ -6,7 +6,7 @@
 import glob
 import numpy as np
 import shutil
-from typing import List
+from typing import Iterable, List
 import png
 import cv2
 import bpy
@@ -16,6 +16,7 @@
 from src.utility.Utility import Utility
 from src.utility.PostProcessingUtility import PostProcessingUtility
 from src.utility.WriterUtility import WriterUtility
+from src.utility.Tracer import Tracer
 
 class BopWriterUtility:
     """ Saves the synthesized dataset in the BOP format. The dataset is split
@@ -102,14 +103,16 @@ def _save_depth(path, im):
 
 
     @staticmethod
-    def write(output_dir:str, depths:List[np.ndarray] = [], colors:List[np.ndarray] = [], color_file_format:str="PNG", 
+    @Tracer.traced("writer")
+    def write(output_dir:str, depths:Iterable[np.ndarray] = [], colors:Iterable[np.ndarray] = [], color_file_format:str="PNG", 
               dataset:str="", append_to_existing_output:bool=True, depth_scale:float=1.0, jpg_quality:int=95,
               save_world2cam:bool=True, ignore_dist_thres:float=100., m2mm:bool=True, frames_per_chunk:int=1000):
         """Write the BOP data
 
         :param output_dir: Path to the output directory.
-        :param depths: List of depth images in m to save
-        :param colors: List of color images to save
+        :param depths: List or iterator of depth images in m to save
+        :param colors: List or iterator of color images to save, e.g. from WriterUtility.split_frames(). Only one
+            frame is kept in memory at a time.
         :param color_file_format: File type to save color images. Available: "PNG", "JPEG"
         :param jpg_quality: If color_file_format is "JPEG", save with the given quality.
         :param dataset: Only save annotations for objects of the specified bop dataset. Saves all object poses if undefined.
@@ -246,15 +249,16 @@ def _get_frame_camera(save_world2cam, depth_scale=1.0, unit_scaling=1000., desti
         return frame_camera_dict
     
     @staticmethod
-    def _write_frames(chunks_dir: str, dataset_objects: list, depths: List[np.ndarray] = [], colors: List[np.ndarray] = [], 
+    def _write_frames(chunks_dir: str, dataset_objects: list, depths: Iterable[np.ndarray] = [], colors: Iterable[np.ndarray] = [], 
                       color_file_format:str="PNG", depth_scale:float=1.0, frames_per_chunk:int=1000, m2mm:bool=True, 
                       ignore_dist_thres:float=100., save_world2cam:bool=True, jpg_quality:int=95):
         """Write each frame's ground truth into chunk directory in BOP format
 
         :param chunks_dir: Path to the output directory of the current chunk.
         :param dataset_objects: Save annotations for these objects.
-        :param depths: List of depth images in m to save
-        :param colors: List of color images to save
+        :param depths: List or iterator of depth images in m to save
+        :param colors: List or iterator of color images to save, e.g. from WriterUtility.split_frames(). Only one
+            frame is kept in memory at a time.
         :param color_file_format: File type to save color images. Available: "PNG", "JPEG"
         :param jpg_quality: If color_file_format is "JPEG", save with the given quality.
         :param depth_scale: Multiply the uint16 output depth image with this factor to get depth in mm. Used to trade-off between depth accuracy 
@@ -310,10 +314,14 @@ def _write_frames(chunks_dir: str, dataset_objects: list, depths: List[np.ndarra
         # Go through all frames.
         num_new_frames = bpy.context.scene.frame_end - bpy.context.scene.frame_start
 
-        if len(depths) != len(colors) != num_new_frames:
+        if isinstance(depths, list) and isinstance(colors, list) and len(depths) != len(colors) != num_new_frames:
             raise Exception("The amount of images stored in the depths/colors does not correspond to the amount"
                             "of images specified by frame_start to frame_end.")
 
+        # Lists and iterators are both consumed frame by frame
+        color_iterator = iter(colors) if colors else None
+        depth_iterator = iter(depths) if depths else None
+
         for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
             # Activate frame.
             bpy.context.scene.frame_set(frame_id)
@@ -335,8 +343,8 @@ def _write_frames(chunks_dir: str, dataset_objects: list, depths: List[np.ndarra
             chunk_gt[curr_frame_id] = BopWriterUtility._get_frame_gt(dataset_objects, unit_scaling, ignore_dist_thres)
             chunk_camera[curr_frame_id] = BopWriterUtility._get_frame_camera(save_world2cam, depth_scale, unit_scaling)
 
-            if colors:
-                color_rgb = colors[frame_id]
+            if color_iterator is not None:
+                color_rgb = next(color_iterator)
                 color_bgr = color_rgb[...,::-1].copy()
                 if color_file_format == 'PNG':
                     rgb_fpath = rgb_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id, im_type='.png')
@@ -353,8 +361,8 @@ def _write_frames(chunks_dir: str, dataset_objects: list, depths: List[np.ndarra
                 rgb_fpath = rgb_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id, im_type=color_ext)
                 shutil.copyfile(rgb_output['path'] % frame_id, rgb_fpath)
 
-            if depths:
-                depth = depths[frame_id]
+            if depth_iterator is not None:
+                depth = next(depth_iterator)
             else:
                 # Load the resulting dist image.
                 dist_output = Utility.find_registered_output_by_key("distance")
@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Union
+
+from src.utility.FileLock import FileLock
+
+
+class CocoAnnotationStore:
+    """ An append-only store for coco annotations, which can be shared by many runs.
+
+    In contrast to merging the new annotations into the existing coco_annotations.json, adding new images to the
+    store only costs time proportional to the amount of new images and not to the size of the whole dataset.
+    The store is a directory with the following files:
+
+    - ledger.json: the next free image and annotation id
+    - info.json: the info and licenses sections of the coco annotations
+    - categories.jsonl, images.jsonl, annotations.jsonl: one coco record per line
+
+    All changes are serialized via a lock file, s.t. several concurrent runs can append to the same store.
+    The standard coco_annotations.json is written via compact().
+
+    This class does not depend on blender, so the store can be compacted from any python process.
+    """
+
+    def __init__(self, store_dir: str, coco_annotations_path: Union[str, None] = None):
+        """
+        :param store_dir: The path to the directory of the store. It is created, if it does not exist.
+        :param coco_annotations_path: The path to an existing coco_annotations.json. If the store is created, all
+                                      images and annotations of this file are imported once.
+        """
+        self.store_dir = os.path.abspath(store_dir)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._lock_path = os.path.join(self.store_dir, "store.lock")
+
+        with FileLock(self._lock_path):
+            if not os.path.exists(self._path("ledger.json")):
+                ledger = {"next_image_id": 0, "next_annotation_id": 0}
+                if coco_annotations_path is not None and os.path.exists(coco_annotations_path):
+                    with open(coco_annotations_path, "r") as f:
+                        existing_coco_annotations = json.load(f)
+                    self._write_info(existing_coco_annotations)
+                    self._append_records("categories.jsonl", existing_coco_annotations["categories"])
+                    self._append_records("images.jsonl", existing_coco_annotations["images"])
+                    self._append_records("annotations.jsonl", existing_coco_annotations["annotations"])
+                    ledger["next_image_id"] = max([image["id"] for image in existing_coco_annotations["images"]], default=-1) + 1
+                    ledger["next_annotation_id"] = max([annotation["id"] for annotation in existing_coco_annotations["annotations"]], default=-1) + 1
+                self._write_ledger(ledger)
+
+    def _path(self, file_name: str) -> str:
+        """ Returns the path of the given file inside the store.
+
+        :param file_name: The name of the file.
+        :return: The path to the file.
+        """
+        return os.path.join(self.store_dir, file_name)
+
+    def _read_ledger(self) -> dict:
+        """ Reads the next free ids from the ledger.
+
+        :return: The ledger as dict.
+        """
+        with open(self._path("ledger.json"), "r") as f:
+            return json.load(f)
+
+    def _write_ledger(self, ledger: dict):
+        """ Replaces the ledger, the file is written atomically.
+
+        :param ledger: The new ledger.
+        """
+        temp_path = self._path(".ledger.json")
+        with open(temp_path, "w") as f:
+            json.dump(ledger, f)
+        os.replace(temp_path, self._path("ledger.json"))
+
+    def _write_info(self, coco_annotations: dict):
+        """ Stores the info and licenses sections of the given coco annotations, if they have not been stored yet.
+
+        :param coco_annotations: The coco annotations dict.
+        """
+        if not os.path.exists(self._path("info.json")):
+            with open(self._path("info.json"), "w") as f:
+                json.dump({"info": coco_annotations["info"], "licenses": coco_annotations["licenses"]}, f)
+
+    def _read_records(self, file_name: str) -> list:
+        """ Reads all records of the given json lines file.
+
+        :param file_name: The name of the json lines file inside the store.
+        :return: The list of records.
+        """
+        if not os.path.exists(self._path(file_name)):
+            return []
+        with open(self._path(file_name), "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _append_records(self, file_name: str, records: list):
+        """ Appends the given records to the given json lines file.
+
+        :param file_name: The name of the json lines file inside the store.
+        :param records: The records to append.
+        """
+        with open(self._path(file_name), "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def reserve_image_ids(self, amount: int) -> int:
+        """ Reserves a range of image ids, which are not used by any other run.
+
+        The reserved ids can also be used to name the image files of the run without collisions.
+
+        :param amount: The amount of image ids to reserve.
+        :return: The first reserved image id.
+        """
+        with FileLock(self._lock_path):
+            ledger = self._read_ledger()
+            image_id_offset = ledger["next_image_id"]
+            ledger["next_image_id"] += amount
+            self._write_ledger(ledger)
+        return image_id_offset
+
+    def append(self, coco_annotations: dict, image_id_offset: int):
+        """ Appends the images, annotations and new categories of the given coco annotations to the store.
+
+        The image ids of the given coco annotations have to start at zero and are shifted by the given offset, the
+        annotation ids are shifted to the next free annotation id.
+
+        :param coco_annotations: The coco annotations dict of one run, as created by generate_coco_annotations().
+        :param image_id_offset: The first image id, which has been reserved via reserve_image_ids().
+        """
+        with FileLock(self._lock_path):
+            ledger = self._read_ledger()
+            annotation_id_offset = ledger["next_annotation_id"]
+
+            for image in coco_annotations["images"]:
+                image["id"] += image_id_offset
+            for annotation in coco_annotations["annotations"]:
+                annotation["id"] += annotation_id_offset
+                annotation["image_id"] += image_id_offset
+
+            # Only add categories, which are not stored yet
+            known_categories = [json.dumps(cat_dict, sort_keys=True) for cat_dict in self._read_records("categories.jsonl")]
+            new_categories = [cat_dict for cat_dict in coco_annotations["categories"]
+                              if json.dumps(cat_dict, sort_keys=True) not in known_categories]
+
+            self._write_info(coco_annotations)
+            self._append_records("categories.jsonl", new_categories)
+            self._append_records("images.jsonl", coco_annotations["images"])
+            self._append_records("annotations.jsonl", coco_annotations["annotations"])
+
+            ledger["next_image_id"] = max([ledger["next_image_id"]] + [image["id"] + 1 for image in coco_annotations["images"]])
+            ledger["next_annotation_id"] = max([annotation_id_offset] + [annotation["id"] + 1 for annotation in coco_annotations["annotations"]])
+            self._write_ledger(ledger)
+
+    def compact(self, coco_annotations_path: str):
+        """ Writes all records of the store as standard coco annotations file.
+
+        :param coco_annotations_path: The path of the coco annotations .json file, which should be written.
+        """
+        with FileLock(self._lock_path):
+            if os.path.exists(self._path("info.json")):
+                with open(self._path("info.json"), "r") as f:
+                    coco_annotations = json.load(f)
+            else:
+                coco_annotations = {"info": {}, "licenses": []}
+            coco_annotations["categories"] = self._read_records("categories.jsonl")
+            coco_annotations["images"] = self._read_records("images.jsonl")
+            coco_annotations["annotations"] = self._read_records("annotations.jsonl")
+
+            # Write into a temporary file first, s.t. readers never see a half written file. This happens inside the
+            # lock, so concurrent compactions do not mix their files.
+            temp_path = "{}.{}.tmp".format(coco_annotations_path, os.getpid())
+            with open(temp_path, "w") as f:
+                json.dump(coco_annotations, f)
+            os.replace(temp_path, coco_annotations_path)
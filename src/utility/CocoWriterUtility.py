@@ -9,19 +9,23 @@
 import shutil
 import numpy as np
 from skimage import measure
-from typing import List
+from typing import Iterable, List
 import cv2
 import bpy
 
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
+from src.utility.CocoAnnotationStore import CocoAnnotationStore
+from src.utility.Tracer import Tracer
 
 class CocoWriterUtility:
 
     @staticmethod
-    def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attribute_maps:List[dict]=[], colors:List[np.ndarray] = [], color_file_format:str="PNG",
+    @Tracer.traced("writer")
+    def write(output_dir: str, instance_segmaps:Iterable[np.ndarray] = [], instance_attribute_maps:List[dict]=[], colors:Iterable[np.ndarray] = [], color_file_format:str="PNG",
               mask_encoding_format="rle", supercategory="coco_annotations", append_to_existing_output:bool=True, segmap_output_key="segmap",
-              segcolormap_output_key="segcolormap", rgb_output_key="colors", jpg_quality:int=95, label_mapping: LabelIdMapping = None):
+              segcolormap_output_key="segcolormap", rgb_output_key="colors", jpg_quality:int=95, label_mapping: LabelIdMapping = None,
+              use_annotation_store: bool = False, compact_annotation_store: bool = False):
         """ Writes coco annotations in the following steps:
         1. Locate the seg images
         2. Locate the rgb maps
@@ -30,9 +34,10 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
         5. For each frame write the coco annotation
 
         :param output_dir: Output directory to write the coco annotations
-        :param instance_segmaps: List of instance segmentation maps
-        :param segcolormaps: per-frame mappings with idx, class and optionally supercategory/bop_dataset_name
-        :param colors: List of color images
+        :param instance_segmaps: List or iterator of instance segmentation maps
+        :param instance_attribute_maps: per-frame mappings with idx, class and optionally supercategory/bop_dataset_name
+        :param colors: List or iterator of color images, e.g. from WriterUtility.split_frames(). Only one frame is
+            kept in memory at a time.
         :param color_file_format: Format to save color images in
         :param mask_encoding_format: Encoding format of the binary masks. Default: 'rle'. Available: 'rle', 'polygon'.
         :param supercategory: name of the dataset/supercategory to filter for, e.g. a specific BOP dataset set by 'bop_dataset_name' or 
@@ -48,6 +53,12 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
             RgbRenderer module. Default: colors.
         :param label_mapping: The label mapping which should be used to label the categories based on their ids.
                               If None, is given then the `name` field in the csv files is used or - if not existing - the category id itself is used.
+        :param use_annotation_store: If true, the annotations are appended to the CocoAnnotationStore in coco_data/annotation_store
+            instead of rewriting the whole coco_annotations.json. The store is always appended to, an existing
+            coco_annotations.json is imported into it once.
+        :param compact_annotation_store: If true and the annotation store is used, the coco_annotations.json is written from
+            the store afterwards. This reads the whole store, so per default the store is only compacted once at the
+            end, e.g. via scripts/compact_coco_annotations.py.
         """
 
         # Create output directory
@@ -75,8 +86,15 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
                                 "with 'map_by' set to 'instance' before?".format(segcolormap_output_key))
 
         coco_annotations_path = os.path.join(output_dir, "coco_data/coco_annotations.json")
+        annotation_store = None
+        if use_annotation_store:
+            annotation_store = CocoAnnotationStore(os.path.join(output_dir, "coco_data", "annotation_store"), coco_annotations_path)
+            # Reserve the image ids of this run, they are also used to name the images without collisions
+            image_id_offset = annotation_store.reserve_image_ids(bpy.context.scene.frame_end - bpy.context.scene.frame_start)
+            image_offset = image_id_offset - bpy.context.scene.frame_start
+            existing_coco_annotations = None
         # Calculate image numbering offset, if append_to_existing_output is activated and coco data exists
-        if append_to_existing_output and os.path.exists(coco_annotations_path):
+        elif append_to_existing_output and os.path.exists(coco_annotations_path):
             with open(coco_annotations_path, 'r') as fp:
                 existing_coco_annotations = json.load(fp)
             image_offset = max([image["id"] for image in existing_coco_annotations["images"]]) + 1
@@ -84,15 +102,14 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
             image_offset = 0
             existing_coco_annotations = None
 
+        frames = range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)
         # collect all RGB paths
         new_coco_image_paths = []
         # collect all mappings from csv (backwards compat)
         segcolormaps = []
-        # collect all instance segmaps (backwards compat)
-        inst_segmaps = []
 
         # for each rendered frame
-        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+        for frame in frames:
 
             if not instance_attribute_maps:
                 # read colormappings, which include object name/class to integer mapping
@@ -103,39 +120,49 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
                         segcolormap.append(mapping)
                 segcolormaps.append(segcolormap)
 
-            if not instance_segmaps:
-                # Load segmaps (backwards compat)
-                segmap = np.load(segmentation_map_output["path"] % frame)
-                inst_channel = int(segcolormap[0]['channel_instance'])
-                inst_segmaps.append(segmap[:,:,inst_channel])
-
             if colors:
-                color_rgb = colors[frame]
-                color_bgr = color_rgb[...,::-1].copy()
-
-                if color_file_format=='PNG':
+                if color_file_format == 'PNG':
                     target_base_path = 'coco_data/rgb_{:04d}.png'.format(frame + image_offset)
-                    target_path = os.path.join(output_dir, target_base_path)
-                    cv2.imwrite(target_path, color_bgr)
-                elif color_file_format=='JPEG':
+                elif color_file_format == 'JPEG':
                     target_base_path = 'coco_data/rgb_{:04d}.jpg'.format(frame + image_offset)
-                    target_path = os.path.join(output_dir, target_base_path)
-                    cv2.imwrite(target_path, color_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), jpg_quality])
                 else:
-                    raise('Unknown color_file_format={}. Try "PNG" or "JPEG"'.format(color_file_format))
-
+                    raise Exception('Unknown color_file_format={}. Try "PNG" or "JPEG"'.format(color_file_format))
             else:
-                source_path = rgb_output["path"] % frame
-                target_base_path =  os.path.join('coco_data', os.path.basename(rgb_output["path"] % (frame + image_offset)))
-                target_path = os.path.join(output_dir, target_base_path)
-                shutil.copyfile(source_path, target_path)
+                target_base_path = os.path.join('coco_data', os.path.basename(rgb_output["path"] % (frame + image_offset)))
 
             new_coco_image_paths.append(target_base_path)
 
         instance_attibute_maps = segcolormaps if segcolormaps else instance_attribute_maps
-        instance_segmaps = inst_segmaps if inst_segmaps else instance_segmaps
 
-        coco_output = CocoWriterUtility.generate_coco_annotations(instance_segmaps,
+        def iterate_instance_segmaps():
+            """ Writes the color image of each frame and yields its instance segmap.
+
+            The colors and instance segmaps can be lists or iterators, as each frame is only read when it is needed,
+            only one frame has to be kept in memory at a time.
+            """
+            color_iterator = iter(colors) if colors else None
+            instance_segmap_iterator = iter(instance_segmaps) if instance_segmaps else None
+            for frame_index, frame in enumerate(frames):
+                target_path = os.path.join(output_dir, new_coco_image_paths[frame_index])
+                if color_iterator is not None:
+                    color_rgb = next(color_iterator)
+                    color_bgr = color_rgb[..., ::-1].copy()
+                    if color_file_format == 'PNG':
+                        cv2.imwrite(target_path, color_bgr)
+                    else:
+                        cv2.imwrite(target_path, color_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), jpg_quality])
+                else:
+                    shutil.copyfile(rgb_output["path"] % frame, target_path)
+
+                if instance_segmap_iterator is not None:
+                    yield next(instance_segmap_iterator)
+                else:
+                    # Load segmaps (backwards compat)
+                    segmap = np.load(segmentation_map_output["path"] % frame)
+                    inst_channel = int(instance_attibute_maps[frame_index][0]['channel_instance'])
+                    yield segmap[:, :, inst_channel]
+
+        coco_output = CocoWriterUtility.generate_coco_annotations(iterate_instance_segmaps(),
                                                                   instance_attibute_maps,
                                                                   new_coco_image_paths,
                                                                   supercategory,
@@ -143,16 +170,23 @@ def write(output_dir: str, instance_segmaps:List[np.ndarray] = [], instance_attr
                                                                   existing_coco_annotations,
                                                                   label_mapping)
 
-        print("Writing coco annotations to " + coco_annotations_path)
-        with open(coco_annotations_path, 'w') as fp:
-            json.dump(coco_output, fp)
+        if annotation_store is not None:
+            print("Appending coco annotations to " + annotation_store.store_dir)
+            annotation_store.append(coco_output, image_id_offset)
+            if compact_annotation_store:
+                print("Writing coco annotations to " + coco_annotations_path)
+                annotation_store.compact(coco_annotations_path)
+        else:
+            print("Writing coco annotations to " + coco_annotations_path)
+            with open(coco_annotations_path, 'w') as fp:
+                json.dump(coco_output, fp)
 
     @staticmethod
     def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, supercategory,
                                   mask_encoding_format, existing_coco_annotations=None, label_mapping: LabelIdMapping = None):
         """Generates coco annotations for images
 
-        :param inst_segmaps: List of instance segmentation maps
+        :param inst_segmaps: List or iterator of instance segmentation maps, each map is only read once
         :param inst_attribute_maps: per-frame mappings with idx, class and optionally supercategory/bop_dataset_name
         :param image_paths: A list of paths which points to the rendered segmentation maps.
         :param supercategory: name of the dataset/supercategory to filter for, e.g. a specific BOP dataset
@@ -163,8 +197,7 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
         :return: dict containing coco annotations
         """
 
-        categories = []
-        visited_categories = []
+        categories = {}
         instance_2_category_maps = []
 
         for inst_attribute_map in inst_attribute_maps:
@@ -180,7 +213,7 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
                         inst_supercategory = inst["supercategory"]
 
                     if supercategory == inst_supercategory or supercategory == 'coco_annotations':
-                        if int(inst["category_id"]) not in visited_categories:
+                        if int(inst["category_id"]) not in categories:
                             cat_dict = {}
                             cat_dict['id'] = int(inst["category_id"])
                             cat_dict['supercategory'] = inst_supercategory
@@ -193,8 +226,7 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
                             else:
                                 cat_dict["name"] = inst["category_id"]
 
-                            categories.append(cat_dict)
-                            visited_categories.append(cat_dict['id'])
+                            categories[cat_dict['id']] = cat_dict
                         instance_2_category_map[int(inst["idx"])] = int(inst["category_id"])
             instance_2_category_maps.append(instance_2_category_map)
 
@@ -221,27 +253,44 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
             image_id = len(images)
             images.append(CocoWriterUtility.create_image_info(image_id, image_path, inst_segmap.shape))
 
-            # Go through all objects visible in this image
-            instances = np.unique(inst_segmap)
-            # Remove background
-            instances = np.delete(instances, np.where(instances == 0))
-            for inst in instances:
-                if inst in instance_2_category_map:
-                    # Calc object mask
-                    binary_inst_mask = np.where(inst_segmap == inst, 1, 0)
-                    # Add coco info for object in this image
-                    annotation = CocoWriterUtility.create_annotation_info(len(annotations),
-                                                                    image_id,
-                                                                    instance_2_category_map[inst],
-                                                                    binary_inst_mask,
-                                                                    mask_encoding_format)
-                    if annotation is not None:
-                        annotations.append(annotation)
+            # Label all objects visible in this image in one pass, label_map contains for each pixel the index of its instance
+            instances, label_map = np.unique(inst_segmap, return_inverse=True)
+            label_map = label_map.reshape(inst_segmap.shape)
+            areas = np.bincount(label_map.ravel(), minlength=len(instances))
+            bounding_boxes = CocoWriterUtility.bboxes_from_label_map(label_map, len(instances))
+            if mask_encoding_format == 'rle':
+                rles = CocoWriterUtility.label_map_to_rles(label_map, len(instances))
+            elif mask_encoding_format != 'polygon':
+                raise RuntimeError("Unknown encoding format: {}".format(mask_encoding_format))
+
+            for label, inst in enumerate(instances):
+                # Skip background and objects which are not in the requested supercategory
+                if inst == 0 or int(inst) not in instance_2_category_map:
+                    continue
+
+                bounding_box = bounding_boxes[label]
+                if mask_encoding_format == 'rle':
+                    segmentation = rles[label]
+                else:
+                    # Only look at the bounding box of the object (with a margin of one pixel)
+                    row_start, col_start = max(bounding_box[1] - 1, 0), max(bounding_box[0] - 1, 0)
+                    row_end, col_end = bounding_box[1] + bounding_box[3] + 1, bounding_box[0] + bounding_box[2] + 1
+                    binary_inst_mask = np.where(label_map[row_start:row_end, col_start:col_end] == label, 1, 0)
+                    segmentation = CocoWriterUtility.binary_mask_to_polygon(binary_inst_mask, tolerance=2,
+                                                                            offset=(row_start, col_start))
+                    if not segmentation:
+                        continue
+
+                # Add coco info for object in this image
+                annotations.append(CocoWriterUtility._build_annotation_info(len(annotations), image_id,
+                                                                            instance_2_category_map[int(inst)],
+                                                                            int(areas[label]), bounding_box,
+                                                                            segmentation, inst_segmap.shape))
 
         new_coco_annotations = {
             "info": info,
             "licenses": licenses,
-            "categories": categories,
+            "categories": list(categories.values()),
             "images": images,
             "annotations": annotations
         }
@@ -331,6 +380,21 @@ def create_annotation_info(annotation_id, image_id, category_id, binary_mask, ma
         else:
             raise RuntimeError("Unknown encoding format: {}".format(mask_encoding_format))
 
+        return CocoWriterUtility._build_annotation_info(annotation_id, image_id, category_id, area, bounding_box,
+                                                        segmentation, binary_mask.shape)
+
+    @staticmethod
+    def _build_annotation_info(annotation_id, image_id, category_id, area, bounding_box, segmentation, image_shape):
+        """Assembles the info section of coco annotation from the already computed mask properties
+
+        :param annotation_id: integer to uniquly identify the annotation
+        :param image_id: integer to uniquly identify image
+        :param category_id: Id of the category
+        :param area: The area of the object mask in pixels.
+        :param bounding_box: The bounding box of the object mask as [x, y, width, height].
+        :param segmentation: The encoded object mask.
+        :param image_shape: The shape of the image [H, W].
+        """
         annotation_info = {
             "id": annotation_id,
             "image_id": image_id,
@@ -339,8 +403,8 @@ def create_annotation_info(annotation_id, image_id, category_id, binary_mask, ma
             "area": area,
             "bbox": bounding_box,
             "segmentation": segmentation,
-            "width": binary_mask.shape[1],
-            "height": binary_mask.shape[0],
+            "width": image_shape[1],
+            "height": image_shape[0],
         }
         return annotation_info
 
@@ -362,6 +426,26 @@ def bbox_from_binary_mask(binary_mask):
         w = cmax - cmin + 1
         return [int(cmin), int(rmin), int(w), int(h)]
 
+    @staticmethod
+    def bboxes_from_label_map(label_map, num_labels):
+        """ Returns for each label the smallest bounding box containing all of its pixels.
+
+        :param label_map: An image with the shape [H, W], which contains for each pixel its label in [0, num_labels).
+        :param num_labels: The number of labels.
+        :return: A list containing the bounding box of each label represented as [x, y, width, height]
+        """
+        # Mark for each label the rows and columns in which it occurs
+        rows = np.zeros((num_labels, label_map.shape[0]), dtype=bool)
+        rows[label_map, np.arange(label_map.shape[0])[:, None]] = True
+        cols = np.zeros((num_labels, label_map.shape[1]), dtype=bool)
+        cols[label_map, np.arange(label_map.shape[1])[None, :]] = True
+        # Find the min and max col/row index per label
+        rmin = np.argmax(rows, axis=1)
+        rmax = label_map.shape[0] - 1 - np.argmax(rows[:, ::-1], axis=1)
+        cmin = np.argmax(cols, axis=1)
+        cmax = label_map.shape[1] - 1 - np.argmax(cols[:, ::-1], axis=1)
+        return np.stack([cmin, rmin, cmax - cmin + 1, rmax - rmin + 1], axis=1).tolist()
+
     @staticmethod
     def calc_binary_mask_area(binary_mask):
         """ Returns the area of the given binary mask which is defined as the number of 1s in the mask.
@@ -384,20 +468,21 @@ def close_contour(contour):
         return contour
 
     @staticmethod
-    def binary_mask_to_polygon(binary_mask, tolerance=0):
+    def binary_mask_to_polygon(binary_mask, tolerance=0, offset=(0, 0)):
         """Converts a binary mask to COCO polygon representation
 
          :param binary_mask: a 2D binary numpy array where '1's represent the object
          :param tolerance: Maximum distance from original points of polygon to approximated polygonal chain. If
                            tolerance is 0, the original coordinate array is returned.
+         :param offset: The position [row, col] of the given mask inside of the full image, it is added to all points.
         """
         polygons = []
         # pad mask to close contours of shapes which start and end at an edge
         padded_binary_mask = np.pad(binary_mask, pad_width=1, mode='constant', constant_values=0)
-        contours = np.array(measure.find_contours(padded_binary_mask, 0.5))
-        # Reverse padding
-        contours = contours - 1
+        contours = measure.find_contours(padded_binary_mask, 0.5)
         for contour in contours:
+            # Reverse padding
+            contour = contour - 1 + offset
             # Make sure contour is closed
             contour = CocoWriterUtility.close_contour(contour)
             # Approximate contour by polygon
@@ -415,6 +500,40 @@ def binary_mask_to_polygon(binary_mask, tolerance=0):
 
         return polygons
 
+    @staticmethod
+    def label_map_to_rles(label_map, num_labels):
+        """ Computes the uncompressed RLE of the binary mask of each label in one pass over the label map.
+
+        The result is the same as calling binary_mask_to_rle() with the mask of each label.
+
+        :param label_map: An image with the shape [H, W], which contains for each pixel its label in [0, num_labels).
+        :param num_labels: The number of labels.
+        :return: A list containing the rle of each label.
+        """
+        flat_label_map = label_map.ravel(order='F')
+        # Split the column-major image into runs of the same label
+        run_starts = np.concatenate([[0], np.flatnonzero(flat_label_map[1:] != flat_label_map[:-1]) + 1])
+        run_ends = np.concatenate([run_starts[1:], [len(flat_label_map)]])
+        run_labels = flat_label_map[run_starts]
+        # Group the runs by their label, while keeping their order
+        run_order = np.argsort(run_labels, kind='stable')
+        runs_per_label = np.split(run_order, np.cumsum(np.bincount(run_labels, minlength=num_labels))[:-1])
+
+        rles = []
+        for runs in runs_per_label:
+            starts, ends = run_starts[runs], run_ends[runs]
+            # The counts alternate between runs of 0s and 1s and always start with a run of 0s
+            counts = np.empty(2 * len(runs) + 1, dtype=np.int64)
+            counts[0] = starts[0] if len(runs) > 0 else len(flat_label_map)
+            counts[1::2] = ends - starts
+            counts[2:-1:2] = starts[1:] - ends[:-1]
+            counts[-1] = len(flat_label_map) - ends[-1] if len(runs) > 0 else 0
+            counts = counts.tolist()
+            if counts[-1] == 0:
+                counts.pop()
+            rles.append({'counts': counts, 'size': list(label_map.shape)})
+        return rles
+
     @staticmethod
     def binary_mask_to_rle(binary_mask):
         rle = {'counts': [], 'size': list(binary_mask.shape)}
@@ -1,39 +1,150 @@
 import mathutils
 import numpy as np
 from mathutils import Vector, Euler, Matrix
-from typing import Union
+from typing import Union, List
 
+from src.utility.BVHUtility import BVHCache
+from src.utility.MathUtility import MathUtility
 from src.utility.MeshObjectUtility import MeshObject
 
 
+class AABBIndex:
+    """ A broad-phase index over the world-space axis-aligned bounding boxes of a set of objects.
+
+    The boxes are kept sorted by their minimum x value (sweep and prune), so a query only has to look at the prefix
+    of boxes, which start before the query box ends. This prefix is then tested against the query box in one
+    vectorized step. Like CollisionUtility.check_bb_intersection() touching boxes count as overlapping.
+
+    The index does not notice when an object is moved, in that case update() has to be called.
+    """
+
+    def __init__(self, objects: List[MeshObject] = None):
+        """
+        :param objects: The objects which should be added to the index.
+        """
+        self._objects = []
+        self._min = np.zeros((0, 3))
+        self._max = np.zeros((0, 3))
+        if objects:
+            for obj in objects:
+                self.add(obj)
+
+    @staticmethod
+    def get_aabb(obj: MeshObject) -> (np.ndarray, np.ndarray):
+        """ Returns the world-space axis-aligned bounding box of the given object.
+
+        :param obj: The mesh object.
+        :return: The minimum and the maximum point of the box.
+        """
+        bound_box = obj.get_bound_box()
+        return np.min(bound_box, axis=0), np.max(bound_box, axis=0)
+
+    def add(self, obj: MeshObject):
+        """ Adds the given object to the index.
+
+        :param obj: The mesh object.
+        """
+        bb_min, bb_max = AABBIndex.get_aabb(obj)
+        position = int(np.searchsorted(self._min[:, 0], bb_min[0]))
+        self._objects.insert(position, obj)
+        self._min = np.insert(self._min, position, bb_min, axis=0)
+        self._max = np.insert(self._max, position, bb_max, axis=0)
+
+    def remove(self, obj: MeshObject):
+        """ Removes the given object from the index.
+
+        :param obj: The mesh object.
+        """
+        position = self._objects.index(obj)
+        del self._objects[position]
+        self._min = np.delete(self._min, position, axis=0)
+        self._max = np.delete(self._max, position, axis=0)
+
+    def update(self, obj: MeshObject):
+        """ Reads the bounding box of the given object again, this is necessary after it has been moved.
+
+        :param obj: The mesh object.
+        """
+        if obj in self._objects:
+            self.remove(obj)
+        self.add(obj)
+
+    def query(self, bb_min: np.ndarray, bb_max: np.ndarray) -> List[MeshObject]:
+        """ Returns all objects whose boxes overlap with the given box.
+
+        :param bb_min: The minimum point of the query box.
+        :param bb_max: The maximum point of the query box.
+        :return: The overlapping objects, sorted by the minimum x value of their boxes.
+        """
+        # Only boxes which start before the query box ends can overlap
+        end = int(np.searchsorted(self._min[:, 0], bb_max[0], side="right"))
+        overlapping = np.all((self._max[:end] >= bb_min) & (bb_max >= self._min[:end]), axis=1)
+        return [self._objects[i] for i in np.flatnonzero(overlapping)]
+
+    def overlaps_any(self, bb_mins: np.ndarray, bb_maxs: np.ndarray) -> np.ndarray:
+        """ Checks for many query boxes at once, whether they overlap with any box in the index.
+
+        :param bb_mins: The minimum points of the query boxes. Type: numpy array of shape [K, 3].
+        :param bb_maxs: The maximum points of the query boxes. Type: numpy array of shape [K, 3].
+        :return: A boolean numpy array of shape [K], which is True for every query box with at least one overlap.
+        """
+        bb_mins, bb_maxs = np.reshape(bb_mins, (-1, 3)), np.reshape(bb_maxs, (-1, 3))
+        if len(bb_mins) == 0:
+            return np.zeros(0, dtype=bool)
+        # Only boxes which start before the last query box ends can overlap
+        end = int(np.searchsorted(self._min[:, 0], bb_maxs[:, 0].max(), side="right"))
+        overlapping = np.all((self._max[None, :end] >= bb_mins[:, None]) & (bb_maxs[:, None] >= self._min[None, :end]), axis=2)
+        return overlapping.any(axis=1)
+
+    def query_object(self, obj: MeshObject) -> List[MeshObject]:
+        """ Returns all objects whose boxes overlap with the box of the given object, the object itself is excluded.
+
+        :param obj: The mesh object.
+        :return: The overlapping objects.
+        """
+        return [other for other in self.query(*AABBIndex.get_aabb(obj)) if other != obj]
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj: MeshObject):
+        return obj in self._objects
+
+
 class CollisionUtility:
 
     @staticmethod
-    def check_intersections(obj: MeshObject, bvh_cache: dict, objects_to_check_against: list, list_of_objects_with_no_inside_check: list):
+    def check_intersections(obj: MeshObject, bvh_cache: Union[BVHCache, dict], objects_to_check_against: Union[list, AABBIndex], list_of_objects_with_no_inside_check: list):
         """ Checks if a object intersects with any object given in the list.
 
         The bvh_cache adds all current objects to the bvh tree, which increases the speed.
 
-        If an object is already in the cache it is removed, before performing the check.
-
         :param obj: Object which should be checked. Type: :class:`bpy.types.Object`
-        :param bvh_cache: Dict of all the bvh trees, removes the `obj` from the cache before adding it again. \
-                          Type: :class:`dict`
-        :param objects_to_check_against: List of objects which the object is checked again \
-                                         Type: :class:`list`
+        :param bvh_cache: The BVHCache to use, e.g. the cache of the scene via BVHCache.get_scene_cache(). A dict \
+                          of bvh trees is still supported, there the `obj` has to be removed from the dict after it \
+                          was moved. If None is given, a new dict is used for this call only. \
+                          Type: :class:`BVHCache` or :class:`dict`
+        :param objects_to_check_against: List of objects which the object is checked again. If an AABBIndex is \
+                                         given, only the objects whose bounding boxes overlap are checked. \
+                                         Type: :class:`list` or :class:`AABBIndex`
         :param list_of_objects_with_no_inside_check: List of objects on which no inside check is performed. \
                                                      This check is only done for the objects in \
                                                      `objects_to_check_against`. Type: :class:`list`
         :return: Type: :class:`bool`, True if no collision was found, false if at least one collision was found
         """
         no_collision = True
+        if isinstance(objects_to_check_against, AABBIndex):
+            # The index already returns only objects with overlapping bounding boxes
+            candidates = objects_to_check_against.query_object(obj)
+        else:
+            candidates = objects_to_check_against
         # Now check for collisions
-        for collision_obj in objects_to_check_against:
+        for collision_obj in candidates:
             # Do not check collisions with yourself
             if collision_obj == obj:
                 continue
             # First check if bounding boxes collides
-            intersection = CollisionUtility.check_bb_intersection(obj, collision_obj)
+            intersection = isinstance(objects_to_check_against, AABBIndex) or CollisionUtility.check_bb_intersection(obj, collision_obj)
             # if they do
             if intersection:
                 skip_inside_check = collision_obj in list_of_objects_with_no_inside_check
@@ -45,6 +156,33 @@ def check_intersections(obj: MeshObject, bvh_cache: dict, objects_to_check_again
         return no_collision
 
 
+    @staticmethod
+    def get_candidate_bound_boxes(obj: MeshObject, locations: np.ndarray, rotations_euler: np.ndarray) -> np.ndarray:
+        """ Computes the world-space bounding box corners the given object would have at many candidate poses.
+
+        This does not change the object, so candidate poses can be checked before applying any of them to blender.
+        The current scale and parent of the object are taken into account. The rotations are interpreted in the XYZ
+        euler order.
+
+        :param obj: The mesh object.
+        :param locations: The candidate locations of shape [K, 3].
+        :param rotations_euler: The candidate euler rotations of shape [K, 3].
+        :return: The bounding box corners of all candidates. Type: numpy array of shape [K, 8, 3].
+        """
+        if obj.blender_obj.rotation_mode != "XYZ":
+            raise Exception("Candidate poses can only be computed for objects with the rotation mode XYZ, but {} uses {}.".format(obj.get_name(), obj.blender_obj.rotation_mode))
+
+        # The local corners scaled by the object's scale
+        local_corners = obj.get_bound_box(local_coords=True) * obj.get_scale()
+        rotations = MathUtility.euler_to_rotation_matrices(rotations_euler)
+        corners = np.einsum("kij,nj->kni", rotations, local_corners) + np.reshape(locations, (-1, 1, 3))
+
+        parent = obj.get_parent()
+        if parent is not None:
+            parent_mat = parent.get_local2world_mat() @ np.array(obj.blender_obj.matrix_parent_inverse)
+            corners = corners @ parent_mat[:3, :3].T + parent_mat[:3, 3]
+        return corners
+
     @staticmethod
     def check_bb_intersection(obj1: MeshObject, obj2: MeshObject):
         """
@@ -101,7 +239,7 @@ def is_overlapping_1D(x_min_1, x_max_1, x_min_2, x_max_2):
         return collide
 
     @staticmethod
-    def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_check: bool = False, bvh_cache: dict = None):
+    def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_check: bool = False, bvh_cache: Union[BVHCache, dict] = None):
         """
         Checks if the two objects are intersecting.
 
@@ -114,6 +252,7 @@ def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_chec
         :param obj1: object 1 to check for intersection, must be a mesh
         :param obj2: object 2 to check for intersection, must be a mesh
         :param skip_inside_check: Disables checking whether one object is completely inside the other.
+        :param bvh_cache: The BVHCache or dict of bvh trees to use. If None is given, a new dict is used for this call only.
         :return: True, if they are intersecting
         """
 
@@ -124,19 +263,24 @@ def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_chec
         if len(obj1.get_mesh().vertices) == 0 or len(obj2.get_mesh().vertices) == 0:
             return False, bvh_cache
 
-        # create bvhtree for obj1
-        if obj1.get_name() not in bvh_cache:
-            obj1_BVHtree = obj1.create_bvh_tree()
-            bvh_cache[obj1.get_name()] = obj1_BVHtree
+        if isinstance(bvh_cache, BVHCache):
+            # the cache only rebuilds the trees of objects that have been moved or changed
+            obj1_BVHtree = bvh_cache.get_world_tree(obj1)
+            obj2_BVHtree = bvh_cache.get_world_tree(obj2)
         else:
-            obj1_BVHtree = bvh_cache[obj1.get_name()]
+            # create bvhtree for obj1
+            if obj1.get_name() not in bvh_cache:
+                obj1_BVHtree = obj1.create_bvh_tree()
+                bvh_cache[obj1.get_name()] = obj1_BVHtree
+            else:
+                obj1_BVHtree = bvh_cache[obj1.get_name()]
 
-        # create bvhtree for obj2
-        if obj2.get_name() not in bvh_cache:
-            obj2_BVHtree = obj2.create_bvh_tree()
-            bvh_cache[obj2.get_name()] = obj2_BVHtree
-        else:
-            obj2_BVHtree = bvh_cache[obj2.get_name()]
+            # create bvhtree for obj2
+            if obj2.get_name() not in bvh_cache:
+                obj2_BVHtree = obj2.create_bvh_tree()
+                bvh_cache[obj2.get_name()] = obj2_BVHtree
+            else:
+                obj2_BVHtree = bvh_cache[obj2.get_name()]
 
         # Check whether both meshes intersect
         inter = len(obj1_BVHtree.overlap(obj2_BVHtree)) > 0
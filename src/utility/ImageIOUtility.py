@@ -0,0 +1,220 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union, Callable, Any
+
+import numpy as np
+
+# Has to be set before the first .exr file is decoded via opencv
+os.environ.setdefault("OPENCV_IO_ENABLE_OPENEXR", "1")
+
+
+class ImageIOUtility:
+    """ Reads the images written by blender, e.g. color, distance, normal or segmentation images.
+
+    Depending on what is installed, the following backends are used:
+
+    - .exr: OpenEXR, which only decodes the requested channels and can return half floats without conversion
+    - .exr, .png, .jpg: opencv
+    - all formats: imageio (via freeimage), this was the only backend before and is always available
+
+    OpenEXR and opencv release the GIL while decoding, so read_many() decodes several images in parallel.
+    """
+
+    # The names of the channels in the order they are returned
+    exr_channel_order = ["R", "G", "B", "A"]
+
+    @staticmethod
+    def read(file_path: str, num_channels: Union[int, None] = 3, keep_half_floats: bool = False) -> np.ndarray:
+        """ Reads the image at the given path.
+
+        :param file_path: The path to the image.
+        :param num_channels: The number of channels to read. If None, all channels are read. Images with only one \
+                             (read) channel are returned as 2-dim array.
+        :param keep_half_floats: If this is True, half float .exr images are returned as float16, otherwise all \
+                                 floating point images are returned as float32.
+        :return: The image as numpy array of shape [height, width, channels].
+        """
+        file_ending = file_path[file_path.rfind(".") + 1:].lower()
+
+        image = None
+        if file_ending == "exr":
+            image = ImageIOUtility._read_exr_with_openexr(file_path, num_channels, keep_half_floats)
+        if image is None:
+            image = ImageIOUtility._read_with_opencv(file_path, num_channels)
+        if image is None:
+            image = ImageIOUtility._read_with_imageio(file_path, num_channels)
+
+        if image.ndim == 3 and image.shape[2] == 1:
+            image = image[:, :, 0]
+        if image.dtype == np.float16 and not keep_half_floats:
+            image = image.astype(np.float32)
+        return image
+
+    @staticmethod
+    def read_many(file_paths: List[str], num_channels: Union[int, None] = 3, keep_half_floats: bool = False,
+                  num_threads: Union[int, None] = None) -> List[np.ndarray]:
+        """ Reads all given images in parallel.
+
+        :param file_paths: The paths to the images.
+        :param num_channels: The number of channels to read. If None, all channels are read.
+        :param keep_half_floats: If this is True, half float .exr images are returned as float16.
+        :param num_threads: The number of threads to use. If None, one thread per cpu core is used.
+        :return: The list of images in the order of the given paths.
+        """
+        return ImageIOUtility.map_parallel(lambda path: ImageIOUtility.read(path, num_channels, keep_half_floats),
+                                           file_paths, num_threads)
+
+    @staticmethod
+    def map_parallel(function: Callable[[Any], Any], items: list, num_threads: Union[int, None] = None) -> list:
+        """ Applies the given function to all items via a thread pool.
+
+        :param function: The function to apply, e.g. a function which reads an image.
+        :param items: The list of items.
+        :param num_threads: The number of threads to use. If None, one thread per cpu core is used.
+        :return: The list of results in the order of the given items.
+        """
+        if num_threads is None:
+            num_threads = os.cpu_count() or 1
+        num_threads = min(num_threads, len(items))
+        if num_threads <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            return list(executor.map(function, items))
+
+    @staticmethod
+    def read_viewer_node(num_channels: int = 4) -> np.ndarray:
+        """ Reads the result of the last rendering directly from memory, without writing it to disk.
+
+        Blender does not allow to access the pixels of the render result, so the composite result has to be
+        connected to a viewer node in the compositor, before rendering. Only the last rendered frame is available.
+
+        :param num_channels: The number of channels to return.
+        :return: The image as float32 numpy array of shape [height, width, channels].
+        """
+        import bpy
+
+        image = bpy.data.images.get("Viewer Node")
+        if image is None:
+            raise Exception("There is no viewer node result, add a viewer node to the compositor before rendering.")
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        # Blender stores the rows from bottom to top
+        return pixels.reshape(height, width, 4)[::-1, :, :num_channels]
+
+    @staticmethod
+    def _read_exr_with_openexr(file_path: str, num_channels: Union[int, None], keep_half_floats: bool) \
+            -> Union[np.ndarray, None]:
+        """ Reads only the requested channels of the given .exr file via OpenEXR.
+
+        :param file_path: The path to the .exr file.
+        :param num_channels: The number of channels to read. If None, all channels are read.
+        :param keep_half_floats: If this is True, half float channels are not converted to float32.
+        :return: The image or None, if OpenEXR is not installed.
+        """
+        try:
+            import OpenEXR
+            import Imath
+        except ImportError:
+            return None
+
+        exr_file = OpenEXR.InputFile(file_path)
+        try:
+            header = exr_file.header()
+            data_window = header["dataWindow"]
+            width = data_window.max.x - data_window.min.x + 1
+            height = data_window.max.y - data_window.min.y + 1
+
+            channel_names = [name for name in ImageIOUtility.exr_channel_order if name in header["channels"]]
+            # Single channel images, e.g. written by blender in BW mode, use a different channel name
+            if not channel_names:
+                channel_names = sorted(header["channels"].keys())
+            if num_channels is not None:
+                channel_names = channel_names[:num_channels]
+
+            half_type = Imath.PixelType(Imath.PixelType.HALF)
+            channels = []
+            for name in channel_names:
+                if header["channels"][name].type == half_type and keep_half_floats:
+                    buffer, dtype = exr_file.channel(name, half_type), np.float16
+                else:
+                    buffer, dtype = exr_file.channel(name, Imath.PixelType(Imath.PixelType.FLOAT)), np.float32
+                channels.append(np.frombuffer(buffer, dtype=dtype).reshape(height, width))
+        finally:
+            exr_file.close()
+
+        if len(channels) == 1:
+            return channels[0]
+        return np.stack(channels, axis=-1)
+
+    @staticmethod
+    def _read_with_opencv(file_path: str, num_channels: Union[int, None]) -> Union[np.ndarray, None]:
+        """ Reads the given image via opencv.
+
+        :param file_path: The path to the image.
+        :param num_channels: The number of channels to read. If None, all channels are read.
+        :return: The image or None, if opencv is not installed or cannot read the file.
+        """
+        try:
+            import cv2
+        except ImportError:
+            return None
+
+        image = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        if image.ndim == 3:
+            # opencv uses BGR(A), so reverse the color channels
+            if image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+            elif image.shape[2] == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            if num_channels is not None:
+                image = image[:, :, :num_channels]
+        return image
+
+    @staticmethod
+    def _read_with_imageio(file_path: str, num_channels: Union[int, None]) -> np.ndarray:
+        """ Reads the given image via imageio, if necessary the freeimage library is downloaded first.
+
+        :param file_path: The path to the image.
+        :param num_channels: The number of channels to read. If None, all channels are read.
+        :return: The image.
+        """
+        import imageio
+
+        try:
+            image = imageio.imread(file_path)
+        except ValueError as e:
+            print("It seems the freeimage library which is necessary to read .exr files cannot be found on your computer.")
+            print("Gonna try to download it automatically.")
+
+            # Since PEP 476 the certificate of https connections is verified per default.
+            # However, in the blender python env no local certificates seem to be found which makes certification impossible.
+            # Therefore, we have to switch certificate verification off for now.
+            import ssl
+            if hasattr(ssl, '_create_unverified_context'):
+                prev_context = ssl._create_default_https_context
+                ssl._create_default_https_context = ssl._create_unverified_context
+
+            # Download free image library
+            imageio.plugins.freeimage.download()
+
+            # Undo certificate check changes
+            if hasattr(ssl, '_create_unverified_context'):
+                ssl._create_default_https_context = prev_context
+
+            try:
+                # Try again
+                image = imageio.imread(file_path)
+            except ValueError as e:
+                error = "The automatic installation of the freeimage library failed, so you need to install the imageio .exr extension manually. This is quite simple: \n"
+                error += "Use a different python environment (not blenders internal environment), `pip install imageio`.\n"
+                error += 'And then execute the following command in this env: \n'
+                error += '`python -c "import imageio; imageio.plugins.freeimage.download()"`\n'
+                error += "Now everything should work -> run the pipeline again."
+                raise Exception(error)
+
+        if image.ndim == 3 and num_channels is not None:
+            image = image[:, :, :num_channels]
+        return image
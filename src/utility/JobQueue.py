@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import traceback
+import uuid
+from typing import List, Optional, Tuple
+
+
+class JobQueue:
+    """ A simple job queue, which is stored in a local directory and can be shared between several processes.
+
+    Every job is a small .json file, which moves through the following sub folders of the queue directory:
+
+    - pending: jobs which have been submitted, but are not yet claimed by any worker
+    - running: jobs which are currently executed by a worker
+    - done: jobs which have been executed successfully
+    - failed: jobs which have raised an exception, the traceback is stored inside the job file
+
+    Claiming a job is done by renaming the file from pending to running, which is atomic on all local file systems.
+    So several workers can share one queue without any further locking.
+
+    This class does not depend on blender, so jobs can be submitted from any python process.
+    """
+
+    states = ["pending", "running", "done", "failed"]
+    stop_file_name = "STOP"
+
+    def __init__(self, queue_dir: str):
+        """
+        :param queue_dir: The path to the directory which holds the queue. It is created, if it does not exist.
+        """
+        self.queue_dir = os.path.abspath(queue_dir)
+        for state in JobQueue.states:
+            os.makedirs(os.path.join(self.queue_dir, state), exist_ok=True)
+
+    def _job_path(self, state: str, job_name: str) -> str:
+        """ Returns the path of the job file with the given name in the given state folder.
+
+        :param state: The state of the job, one of JobQueue.states.
+        :param job_name: The file name of the job.
+        :return: The path to the job file.
+        """
+        return os.path.join(self.queue_dir, state, job_name)
+
+    def submit(self, file: str, args: List[str], seed: Optional[int] = None) -> str:
+        """ Adds a new job to the queue.
+
+        :param file: The path to the config file or python script, which should be executed.
+        :param args: The arguments, which should be handed over to the config/script.
+        :param seed: The random seed, which should be used for this job. If None is given, no seed is set.
+        :return: The file name of the new job.
+        """
+        # Prefix with the current time, s.t. jobs are executed in the order in which they were submitted
+        job_name = "{:.6f}_{}.json".format(time.time(), uuid.uuid4().hex)
+        job = {"file": os.path.abspath(file), "args": [str(arg) for arg in args], "seed": seed}
+        # Write into a temporary file first, s.t. no worker can claim a half written job
+        temp_path = self._job_path("pending", "." + job_name)
+        with open(temp_path, "w") as f:
+            json.dump(job, f)
+        os.rename(temp_path, self._job_path("pending", job_name))
+        return job_name
+
+    def claim(self) -> Optional[Tuple[str, dict]]:
+        """ Claims the oldest pending job.
+
+        :return: The name and the content of the claimed job or None, if there is no pending job.
+        """
+        for job_name in sorted(os.listdir(os.path.join(self.queue_dir, "pending"))):
+            if job_name.startswith(".") or not job_name.endswith(".json"):
+                continue
+            try:
+                os.rename(self._job_path("pending", job_name), self._job_path("running", job_name))
+            except FileNotFoundError:
+                # Another worker was faster
+                continue
+            with open(self._job_path("running", job_name), "r") as f:
+                return job_name, json.load(f)
+        return None
+
+    def finish(self, job_name: str, job: dict, exception: Optional[BaseException] = None):
+        """ Marks a claimed job as done or, if an exception is given, as failed.
+
+        :param job_name: The name of the job, as returned by claim().
+        :param job: The content of the job, as returned by claim().
+        :param exception: The exception which was raised while executing the job, None if the job was successful.
+        """
+        state = "done"
+        if exception is not None:
+            state = "failed"
+            job["error"] = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        with open(self._job_path("running", job_name), "w") as f:
+            json.dump(job, f)
+        os.rename(self._job_path("running", job_name), self._job_path(state, job_name))
+
+    def requeue_running(self):
+        """ Moves all jobs, which are marked as running, back to pending.
+
+        This should only be called if no worker is running on this queue, e.g. after all workers crashed.
+        """
+        for job_name in os.listdir(os.path.join(self.queue_dir, "running")):
+            os.rename(self._job_path("running", job_name), self._job_path("pending", job_name))
+
+    def count(self, state: str) -> int:
+        """ Returns the amount of jobs in the given state.
+
+        :param state: One of JobQueue.states.
+        :return: The amount of jobs.
+        """
+        return len([job_name for job_name in os.listdir(os.path.join(self.queue_dir, state)) if not job_name.startswith(".")])
+
+    def request_stop(self):
+        """ Tells all workers of this queue to stop after their current job. """
+        open(os.path.join(self.queue_dir, JobQueue.stop_file_name), "w").close()
+
+    def is_stop_requested(self) -> bool:
+        """ Checks whether the workers should stop.
+
+        :return: True, if request_stop() has been called on this queue.
+        """
+        return os.path.exists(os.path.join(self.queue_dir, JobQueue.stop_file_name))
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from typing import Dict, List
+
+
+class MaterialCatalog:
+    """ A persistent index of a material asset folder, like the ones of cc0textures.com or texturehaven.com.
+
+    Every asset is a sub folder, which contains all texture maps of this asset. The catalog stores the file names of
+    each asset folder together with the modification time of the folder in a json file inside the asset folder. When
+    the catalog is requested again, only the asset folders, whose modification time has changed, are listed again.
+    In addition, each catalog is kept in memory, s.t. loading materials several times in one run is for free.
+
+    If the asset folder is not writable, the catalog is only kept in memory.
+    """
+
+    catalog_file_name = ".blenderproc_catalog.json"
+    _catalogs = {}
+
+    @staticmethod
+    def get_assets(folder_path: str) -> Dict[str, List[str]]:
+        """ Returns all assets of the given asset folder.
+
+        :param folder_path: The path to the asset folder.
+        :return: A dict, which maps the name of each asset to the sorted list of the file names in its folder.
+                 The assets are sorted by name.
+        """
+        folder_path = os.path.abspath(folder_path)
+        catalog_path = os.path.join(folder_path, MaterialCatalog.catalog_file_name)
+
+        catalog = MaterialCatalog._catalogs.get(folder_path)
+        if catalog is None and os.path.exists(catalog_path):
+            try:
+                with open(catalog_path, "r") as f:
+                    catalog = json.load(f)
+            except (OSError, ValueError):
+                catalog = None
+        if catalog is None:
+            catalog = {}
+
+        # Only list asset folders again, which have been changed since the catalog was built
+        new_catalog = {}
+        changed = False
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                mtime_ns = entry.stat().st_mtime_ns
+                cached_entry = catalog.get(entry.name)
+                if cached_entry is not None and cached_entry["mtime_ns"] == mtime_ns:
+                    new_catalog[entry.name] = cached_entry
+                else:
+                    new_catalog[entry.name] = {"mtime_ns": mtime_ns, "files": sorted(os.listdir(entry.path))}
+                    changed = True
+        changed = changed or len(new_catalog) != len(catalog)
+        new_catalog = {asset: new_catalog[asset] for asset in sorted(new_catalog.keys())}
+
+        if changed:
+            # Write into a temporary file first, s.t. concurrent runs never read a half written catalog
+            temp_path = "{}.{}.tmp".format(catalog_path, os.getpid())
+            try:
+                with open(temp_path, "w") as f:
+                    json.dump(new_catalog, f)
+                os.replace(temp_path, catalog_path)
+            except OSError:
+                # The asset folder is not writable, so the catalog is only kept in memory
+                pass
+        MaterialCatalog._catalogs[folder_path] = new_catalog
+
+        return {asset: entry["files"] for asset, entry in new_catalog.items()}
+
+    @staticmethod
+    def filter_assets(asset_names: List[str], used_assets: List[str], ignore_case: bool = False) -> List[str]:
+        """ Returns all asset names, which start with one of the given prefixes.
+
+        :param asset_names: The list of asset names.
+        :param used_assets: The list of prefixes. If empty or None, all asset names are returned.
+        :param ignore_case: If this is True, the asset names are lowered before they are compared.
+        :return: The list of matching asset names.
+        """
+        if not used_assets:
+            return list(asset_names)
+        prefixes = tuple(used_assets)
+        if ignore_case:
+            return [asset for asset in asset_names if asset.lower().startswith(prefixes)]
+        return [asset for asset in asset_names if asset.startswith(prefixes)]
+
+    @staticmethod
+    def get_cc_maps(asset: str, file_names: List[str]) -> Dict[str, Dict[str, str]]:
+        """ Groups the files of a cc texture asset by resolution and map type.
+
+        The files of cc textures are named like "<asset>_<resolution>_<map type>.<extension>",
+        e.g. "Bricks001_2K_Color.jpg".
+
+        :param asset: The name of the asset.
+        :param file_names: The file names in the folder of the asset.
+        :return: A dict, which maps each resolution to a dict from map type to file name.
+        """
+        maps = {}
+        pattern = re.compile(re.escape(asset) + r"_([^_]+)_([^_.]+)\.(\w+)$")
+        for file_name in file_names:
+            match = pattern.match(file_name)
+            if match is not None:
+                maps.setdefault(match.group(1), {})[match.group(2) + "." + match.group(3)] = file_name
+        return maps
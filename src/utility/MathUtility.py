@@ -123,3 +123,28 @@ def build_transformation_mat(translation: Union[np.ndarray, list, Vector], rotat
             raise Exception("rotation has invalid shape: {}. Must be rotation matrix of shape (3,3) or Euler angles of shape (3,) or (3,1).".format(rotation.shape))
 
         return mat
+
+    @staticmethod
+    def euler_to_rotation_matrices(rotations_euler: np.ndarray) -> np.ndarray:
+        """ Converts many XYZ euler angles at once into rotation matrices, same as mathutils.Euler(...).to_matrix().
+
+        :param rotations_euler: The euler angles of shape (N, 3).
+        :return: The rotation matrices of shape (N, 3, 3).
+        """
+        rotations_euler = np.asarray(rotations_euler, dtype=np.float64).reshape(-1, 3)
+        cos, sin = np.cos(rotations_euler), np.sin(rotations_euler)
+        cx, cy, cz = cos[:, 0], cos[:, 1], cos[:, 2]
+        sx, sy, sz = sin[:, 0], sin[:, 1], sin[:, 2]
+
+        # R = R_z @ R_y @ R_x
+        mats = np.empty((len(rotations_euler), 3, 3))
+        mats[:, 0, 0] = cy * cz
+        mats[:, 0, 1] = sx * sy * cz - cx * sz
+        mats[:, 0, 2] = cx * sy * cz + sx * sz
+        mats[:, 1, 0] = cy * sz
+        mats[:, 1, 1] = sx * sy * sz + cx * cz
+        mats[:, 1, 2] = cx * sy * sz - sx * cz
+        mats[:, 2, 0] = -sy
+        mats[:, 2, 1] = sx * cy
+        mats[:, 2, 2] = cx * cy
+        return mats
@@ -3,7 +3,7 @@
 
 import bpy
 
-from external.vhacd.decompose import convex_decomposition
+from external.vhacd.decompose import convex_decompositions
 from src.utility.EntityUtility import Entity
 import numpy as np
 from mathutils import Vector, Matrix
@@ -273,15 +273,28 @@ def build_convex_decomposition_collision_shape(self, temp_dir, cache_dir="resour
         :param temp_dir: The temp dir to use for storing the object files created by v-hacd.
         :param cache_dir: If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped.
         """
-        # Decompose the object
-        parts = convex_decomposition(self.blender_obj, temp_dir, cache_dir=Utility.resolve_path(cache_dir))
-        parts = [MeshObject(p) for p in parts]
+        MeshObject.build_convex_decomposition_collision_shapes([self], temp_dir, cache_dir, num_processes=1)
 
-        # Make the convex parts children of this object, enable their rigid body component and hide them
-        for part in parts:
-            part.set_parent(self)
-            part.enable_rigidbody(True, "CONVEX_HULL")
-            part.hide()
+    @staticmethod
+    def build_convex_decomposition_collision_shapes(objects: List["MeshObject"], temp_dir: str, cache_dir: str = "resources/decomposition_cache", num_processes: int = None):
+        """ Builds the collision shapes of multiple objects by decomposing them into near convex parts using V-HACD.
+
+        The V-HACD processes of the different objects run in parallel.
+
+        :param objects: The objects to decompose.
+        :param temp_dir: The temp dir to use for storing the object files created by v-hacd.
+        :param cache_dir: If a directory is given, convex decompositions are stored there named after the meshes hash. If the same mesh is decomposed a second time, the result is loaded from the cache and the actual decomposition is skipped.
+        :param num_processes: The maximum number of V-HACD processes which run in parallel. Per default, the number of cpus is used.
+        """
+        # Decompose the objects
+        all_parts = convex_decompositions([obj.blender_obj for obj in objects], temp_dir, num_processes=num_processes, cache_dir=Utility.resolve_path(cache_dir))
+
+        for obj, parts in zip(objects, all_parts):
+            # Make the convex parts children of the object, enable their rigid body component and hide them
+            for part in [MeshObject(p) for p in parts]:
+                part.set_parent(obj)
+                part.enable_rigidbody(True, "CONVEX_HULL")
+                part.hide()
 
     def hide(self, hide_object: bool = True):
         """ Sets the visibility of the object.
@@ -102,6 +102,9 @@ def _get_pixel_neighbors_stacked(img: np.ndarray, filter_size: int = 3,
     def _isin(element, test_elements, assume_unique=False, invert=False):
         """ As np.isin is only available after v1.13 and blender is using 1.10.1 we have to implement it manually. """
         element = np.asarray(element)
+        # np.in1d has been removed in numpy 2, e.g. when running the benchmarks outside of blender
+        if hasattr(np, "isin"):
+            return np.isin(element, test_elements, assume_unique=assume_unique, invert=invert)
         return np.in1d(element, test_elements, assume_unique=assume_unique, invert=invert).reshape(element.shape)
 
     @staticmethod
@@ -121,9 +124,8 @@ def _determine_noisy_pixels(image: np.ndarray) -> np.ndarray:
         # Removing further noise where there are some stray pixel values with very small counts, by assigning them to
         # their closest (numerically, since this deviation is a
         # result of some numerical operation) neighbor.
-        hist = sorted((np.asarray((b, counts)).T), key=lambda x: x[1])
         # Assuming the stray pixels wouldn't have a count of more than 100
-        noise_vals = [h[0] for h in hist if h[1] <= 100]
+        noise_vals = b[counts <= 100]
         noise_indices = np.argwhere(PostProcessingUtility._isin(image, noise_vals))
 
         return noise_indices
@@ -145,31 +147,33 @@ def remove_segmap_noise(image: Union[list, np.ndarray]) -> Union[list, np.ndarra
             return [PostProcessingUtility.remove_segmap_noise(img) for img in image]
 
         noise_indices = PostProcessingUtility._determine_noisy_pixels(image)
-
-        for index in noise_indices:
-            neighbors = PostProcessingUtility._get_pixel_neighbors(image, index[0], index[
-                1])  # Extracting the indices surrounding 3x3 neighbors
-            curr_val = image[index[0]][index[1]][0]  # Current value of the noisy pixel
-
-            neighbor_vals = [image[neighbor[0]][neighbor[1]] for neighbor in
-                             neighbors]  # Getting the values of the neighbors
-            neighbor_vals = np.unique(
-                np.array([np.array(index) for index in neighbor_vals]))  # Getting the unique values only
-
-            min = 10000000000
-            min_idx = 0
-
-            # Here we iterate through the unique values of the neighbor and find the one closest to the current noisy value
-            for idx, n in enumerate(neighbor_vals):
-                # Is this closer than the current closest value?
-                if n - curr_val <= min:
-                    # If so, update
-                    min = n - curr_val
-                    min_idx = idx
-
-            # Now that we have found the closest value, assign it to the noisy value
-            new_val = neighbor_vals[min_idx]
-            image[index[0]][index[1]] = np.array([new_val, new_val, new_val])
+        if len(noise_indices) == 0:
+            return image
+
+        # Each noisy pixel gets the smallest value of its 3x3 neighbors (over all channels), where the pixels are
+        # processed in row-major order and already denoised neighbors count with their new value.
+        # The image is padded by one pixel, s.t. the neighbors outside of the image never are the smallest value.
+        fill_value = np.inf if np.issubdtype(image.dtype, np.floating) else np.iinfo(image.dtype).max
+        pixel_min = image.min(axis=2) if len(image.shape) == 3 else image
+        padded_min = np.pad(pixel_min, 1, mode="constant", constant_values=fill_value)
+        padded_noisy = np.zeros(padded_min.shape, dtype=bool)
+        padded_noisy[noise_indices[:, 0] + 1, noise_indices[:, 1] + 1] = True
+
+        neighbor_offsets = np.array([[p, q] for p in range(-1, 2) for q in range(-1, 2) if not (p == 0 and q == 0)])
+        # The first four neighbors are the ones, which come before the pixel in row-major order
+        previous_offsets = neighbor_offsets[:4]
+
+        rows, cols = np.nonzero(padded_noisy)
+        while len(rows) > 0:
+            # All pixels whose previous neighbors are already denoised, can be denoised at the same time
+            ready = ~padded_noisy[rows[:, None] + previous_offsets[:, 0], cols[:, None] + previous_offsets[:, 1]].any(axis=1)
+            ready_rows, ready_cols = rows[ready], cols[ready]
+            new_vals = padded_min[ready_rows[:, None] + neighbor_offsets[:, 0], ready_cols[:, None] + neighbor_offsets[:, 1]].min(axis=1)
+
+            padded_min[ready_rows, ready_cols] = new_vals
+            padded_noisy[ready_rows, ready_cols] = False
+            image[ready_rows - 1, ready_cols - 1] = new_vals[:, None] if len(image.shape) == 3 else new_vals
+            rows, cols = rows[~ready], cols[~ready]
 
         return image
 
@@ -1,5 +1,7 @@
 import os
-from typing import Union, Dict, List, Set
+import time
+from contextlib import contextmanager
+from typing import Union, Dict, List, Set, Iterator
 
 import mathutils
 import math
@@ -7,7 +9,9 @@
 import numpy as np
 
 from src.main.GlobalStorage import GlobalStorage
+from src.utility.BackgroundWriter import BackgroundWriter
 from src.utility.BlenderUtility import get_all_blender_mesh_objects
+from src.utility.Tracer import Tracer
 from src.utility.Utility import Utility
 from src.utility.WriterUtility import WriterUtility
 
@@ -158,8 +162,13 @@ def set_tile_size(tile_x: int, tile_y: int):
     def set_cpu_threads(num_threads: int):
         """ Sets the number of CPU cores to use simultaneously while rendering.
 
+        If the environment variable "BLENDER_PROC_CPU_THREADS" is set (e.g. by rerun.py when several runs are executed
+        in parallel), it is used as thread budget whenever 0 is given.
+
         :param num_threads: The number of threads to use. If 0 is given the number is automatically detected based on the cpu cores.
         """
+        if num_threads == 0 and os.getenv("BLENDER_PROC_CPU_THREADS"):
+            num_threads = int(os.getenv("BLENDER_PROC_CPU_THREADS"))
         # If set to 0, use number of cores (default)
         if num_threads > 0:
             bpy.context.scene.render.threads_mode = "FIXED"
@@ -451,6 +460,42 @@ def enable_diffuse_color_output(output_dir: str, file_prefix: str = "diffuse_",
             "version": "2.0.0"
         })
 
+    @staticmethod
+    def enable_segmentation_output(output_dir: Union[str, None] = None, file_prefix: str = "instance_"):
+        """ Enables writing the object index pass, from which segmentation maps can be created without an additional
+        rendering.
+
+        Each mesh object gets a unique pass index starting at one, zero is used for the background. The index pass is
+        written in the form of 32-bit .exr files during the next rendering. Afterwards,
+        SegMapRendererUtility.decode_index_pass() maps the indices to the requested attributes. So all objects have
+        to be created before calling this function.
+
+        :param output_dir: The directory to write files to, if this is None the temporary directory is used.
+        :param file_prefix: The prefix to use for writing the files.
+        """
+        if output_dir is None:
+            output_dir = Utility.get_temporary_directory()
+
+        for idx, obj in enumerate(get_all_blender_mesh_objects()):
+            obj.pass_index = idx + 1
+
+        bpy.context.scene.render.use_compositing = True
+        bpy.context.scene.use_nodes = True
+        tree = bpy.context.scene.node_tree
+        links = tree.links
+
+        bpy.context.view_layer.use_pass_object_index = True
+        render_layer_node = Utility.get_the_one_node_with_type(tree.nodes, 'CompositorNodeRLayers')
+        final_output = render_layer_node.outputs["IndexOB"]
+
+        # 32-bit floats represent all indices exactly, so no color mapping is necessary
+        output_file = tree.nodes.new('CompositorNodeOutputFile')
+        output_file.base_path = output_dir
+        output_file.format.file_format = "OPEN_EXR"
+        output_file.format.color_depth = "32"
+        output_file.file_slots.values()[0].path = file_prefix
+        links.new(final_output, output_file.inputs['Image'])
+
     @staticmethod
     def map_file_format_to_file_ending(file_format: str) -> str:
         """ Returns the files endings for a given blender output format.
@@ -469,7 +514,9 @@ def map_file_format_to_file_ending(file_format: str) -> str:
 
     @staticmethod
     def render(output_dir: Union[str, None] = None, file_prefix: str = "rgb_", output_key: str = "colors",
-               load_keys: Set = None, return_data: bool = True) -> Dict[str, List[np.ndarray]]:
+               load_keys: Set = None, return_data: bool = True, stream_data: bool = False,
+               frames_in_flight: int = 2, background_writer: Union[BackgroundWriter, None] = None) \
+            -> Union[Dict[str, List[np.ndarray]], Iterator[Dict[str, np.ndarray]]]:
         """ Render all frames.
 
         This will go through all frames from scene.frame_start to scene.frame_end and render each of them.
@@ -480,7 +527,15 @@ def render(output_dir: Union[str, None] = None, file_prefix: str = "rgb_", outpu
         :param output_key: The key to use for registering the output.
         :param load_keys: Set of output keys to load when available
         :param return_data: Whether to load and return generated data. Backwards compatibility to config-based pipeline.
-        :return: dict of lists of raw renderer output. Keys can be 'distance', 'colors', 'normals'
+        :param stream_data: If this is True, the generated data is not loaded at once, instead an iterator over the \
+                            frames is returned, see WriterUtility.stream_registered_outputs(). The writers accept \
+                            this iterator, so only a few frames are in memory at the same time.
+        :param frames_in_flight: If stream_data is True, the maximum amount of frames which are loaded ahead.
+        :param background_writer: If given, every frame is handed to this writer as soon as it has been rendered, \
+                                  s.t. it is written while the next frame is rendered. The writer usually loads the \
+                                  rendered files, so no data is returned in this case.
+        :return: dict of lists of raw renderer output. Keys can be 'distance', 'colors', 'normals'. If stream_data \
+                 is True, an iterator over dicts, which contain the raw renderer output of one frame.
         """
         if output_dir is None:
             output_dir = Utility.get_temporary_directory()
@@ -506,12 +561,49 @@ def render(output_dir: Union[str, None] = None, file_prefix: str = "rgb_", outpu
             # As frame_end is pointing to the next free frame, decrease it by one, as
             # blender will render all frames in [frame_start, frame_ned]
             bpy.context.scene.frame_end -= 1
-            bpy.ops.render.render(animation=True, write_still=True)
+            with RendererUtility._trace_frames():
+                if background_writer is not None:
+                    with background_writer:
+                        bpy.ops.render.render(animation=True, write_still=True)
+                else:
+                    bpy.ops.render.render(animation=True, write_still=True)
             # Revert changes
             bpy.context.scene.frame_end += 1
+
+        if not return_data or background_writer is not None:
+            return {}
+        if stream_data:
+            return WriterUtility.stream_registered_outputs(load_keys, frames_in_flight)
+        return WriterUtility.load_registered_outputs(load_keys)
         
-        return WriterUtility.load_registered_outputs(load_keys) if return_data else {}
-        
+    @staticmethod
+    @contextmanager
+    def _trace_frames():
+        """ If tracing is enabled, every rendered frame is recorded as one span, see Tracer. """
+        if not Tracer.is_enabled():
+            yield
+            return
+
+        frame_start = {}
+
+        def on_render_pre(scene, *args):
+            frame_start[scene.frame_current] = (time.perf_counter(), time.process_time())
+
+        def on_render_post(scene, *args):
+            if scene.frame_current in frame_start:
+                start_wall, start_cpu = frame_start.pop(scene.frame_current)
+                Tracer.add_span("render frame", "render", start_wall, time.perf_counter() - start_wall,
+                                time.process_time() - start_cpu, frame=scene.frame_current)
+
+        bpy.app.handlers.render_pre.append(on_render_pre)
+        bpy.app.handlers.render_post.append(on_render_post)
+        try:
+            with Tracer.span("render", "render", frames=bpy.context.scene.frame_end - bpy.context.scene.frame_start + 1):
+                yield
+        finally:
+            bpy.app.handlers.render_pre.remove(on_render_pre)
+            bpy.app.handlers.render_post.remove(on_render_post)
+
     @staticmethod
     def set_output_format(file_format: str, color_depth: int = 8, enable_transparency: bool = False,
                           jpg_quality: int = 95):
@@ -1,6 +1,6 @@
 import csv
 import os
-from typing import List, Tuple, Union, Dict
+from typing import Callable, List, Tuple, Union, Dict
 
 import bpy
 import mathutils
@@ -137,199 +137,249 @@ def render(output_dir: Union[str, None] = None, temp_dir: Union[str, None] = Non
             if use_alpha_channel:
                 MaterialLoaderUtility.add_alpha_channel_to_textures(blurry_edges=False)
 
-            # Determine path for temporary and for final output
+            # Determine path for temporary output
             temporary_segmentation_file_path = os.path.join(temp_dir, "seg_")
-            final_segmentation_file_path = os.path.join(output_dir, file_prefix)
 
             RendererUtility.set_output_format("OPEN_EXR", 16)
             RendererUtility.render(temp_dir, "seg_", None, return_data=False)
 
-            # Find optimal dtype of output based on max index
-            for dtype in [np.uint8, np.uint16, np.uint32]:
-                optimal_dtype = dtype
-                if np.iinfo(optimal_dtype).max >= len(colors) - 1:
-                    break
-            if default_values is None:
-                default_values = {}
-            elif 'class' in default_values:
-                default_values['cp_category_id'] = default_values['class']
+            def load_segmap(frame: int, suffix: str) -> np.ndarray:
+                file_path = temporary_segmentation_file_path + ("%04d" % frame) + suffix + ".exr"
+                segmentation = load_image(file_path)
+                print(file_path, segmentation.shape)
 
-            if isinstance(attributes, str):
-                # only one result is requested
-                result_channels = 1
-                attributes = [attributes]
-            elif isinstance(attributes, list):
-                result_channels = len(attributes)
-            else:
-                raise Exception("The type of this is not supported here: {}".format(attributes))
+                return Utility.map_back_from_equally_spaced_equidistant_values(segmentation,
+                                                                              num_splits_per_dimension,
+                                                                              render_colorspace_size_per_dimension)
 
-            # define them for the avoid rendering case
-            there_was_an_instance_rendering = False
-            list_of_attributes = []
+            return SegMapRendererUtility._create_segmaps(load_segmap, objects, output_dir, attributes, default_values,
+                                                         file_prefix, output_key, segcolormap_output_file_prefix,
+                                                         segcolormap_output_key)
 
-            # Check if stereo is enabled
-            if bpy.context.scene.render.use_multiview:
-                suffixes = ["_L", "_R"]
-            else:
-                suffixes = [""]
+    @staticmethod
+    def decode_index_pass(index_dir: Union[str, None] = None, index_file_prefix: str = "instance_",
+                          output_dir: Union[str, None] = None, map_by: Union[str, List[str]] = "class",
+                          default_values: Union[Dict[str, str]] = {"class": 0}, file_prefix: str = "segmap_",
+                          output_key: str = "segmap", segcolormap_output_file_prefix: str = "instance_attribute_map_",
+                          segcolormap_output_key: str = "segcolormap") -> Dict[str, List[np.ndarray]]:
+        """ Creates segmentation maps from the object index pass, which has been rendered together with the color images.
+
+        In contrast to render(), this does not need an additional rendering and no material is replaced. The index
+        pass has to be enabled via RendererUtility.enable_segmentation_output() before rendering. As the indices are
+        stored as 32-bit floats, they are read back exactly. Transparent surfaces are handled via the alpha threshold
+        of the view layer.
+
+        :param index_dir: The directory, the index pass has been written to. If None, the temporary directory is used.
+        :param index_file_prefix: The prefix of the index pass files.
+        :param output_dir: The directory to write images to.
+        :param map_by: The attributes to be used for color mapping.
+        :param default_values: The default values used for the keys used in attributes.
+        :param file_prefix: The prefix to use for writing the images.
+        :param output_key: The key to use for registering the output.
+        :param segcolormap_output_file_prefix: The prefix to use for writing the segmentation-color map csv.
+        :param segcolormap_output_key: The key to use for registering the segmentation-color map output.
+        :return: dict of lists of segmaps and (for instance segmentation) segcolormaps
+        """
+        if index_dir is None:
+            index_dir = Utility.get_temporary_directory()
+        if output_dir is None:
+            output_dir = Utility.get_temporary_directory()
 
-            return_dict = {}
-            
-            # After rendering
-            for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):  # for each rendered frame
-                save_in_csv_attributes = {}
-                for suffix in suffixes:
-                    file_path = temporary_segmentation_file_path + ("%04d" % frame) + suffix + ".exr"
-                    segmentation = load_image(file_path)
-                    print(file_path, segmentation.shape)
-
-                    segmap = Utility.map_back_from_equally_spaced_equidistant_values(segmentation,
-                                                                                     num_splits_per_dimension,
-                                                                                     render_colorspace_size_per_dimension)
-                    segmap = segmap.astype(optimal_dtype)
-
-                    object_ids = np.unique(segmap)
-                    max_id = np.max(object_ids)
-                    if max_id >= len(objects):
-                        raise Exception("There are more object colors than there are objects")
-                    combined_result_map = []
-                    there_was_an_instance_rendering = False
-                    list_of_attributes = []
-                    channels = []
-                    for channel_id in range(result_channels):
-                        resulting_map = np.empty((segmap.shape[0], segmap.shape[1]))
-                        was_used = False
-                        current_attribute = attributes[channel_id]
-                        org_attribute = current_attribute
-
-                        # if the class is used the category_id attribute is evaluated
-                        if current_attribute == "class":
-                            current_attribute = "cp_category_id"
-                        # in the instance case the resulting ids are directly used
-                        if current_attribute == "instance":
-                            there_was_an_instance_rendering = True
-                            resulting_map = segmap
+        # Objects, which have been added after enabling the index pass, have the pass index 0 and count as background
+        objects = [bpy.context.scene.world]
+        pass_indices = [0]
+        for obj in get_all_blender_mesh_objects():
+            if obj.pass_index > 0:
+                objects.append(obj)
+                pass_indices.append(obj.pass_index)
+        # Lookup table from pass index to the position of the object in the objects list
+        index_to_object = np.zeros(max(pass_indices) + 1, dtype=np.int64)
+        index_to_object[pass_indices] = np.arange(len(objects))
+
+        def load_segmap(frame: int, suffix: str) -> np.ndarray:
+            file_path = os.path.join(index_dir, index_file_prefix) + ("%04d" % frame) + suffix + ".exr"
+            pass_index_map = np.rint(load_image(file_path, num_channels=1)).astype(np.int64)
+            # Unknown indices are mapped to the background
+            pass_index_map[(pass_index_map < 0) | (pass_index_map >= len(index_to_object))] = 0
+            return index_to_object[pass_index_map]
+
+        return SegMapRendererUtility._create_segmaps(load_segmap, objects, output_dir, map_by, default_values,
+                                                     file_prefix, output_key, segcolormap_output_file_prefix,
+                                                     segcolormap_output_key)
+
+    @staticmethod
+    def _create_segmaps(load_segmap: Callable[[int, str], np.ndarray], objects: list, output_dir: str,
+                        map_by: Union[str, List[str]], default_values: Dict[str, str], file_prefix: str,
+                        output_key: str, segcolormap_output_file_prefix: str,
+                        segcolormap_output_key: str) -> Dict[str, List[np.ndarray]]:
+        """ Maps the instance ids of all rendered frames to the requested attributes and writes the results.
+
+        :param load_segmap: A function, which returns the map of instance ids for the given frame and stereo suffix.
+        :param objects: The list of objects, the instance ids refer to. The first entry is the background.
+        :param output_dir: The directory to write images to.
+        :param map_by: The attributes to be used for color mapping.
+        :param default_values: The default values used for the keys used in attributes.
+        :param file_prefix: The prefix to use for writing the images.
+        :param output_key: The key to use for registering the output.
+        :param segcolormap_output_file_prefix: The prefix to use for writing the segmentation-color map csv.
+        :param segcolormap_output_key: The key to use for registering the segmentation-color map output.
+        :return: dict of lists of segmaps and (for instance segmentation) segcolormaps
+        """
+        attributes = map_by
+        final_segmentation_file_path = os.path.join(output_dir, file_prefix)
+
+        # Find optimal dtype of output based on max index
+        for dtype in [np.uint8, np.uint16, np.uint32]:
+            optimal_dtype = dtype
+            if np.iinfo(optimal_dtype).max >= len(objects) - 1:
+                break
+        if default_values is None:
+            default_values = {}
+        elif 'class' in default_values:
+            default_values['cp_category_id'] = default_values['class']
+
+        if isinstance(attributes, str):
+            # only one result is requested
+            result_channels = 1
+            attributes = [attributes]
+        elif isinstance(attributes, list):
+            result_channels = len(attributes)
+        else:
+            raise Exception("The type of this is not supported here: {}".format(attributes))
+
+        # define them for the avoid rendering case
+        there_was_an_instance_rendering = False
+        list_of_attributes = []
+
+        # Check if stereo is enabled
+        if bpy.context.scene.render.use_multiview:
+            suffixes = ["_L", "_R"]
+        else:
+            suffixes = [""]
+
+        # Resolve the values of all requested attributes for all objects once, s.t. each frame only needs lookups
+        lookup_tables = {}
+        for current_attribute in attributes:
+            # if the class is used the category_id attribute is evaluated
+            if current_attribute == "class":
+                current_attribute = "cp_category_id"
+            if current_attribute != "instance" and current_attribute not in lookup_tables:
+                lookup_tables[current_attribute] = SegMapRendererUtility._build_attribute_lookup_table(
+                    objects, current_attribute, default_values)
+
+        return_dict = {}
+        save_in_csv_attributes = {}
+
+        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):  # for each rendered frame
+            save_in_csv_attributes = {}
+            for suffix in suffixes:
+                segmap = load_segmap(frame, suffix).astype(optimal_dtype)
+
+                max_id = np.max(segmap)
+                if max_id >= len(objects):
+                    raise Exception("There are more object colors than there are objects")
+                object_ids = np.flatnonzero(np.bincount(segmap.ravel(), minlength=len(objects)))
+                combined_result_map = []
+                there_was_an_instance_rendering = False
+                list_of_attributes = []
+                channels = []
+                for channel_id in range(result_channels):
+                    resulting_map = None
+                    was_used = False
+                    current_attribute = attributes[channel_id]
+                    org_attribute = current_attribute
+
+                    # if the class is used the category_id attribute is evaluated
+                    if current_attribute == "class":
+                        current_attribute = "cp_category_id"
+                    # in the instance case the resulting ids are directly used
+                    if current_attribute == "instance":
+                        there_was_an_instance_rendering = True
+                        resulting_map = segmap
+                        was_used = True
+                        # a non default value was also used
+                        non_default_value_was_used = True
+                    else:
+                        if current_attribute != "cp_category_id":
+                            list_of_attributes.append(current_attribute)
+                        lookup_table = lookup_tables[current_attribute]
+                        attribute = lookup_table["attribute"]
+
+                        missing_ids = object_ids[lookup_table["is_missing"][object_ids]]
+                        if len(missing_ids) > 0:
+                            # if the requested current_attribute is not a custom property or a attribute
+                            # or there is a default value stored
+                            # it throws an exception
+                            raise Exception("The obj: {} does not have the "
+                                            "attribute: {}, striped: {}. Maybe try a default "
+                                            "value.".format(objects[missing_ids[0]].name, current_attribute, attribute))
+
+                        # check if the values can be saved as an image or only in the csv file
+                        is_numeric = lookup_table["is_numeric"][object_ids]
+                        if np.any(is_numeric) and not np.all(is_numeric):
+                            raise Exception("During creating the mapping, the saving to an image or a csv file "
+                                            "switched, this might indicated that the used default value, does "
+                                            "not have the same type as the returned value, "
+                                            "for: {}".format(current_attribute))
+                        # this avoids that for certain attributes only the default value is written
+                        non_default_value_was_used = False
+                        if np.all(is_numeric):
+                            resulting_map = np.take(lookup_table["numeric_values"], segmap)
                             was_used = True
-                            # a non default value was also used
-                            non_default_value_was_used = True
-                        else:
-                            if current_attribute != "cp_category_id":
-                                list_of_attributes.append(current_attribute)
-                            # for the current attribute remove cp_ and _csv, if present
-                            attribute = current_attribute
-                            if attribute.startswith("cp_"):
-                                attribute = attribute[len("cp_"):]
-                            # check if a default value was specified
-                            default_value_set = False
-                            if current_attribute in default_values or attribute in default_values:
-                                default_value_set = True
-                                if current_attribute in default_values:
-                                    default_value = default_values[current_attribute]
-                                elif attribute in default_values:
-                                    default_value = default_values[attribute]
-                            last_state_save_in_csv = None
-                            # this avoids that for certain attributes only the default value is written
-                            non_default_value_was_used = False
-                            # iterate over all object ids
-                            for object_id in object_ids:
-                                is_default_value = False
-                                # get the corresponding object via the id
-                                current_obj = objects[object_id]
-                                # if the current obj has a attribute with that name -> get it
-                                if hasattr(current_obj, attribute):
-                                    value = getattr(current_obj, attribute)
-                                # if the current object has a custom property with that name -> get it
-                                elif current_attribute.startswith("cp_") and attribute in current_obj:
-                                    value = current_obj[attribute]
-                                elif current_attribute.startswith("cf_"):
-                                    if current_attribute == "cf_basename":
-                                        value = current_obj.name
-                                        if "." in value:
-                                            value = value[:value.rfind(".")]
-                                elif default_value_set:
-                                    # if none of the above applies use the default value
-                                    value = default_value
-                                    is_default_value = True
-                                else:
-                                    # if the requested current_attribute is not a custom property or a attribute
-                                    # or there is a default value stored
-                                    # it throws an exception
-                                    raise Exception("The obj: {} does not have the "
-                                                    "attribute: {}, striped: {}. Maybe try a default "
-                                                    "value.".format(current_obj.name, current_attribute, attribute))
-
-                                # check if the value should be saved as an image or in the csv file
-                                save_in_csv = False
-                                try:
-                                    resulting_map[segmap == object_id] = value
-                                    was_used = True
-                                    if not is_default_value:
-                                        non_default_value_was_used = True
-                                    # save everything which is not instance also in the .csv
-                                    if current_attribute != "instance":
-                                        save_in_csv = True
-                                except ValueError:
-                                    save_in_csv = True
-
-                                if last_state_save_in_csv is not None and last_state_save_in_csv != save_in_csv:
-                                    raise Exception("During creating the mapping, the saving to an image or a csv file "
-                                                    "switched, this might indicated that the used default value, does "
-                                                    "not have the same type as the returned value, "
-                                                    "for: {}".format(current_attribute))
-                                last_state_save_in_csv = save_in_csv
-                                if save_in_csv:
-                                    if object_id in save_in_csv_attributes:
-                                        save_in_csv_attributes[object_id][attribute] = value
-                                    else:
-                                        save_in_csv_attributes[object_id] = {attribute: value}
-                        if was_used and non_default_value_was_used:
-                            channels.append(org_attribute)
-                            combined_result_map.append(resulting_map)
-                            return_dict.setdefault("{}_segmaps{}".format(org_attribute, suffix), []).append(resulting_map)
-
-                    fname = final_segmentation_file_path + ("%04d" % frame) + suffix
-                    # combine all resulting images to one image
-                    resulting_map = np.stack(combined_result_map, axis=2)
-                    # remove the unneeded third dimension
-                    if resulting_map.shape[2] == 1:
-                        resulting_map = resulting_map[:, :, 0]
-                    # TODO: Remove unnecessary save when we give up backwards compatibility
-                    np.save(fname, resulting_map)
+                            non_default_value_was_used = not np.all(lookup_table["is_default"][object_ids])
+
+                        # save everything which is not instance also in the .csv
+                        values = lookup_table["values"]
+                        for object_id in object_ids:
+                            save_in_csv_attributes.setdefault(object_id, {})[attribute] = values[object_id]
+                    if was_used and non_default_value_was_used:
+                        channels.append(org_attribute)
+                        combined_result_map.append(resulting_map)
+                        return_dict.setdefault("{}_segmaps{}".format(org_attribute, suffix), []).append(resulting_map)
+
+                fname = final_segmentation_file_path + ("%04d" % frame) + suffix
+                # combine all resulting images to one image
+                resulting_map = np.stack(combined_result_map, axis=2)
+                # remove the unneeded third dimension
+                if resulting_map.shape[2] == 1:
+                    resulting_map = resulting_map[:, :, 0]
+                # TODO: Remove unnecessary save when we give up backwards compatibility
+                np.save(fname, resulting_map)
+            
+            if there_was_an_instance_rendering:
+                mappings = []
+                for object_id, attribute_dict in save_in_csv_attributes.items():
+                    mappings.append({"idx" : object_id, **attribute_dict})
+                return_dict.setdefault("instance_attribute_maps", []).append(mappings)
                 
-                if there_was_an_instance_rendering:
-                    mappings = []
-                    for object_id, attribute_dict in save_in_csv_attributes.items():
-                        mappings.append({"idx" : object_id, **attribute_dict})
-                    return_dict.setdefault("instance_attribute_maps", []).append(mappings)
-                    
-                    # write color mappings to file 
-                    # TODO: Remove unnecessary csv file when we give up backwards compatibility
-                    csv_file_path = os.path.join(output_dir, segcolormap_output_file_prefix + ("%04d.csv" % frame))
-                    with open(csv_file_path, 'w', newline='') as csvfile:
-                        # get from the first element the used field names
-                        fieldnames = ["idx"]
-                        # get all used object element keys
-                        for object_element in save_in_csv_attributes.values():
-                            fieldnames.extend(list(object_element.keys()))
-                            break
-                        for channel_name in channels:
-                            fieldnames.append("channel_{}".format(channel_name))
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                        writer.writeheader()
-                        # save for each object all values in one row
-                        for obj_idx, object_element in save_in_csv_attributes.items():
-                            object_element["idx"] = obj_idx
-                            for i, channel_name in enumerate(channels):
-                                object_element["channel_{}".format(channel_name)] = i
-                            writer.writerow(object_element)
-                else:
-                    if len(list_of_attributes) > 0:
-                        raise Exception("There were attributes specified in the may_by, which could not be saved as "
-                                        "there was no \"instance\" may_by key used. This is true for this/these "
-                                        "keys: {}".format(", ".join(list_of_attributes)))
-                    # if there was no instance rendering no .csv file is generated!
-                    # delete all saved infos about .csv
-                    save_in_csv_attributes = {}
+                # write color mappings to file 
+                # TODO: Remove unnecessary csv file when we give up backwards compatibility
+                csv_file_path = os.path.join(output_dir, segcolormap_output_file_prefix + ("%04d.csv" % frame))
+                with open(csv_file_path, 'w', newline='') as csvfile:
+                    # get from the first element the used field names
+                    fieldnames = ["idx"]
+                    # get all used object element keys
+                    for object_element in save_in_csv_attributes.values():
+                        fieldnames.extend(list(object_element.keys()))
+                        break
+                    for channel_name in channels:
+                        fieldnames.append("channel_{}".format(channel_name))
+                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                    writer.writeheader()
+                    # save for each object all values in one row
+                    for obj_idx, object_element in save_in_csv_attributes.items():
+                        object_element["idx"] = obj_idx
+                        for i, channel_name in enumerate(channels):
+                            object_element["channel_{}".format(channel_name)] = i
+                        writer.writerow(object_element)
+            else:
+                if len(list_of_attributes) > 0:
+                    raise Exception("There were attributes specified in the may_by, which could not be saved as "
+                                    "there was no \"instance\" may_by key used. This is true for this/these "
+                                    "keys: {}".format(", ".join(list_of_attributes)))
+                # if there was no instance rendering no .csv file is generated!
+                # delete all saved infos about .csv
+                save_in_csv_attributes = {}
 
         Utility.register_output(output_dir, file_prefix, output_key, ".npy", "2.0.0")
 
@@ -341,3 +391,60 @@ def render(output_dir: Union[str, None] = None, temp_dir: Union[str, None] = Non
                                     "2.0.0")
                 
         return return_dict
+
+    @staticmethod
+    def _build_attribute_lookup_table(objects: list, current_attribute: str, default_values: Dict[str, str]) -> dict:
+        """ Determines the value of the given attribute for all objects.
+
+        :param objects: The list of objects, the instance ids refer to.
+        :param current_attribute: The requested attribute, custom properties start with "cp_".
+        :param default_values: The default values used for the keys used in attributes.
+        :return: A dict with the stripped attribute name and arrays indexed by instance id: the values, their numeric \
+                 representation, whether a value is numeric, whether it is the default value and whether it is missing.
+        """
+        # for the current attribute remove cp_, if present
+        attribute = current_attribute
+        if attribute.startswith("cp_"):
+            attribute = attribute[len("cp_"):]
+        # check if a default value was specified
+        default_value_set = False
+        if current_attribute in default_values or attribute in default_values:
+            default_value_set = True
+            if current_attribute in default_values:
+                default_value = default_values[current_attribute]
+            elif attribute in default_values:
+                default_value = default_values[attribute]
+
+        values = [None] * len(objects)
+        numeric_values = np.zeros(len(objects))
+        is_numeric = np.zeros(len(objects), dtype=bool)
+        is_default = np.zeros(len(objects), dtype=bool)
+        is_missing = np.zeros(len(objects), dtype=bool)
+        for object_id, current_obj in enumerate(objects):
+            # if the current obj has a attribute with that name -> get it
+            if hasattr(current_obj, attribute):
+                value = getattr(current_obj, attribute)
+            # if the current object has a custom property with that name -> get it
+            elif current_attribute.startswith("cp_") and attribute in current_obj:
+                value = current_obj[attribute]
+            elif current_attribute == "cf_basename":
+                value = current_obj.name
+                if "." in value:
+                    value = value[:value.rfind(".")]
+            elif default_value_set:
+                # if none of the above applies use the default value
+                value = default_value
+                is_default[object_id] = True
+            else:
+                is_missing[object_id] = True
+                continue
+
+            values[object_id] = value
+            try:
+                numeric_values[object_id] = value
+                is_numeric[object_id] = True
+            except (ValueError, TypeError):
+                pass
+
+        return {"attribute": attribute, "values": values, "numeric_values": numeric_values, "is_numeric": is_numeric,
+                "is_default": is_default, "is_missing": is_missing}
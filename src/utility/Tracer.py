@@ -0,0 +1,238 @@
+import atexit
+import csv
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Union, Any
+
+try:
+    import resource
+except ImportError:
+    # Not available on windows, there the peak memory is not recorded
+    resource = None
+
+
+class Tracer:
+    """ Records nested spans with their wall time, cpu time and the peak memory of the process.
+
+    Tracing is disabled by default and costs nearly nothing then. It is enabled via enable() or by setting the
+    "BLENDER_PROC_TRACE_DIR" environment variable. In the latter case, the trace is written into the given directory
+    when the process exits, so every run can be traced without changing any code or config.
+
+    The recorded spans can be exported as:
+
+    - Chrome trace: a .json file, which can be opened in chrome://tracing or https://ui.perfetto.dev
+    - Summary: a .csv file with one row per span name, containing the count, the total and maximal wall time,
+      the total cpu time and the peak memory.
+
+    Spans are recorded via:
+
+    .. code-block:: python
+
+        with Tracer.span("build bvh", "bvh"):
+            ...
+
+        @Tracer.traced("loader")
+        def load(...):
+            ...
+
+    The cpu time of a span is the cpu time of the whole process, so it includes the work of all threads, which run
+    in parallel to the span. The peak memory is the maximal resident set size of the process so far.
+    """
+
+    _enabled = False
+    _trace_dir = None
+    _events: List[Dict[str, Any]] = []
+    _lock = threading.Lock()
+    _start_time = time.perf_counter()
+
+    @staticmethod
+    def enable(trace_dir: Union[str, None] = None):
+        """ Enables the tracing.
+
+        :param trace_dir: If given, the chrome trace and the summary are written into this directory, when the
+                          process exits.
+        """
+        if trace_dir is not None and Tracer._trace_dir is None:
+            atexit.register(Tracer.save)
+        Tracer._trace_dir = trace_dir
+        Tracer._enabled = True
+
+    @staticmethod
+    def disable():
+        """ Disables the tracing, already recorded spans are kept. """
+        Tracer._enabled = False
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """ Returns whether the tracing is enabled.
+
+        :return: True, if spans are recorded.
+        """
+        return Tracer._enabled
+
+    @staticmethod
+    def reset():
+        """ Removes all recorded spans. """
+        with Tracer._lock:
+            Tracer._events = []
+
+    @staticmethod
+    def get_peak_memory() -> float:
+        """ Returns the peak resident set size of this process.
+
+        :return: The peak memory in MB or 0, if it cannot be determined on this platform.
+        """
+        if resource is None:
+            return 0.0
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # On macOS the value is given in bytes, on linux in kilobytes
+        return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, category: str = "", **args):
+        """ Records the enclosed block as one span.
+
+        :param name: The name of the span, spans with the same name are aggregated in the summary.
+        :param category: The category of the span, e.g. "module", "loader", "render" or "writer".
+        :param args: Further values, which are shown in the chrome trace, e.g. the number of rays.
+        """
+        if not Tracer._enabled:
+            yield
+            return
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            Tracer.add_span(name, category, start_wall, time.perf_counter() - start_wall,
+                            time.process_time() - start_cpu, **args)
+
+    @staticmethod
+    def traced(category: str = "", name: Union[str, None] = None) -> Callable:
+        """ Returns a decorator, which records every call of the decorated function as one span.
+
+        :param category: The category of the spans.
+        :param name: The name of the spans. Per default the qualified name of the function is used.
+        :return: The decorator.
+        """
+        def decorator(function: Callable) -> Callable:
+            span_name = name if name is not None else function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not Tracer._enabled:
+                    return function(*args, **kwargs)
+                with Tracer.span(span_name, category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def add_span(name: str, category: str, start_wall: float, wall_time: float, cpu_time: Union[float, None] = None,
+                 **args):
+        """ Records a span, whose times have been measured outside of span(), e.g. in blender handlers.
+
+        :param name: The name of the span.
+        :param category: The category of the span.
+        :param start_wall: The start of the span, measured via time.perf_counter().
+        :param wall_time: The duration of the span in seconds.
+        :param cpu_time: The cpu time of the process spent during the span in seconds, if known.
+        :param args: Further values, which are shown in the chrome trace.
+        """
+        if not Tracer._enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_wall - Tracer._start_time) * 1e6,
+            "dur": wall_time * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": dict(args, cpu_time=cpu_time, peak_memory_mb=Tracer.get_peak_memory())
+        }
+        with Tracer._lock:
+            Tracer._events.append(event)
+
+    @staticmethod
+    def export_chrome_trace(path: str):
+        """ Writes all recorded spans in the chrome trace event format.
+
+        :param path: The path of the .json file.
+        """
+        with Tracer._lock:
+            events = list(Tracer._events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    @staticmethod
+    def get_summary() -> List[Dict[str, Any]]:
+        """ Aggregates all recorded spans by their name.
+
+        :return: One dict per span name, sorted by the total wall time.
+        """
+        summary = {}
+        with Tracer._lock:
+            events = list(Tracer._events)
+        for event in events:
+            row = summary.setdefault(event["name"], {"name": event["name"], "category": event["cat"], "count": 0,
+                                                     "total_wall_time": 0.0, "max_wall_time": 0.0,
+                                                     "total_cpu_time": 0.0, "peak_memory_mb": 0.0})
+            wall_time = event["dur"] / 1e6
+            row["count"] += 1
+            row["total_wall_time"] += wall_time
+            row["max_wall_time"] = max(row["max_wall_time"], wall_time)
+            if event["args"]["cpu_time"] is not None:
+                row["total_cpu_time"] += event["args"]["cpu_time"]
+            row["peak_memory_mb"] = max(row["peak_memory_mb"], event["args"]["peak_memory_mb"])
+
+        for row in summary.values():
+            row["mean_wall_time"] = row["total_wall_time"] / row["count"]
+        return sorted(summary.values(), key=lambda row: row["total_wall_time"], reverse=True)
+
+    @staticmethod
+    def export_summary_csv(path: str):
+        """ Writes the summary of all recorded spans as .csv file.
+
+        :param path: The path of the .csv file.
+        """
+        fieldnames = ["name", "category", "count", "total_wall_time", "mean_wall_time", "max_wall_time",
+                      "total_cpu_time", "peak_memory_mb"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for row in Tracer.get_summary():
+                writer.writerow(row)
+
+    @staticmethod
+    def save(trace_dir: Union[str, None] = None, run_name: Union[str, None] = None):
+        """ Writes the chrome trace and the summary of this process into the given directory.
+
+        The file names contain the current time and the process id, s.t. many runs can share one directory.
+
+        :param trace_dir: The output directory. Per default, the directory given to enable() is used.
+        :param run_name: If given, it is appended to the file names, e.g. the name of a job.
+        """
+        if trace_dir is None:
+            trace_dir = Tracer._trace_dir
+        if trace_dir is None or not Tracer._events:
+            return
+        os.makedirs(trace_dir, exist_ok=True)
+        prefix = "{}_{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid())
+        if run_name is not None:
+            prefix += "_" + run_name
+        prefix = os.path.join(trace_dir, prefix)
+        Tracer.export_chrome_trace(prefix + "_trace.json")
+        Tracer.export_summary_csv(prefix + "_summary.csv")
+        print("Saved trace to " + prefix + "_trace.json")
+
+
+if os.environ.get("BLENDER_PROC_TRACE_DIR"):
+    Tracer.enable(os.environ["BLENDER_PROC_TRACE_DIR"])
@@ -14,6 +14,7 @@
 
 from src.main.GlobalStorage import GlobalStorage
 from src.utility.Config import Config
+from src.utility.Tracer import Tracer
 from mathutils import Matrix, Vector
 import numpy as np
 
@@ -74,7 +75,7 @@ def initialize_modules(module_configs):
             if "amount_of_repetitions" in module_config:
                 amount_of_repetitions = Config(module_config).get_int("amount_of_repetitions")
 
-            with Utility.BlockStopWatch("Initializing module " + module_config["module"]):
+            with Utility.BlockStopWatch("Initializing module " + module_config["module"], "module_init"):
                 for i in range(amount_of_repetitions):
                     module_class = None
                     # For backwards compatibility we allow to specify a modules also without "Module" suffix.
@@ -305,16 +306,23 @@ def read_suncg_lights_windows_materials():
     class BlockStopWatch:
         """ Calls a print statement to mark the start and end of this block and also measures execution time.
 
+        If tracing is enabled, the block is also recorded as a span, see Tracer.
+
         Usage: with BlockStopWatch('text'):
         """
-        def __init__(self, block_name):
+        def __init__(self, block_name, category="block"):
             self.block_name = block_name
+            self.category = category
 
         def __enter__(self):
             print("#### Start - " + self.block_name + " ####")
             self.start = time.time()
+            self.start_cpu = time.process_time()
+            self.start_wall = time.perf_counter()
 
         def __exit__(self, type, value, traceback):
+            Tracer.add_span(self.block_name, self.category, self.start_wall, time.perf_counter() - self.start_wall,
+                            time.process_time() - self.start_cpu)
             print("#### Finished - " + self.block_name + " (took " + ("%.3f" % (time.time() - self.start)) + " seconds) ####")
 
     class UndoAfterExecution:
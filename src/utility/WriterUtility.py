@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Union, Any, Set, Tuple
+from typing import List, Dict, Union, Any, Set, Tuple, Iterable, Iterator, Callable
 
 from src.utility.PostProcessingUtility import PostProcessingUtility
 from src.utility.SetupUtility import SetupUtility
@@ -8,20 +8,28 @@
 import numpy as np
 import csv
 import json
+import itertools
+import collections
+import operator
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 import mathutils
 import h5py
 
-from src.utility.BlenderUtility import load_image
+from src.utility.ImageIOUtility import ImageIOUtility
 from src.utility.MathUtility import MathUtility
 from src.utility.Utility import Utility
 from src.utility.CameraUtility import CameraUtility
+from src.utility.FileLock import FileLock
+from src.utility.Tracer import Tracer
 
 
 class WriterUtility:
 
     @staticmethod
+    @Tracer.traced("writer")
     def load_registered_outputs(keys: Set[str]) -> Dict[str, List[np.ndarray]]:
         """
         Loads registered outputs with specified keys
@@ -34,26 +42,10 @@ def load_registered_outputs(keys: Set[str]) -> Dict[str, List[np.ndarray]]:
         for reg_out in reg_outputs:
             if reg_out['key'] in keys:
                 if '%' in reg_out['path']:
-                    # per frame outputs
-                    for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
-                        output_path = Utility.resolve_path(reg_out['path'] % frame_id)
-                        if os.path.exists(output_path):
-                            output_file = WriterUtility.load_output_file(output_path)
-                        else:
-                            try:
-                                # check for stereo files
-                                output_paths = WriterUtility._get_stereo_path_pair(output_path)
-                                # convert to a tensor of shape [2, img_x, img_y, channels]
-                                # output_file[0] is the left image and output_file[1] the right image
-                                output_file = np.array([WriterUtility.load_output_file(path) for path in output_paths])
-                            except:
-                                raise('Could not find original or stereo paths: {}'.format(output_paths))
-
-                        # For outputs like distance or depth, we automatically trim the last channel here
-                        if "trim_redundant_channels" in reg_out and reg_out["trim_redundant_channels"]:
-                            output_file = PostProcessingUtility.trim_redundant_channels(output_file)
-
-                        output_data_dict.setdefault(reg_out['key'], []).append(output_file)
+                    # per frame outputs, all frames are decoded in parallel
+                    frame_ids = list(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end))
+                    output_data_dict[reg_out['key']] = ImageIOUtility.map_parallel(
+                        lambda frame_id: WriterUtility._load_frame_output(reg_out, frame_id), frame_ids)
                 else:
                     # per run outputs
                     output_path = Utility.resolve_path(reg_out['path'])
@@ -61,7 +53,121 @@ def load_registered_outputs(keys: Set[str]) -> Dict[str, List[np.ndarray]]:
                     output_data_dict[reg_out['key']] = output_file
 
         return output_data_dict
-    
+
+    @staticmethod
+    def stream_registered_outputs(keys: Set[str], frames_in_flight: int = 2) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Loads registered outputs with specified keys frame by frame.
+
+        In contrast to load_registered_outputs(), not all frames are kept in memory at once. Instead, one dict per
+        frame is yielded, which maps each key to the data of this frame. While a frame is processed, the next frames
+        are already loaded in the background. Per run outputs are loaded once and are part of every frame dict.
+
+        :param keys: set of output_key types to load
+        :param frames_in_flight: The maximum amount of frames, which are loaded ahead of the currently processed frame.
+        :return: An iterator over the per frame dicts of raw loaded outputs.
+        """
+        run_outputs = {}
+        for reg_out in Utility.get_registered_outputs():
+            if reg_out['key'] in keys and '%' not in reg_out['path']:
+                run_outputs[reg_out['key']] = WriterUtility.load_output_file(Utility.resolve_path(reg_out['path']))
+
+        def load_frame(frame_id: int) -> Dict[str, np.ndarray]:
+            frame_data = dict(run_outputs)
+            frame_data.update(WriterUtility.load_registered_frame_outputs(keys, frame_id))
+            return frame_data
+
+        frames_in_flight = max(frames_in_flight, 1)
+        with ThreadPoolExecutor(max_workers=frames_in_flight) as executor:
+            pending_frames = collections.deque()
+            for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+                pending_frames.append(executor.submit(load_frame, frame_id))
+                if len(pending_frames) >= frames_in_flight:
+                    yield pending_frames.popleft().result()
+            while pending_frames:
+                yield pending_frames.popleft().result()
+
+    @staticmethod
+    def load_registered_frame_outputs(keys: Set[str], frame_id: int) -> Dict[str, np.ndarray]:
+        """
+        Loads the per frame outputs with the specified keys of one frame.
+
+        Per run outputs are not loaded, as they might not be written before all frames have been rendered.
+
+        :param keys: set of output_key types to load
+        :param frame_id: The frame whose outputs should be loaded.
+        :return: dict of the raw loaded outputs of the given frame.
+        """
+        frame_data = {}
+        for reg_out in Utility.get_registered_outputs():
+            if reg_out['key'] in keys and '%' in reg_out['path']:
+                frame_data[reg_out['key']] = WriterUtility._load_frame_output(reg_out, frame_id)
+        return frame_data
+
+    @staticmethod
+    def _load_frame_output(reg_out: Dict[str, Any], frame_id: int) -> np.ndarray:
+        """
+        Loads the data of one frame of the given registered per frame output.
+
+        :param reg_out: The registered output.
+        :param frame_id: The frame whose data should be loaded.
+        :return: The loaded data, for stereo outputs a tensor of shape [2, img_x, img_y, channels], where output[0] is \
+                 the left image and output[1] the right image.
+        """
+        output_path = Utility.resolve_path(reg_out['path'] % frame_id)
+        # Only the first channel is decoded, if all channels are equal anyway
+        trim_redundant_channels = reg_out.get("trim_redundant_channels", False)
+        num_channels = 1 if trim_redundant_channels else None
+        if os.path.exists(output_path):
+            output_file = WriterUtility.load_output_file(output_path, num_channels=num_channels)
+        else:
+            # check for stereo files
+            output_paths = WriterUtility._get_stereo_path_pair(output_path)
+            if not all(os.path.exists(path) for path in output_paths):
+                raise Exception('Could not find original or stereo paths: {}'.format(output_paths))
+            output_file = np.array([WriterUtility.load_output_file(path, num_channels=num_channels)
+                                    for path in output_paths])
+
+        # For outputs like distance or depth, we automatically trim the last channel here
+        if trim_redundant_channels:
+            output_file = PostProcessingUtility.trim_redundant_channels(output_file)
+        return output_file
+
+    @staticmethod
+    def iterate_frames(output_data: Union[Dict[str, List[Any]], Iterable[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Returns an iterator over the per frame dicts of the given output data.
+
+        :param output_data: Either a dict, which maps each key to the list of its per frame data, like returned by
+                            load_registered_outputs(), or an iterable of per frame dicts, like returned by
+                            stream_registered_outputs().
+        :return: An iterator over dicts, which map each key to the data of one frame.
+        """
+        if isinstance(output_data, dict):
+            amount_of_frames = 0
+            for data_block in output_data.values():
+                if isinstance(data_block, list):
+                    amount_of_frames = max([amount_of_frames, len(data_block)])
+            return ({key: data_block[frame] for key, data_block in output_data.items()}
+                    for frame in range(amount_of_frames))
+        return iter(output_data)
+
+    @staticmethod
+    def split_frames(frames: Iterable[Dict[str, Any]], keys: List[str]) -> Dict[str, Iterator[Any]]:
+        """
+        Splits an iterable of per frame dicts into one iterator per key.
+
+        This allows to pass the frames from stream_registered_outputs() to writers, which expect one list per key,
+        e.g. BopWriterUtility.write(colors=streams["colors"], depths=streams["depth"]). The iterators have to be
+        consumed in lockstep, as it is done by the writers, otherwise the frames in between are buffered.
+
+        :param frames: The iterable of per frame dicts.
+        :param keys: The keys to select from the per frame dicts.
+        :return: A dict mapping each key to an iterator over its per frame data.
+        """
+        return {key: map(operator.itemgetter(key), frames_copy)
+                for key, frames_copy in zip(keys, itertools.tee(frames, len(keys)))}
+
     @staticmethod
     def _get_stereo_path_pair(file_path: str) -> Tuple[str, str]:
         """
@@ -77,12 +183,15 @@ def _get_stereo_path_pair(file_path: str) -> Tuple[str, str]:
         return path_l, path_r
 
     @staticmethod
-    def load_output_file(file_path: str, write_alpha_channel: bool = False, remove: bool = True) -> np.ndarray:
+    def load_output_file(file_path: str, write_alpha_channel: bool = False, remove: bool = True,
+                         num_channels: Union[int, None] = None) -> np.ndarray:
         """ Tries to read in the file with the given path into a numpy array.
 
         :param file_path: The file path. Type: string.
         :param write_alpha_channel: Whether to load the alpha channel as well. Type: bool. Default: False
         :param remove: Whether to delete file after loading.
+        :param num_channels: The number of channels to read from images. If None, three channels are read or four, \
+                             if write_alpha_channel is True.
         :return: Loaded data from the file as numpy array if possible.
         """
         if not os.path.exists(file_path):
@@ -91,8 +200,10 @@ def load_output_file(file_path: str, write_alpha_channel: bool = False, remove:
         file_ending = file_path[file_path.rfind(".") + 1:].lower()
 
         if file_ending in ["exr", "png", "jpg"]:
-            # num_channels is 4 if transparent_background is true in config
-            output = load_image(file_path, num_channels=3 + (1 if write_alpha_channel else 0))
+            if num_channels is None:
+                # num_channels is 4 if transparent_background is true in config
+                num_channels = 3 + (1 if write_alpha_channel else 0)
+            output = ImageIOUtility.read(file_path, num_channels=num_channels)
         elif file_ending in ["npy", "npz"]:
             output =  np.load(file_path)
         elif file_ending in ["csv"]:
@@ -238,14 +349,18 @@ def _get_shapenet_attribute(shapenet_obj: bpy.types.Object, attribute_name: str,
             return WriterUtility.get_common_attribute(shapenet_obj, attribute_name, local_frame_change, world_frame_change)
 
     @staticmethod
-    def save_to_hdf5(output_dir_path: str, output_data_dict: Dict[str, List[np.ndarray]],
-                     append_to_existing_output: bool = False, stereo_separate_keys: bool = False):
+    @Tracer.traced("writer")
+    def save_to_hdf5(output_dir_path: str, output_data_dict: Union[Dict[str, List[np.ndarray]], Iterable[Dict[str, np.ndarray]]],
+                     append_to_existing_output: bool = False, stereo_separate_keys: bool = False,
+                     compression: str = "gzip", compression_per_key: Dict[str, str] = None, encoding_threads: int = 0):
         """
         Saves the information provided inside of the output_data_dict into a .hdf5 container
 
         :param output_dir_path: The folder path in which the .hdf5 containers will be generated
         :param output_data_dict: The container, which keeps the different images, which should be saved to disc.
-                                 Each key will be saved as its own key in the .hdf5 container.
+                                 Each key will be saved as its own key in the .hdf5 container. Instead of a dict of
+                                 lists, also an iterable of per frame dicts can be given, e.g. from
+                                 stream_registered_outputs(), then only one frame is kept in memory at a time.
         :param append_to_existing_output: If this is True, the output_dir_path folder will be scanned for pre-existing
                                           .hdf5 containers and the numbering of the newly added containers, will start
                                           right where the last run left off.
@@ -253,65 +368,323 @@ def save_to_hdf5(output_dir_path: str, output_data_dict: Dict[str, List[np.ndarr
                                      won't be saved in one tensor [2, img_x, img_y, channels], where the img[0] is the
                                      left image and img[1] the right. They will be saved in separate keys: for example
                                      for colors in colors_0 and colors_1.
+        :param compression: The codec used for all keys, which are not in compression_per_key. Available: ["gzip",
+                            "gzip:<level>", "lzf", "none"].
+        :param compression_per_key: A dict mapping output keys to codecs, e.g. {"distance": "lzf", "segmap": "gzip:9"}.
+        :param encoding_threads: If bigger than zero, gzip compressed images are split into row chunks, which are
+                                 compressed in parallel by this amount of threads.
+        """
+        if compression_per_key is None:
+            compression_per_key = {}
+
+        if not os.path.exists(output_dir_path):
+            os.makedirs(output_dir_path)
+
+        frame_offset = WriterUtility._get_hdf5_frame_offset(output_dir_path, append_to_existing_output)
+
+        amount_of_frames = bpy.context.scene.frame_end - bpy.context.scene.frame_start
+        if isinstance(output_data_dict, dict):
+            for key, data_block in output_data_dict.items():
+                if isinstance(data_block, list) and len(data_block) != amount_of_frames:
+                    raise Exception(f"The amount of images stored in the output_data_dict for key {key} does not "
+                                    f"correspond with the amount of images specified by frame_start to frame_end.")
+
+        use_multiview = bpy.context.scene.render.use_multiview
+        executor = ThreadPoolExecutor(max_workers=encoding_threads) if encoding_threads > 0 else None
+        frame = bpy.context.scene.frame_start
+        for frame_data in WriterUtility.iterate_frames(output_data_dict):
+            if frame >= bpy.context.scene.frame_end:
+                raise Exception("There are more frames given than specified by frame_start to frame_end.")
+            # for each frame a new .hdf5 file is generated
+            hdf5_path = os.path.join(output_dir_path, str(frame + frame_offset) + ".hdf5")
+            print(f"Merging data for frame {frame} into {hdf5_path}")
+            WriterUtility._write_hdf5_frame(hdf5_path, frame_data, stereo_separate_keys, use_multiview, compression,
+                                            compression_per_key, executor)
+            frame += 1
+        if executor is not None:
+            executor.shutdown()
+
+        if frame != bpy.context.scene.frame_end:
+            raise Exception("The amount of frames given does not correspond with the amount of frames specified by "
+                            "frame_start to frame_end.")
+
+    @staticmethod
+    def create_hdf5_frame_writer(output_dir_path: str, keys: Set[str], append_to_existing_output: bool = False,
+                                 stereo_separate_keys: bool = False, compression: str = "gzip",
+                                 compression_per_key: Dict[str, str] = None,
+                                 encoding_threads: int = 0) -> Callable[[int], None]:
         """
+        Returns a function, which loads the registered per frame outputs of one frame and saves them into the .hdf5
+        container of this frame. The resulting files are the same as the ones written by save_to_hdf5().
 
+        The returned function does not access any blender data, so it can be used with a BackgroundWriter to write
+        the frames while the next frames are rendered.
+
+        :param output_dir_path: The folder path in which the .hdf5 containers will be generated
+        :param keys: set of output_key types to save
+        :param append_to_existing_output: If this is True, the numbering of the .hdf5 containers will start right
+                                          where the last run left off.
+        :param stereo_separate_keys: If this is True, stereo images are saved in separate keys, see save_to_hdf5().
+        :param compression: The codec used for all keys, which are not in compression_per_key.
+        :param compression_per_key: A dict mapping output keys to codecs.
+        :param encoding_threads: If bigger than zero, gzip compressed images of each frame are compressed in
+                                 parallel by this amount of threads.
+        :return: The function, which writes the frame with the given number.
+        """
+        if compression_per_key is None:
+            compression_per_key = {}
         if not os.path.exists(output_dir_path):
             os.makedirs(output_dir_path)
 
-        amount_of_frames = 0
-        for data_block in output_data_dict.values():
-            if isinstance(data_block, list):
-                amount_of_frames = max([amount_of_frames, len(data_block)])
+        # Everything which depends on blender or on other frames is determined now, before the rendering starts
+        frame_offset = WriterUtility._get_hdf5_frame_offset(output_dir_path, append_to_existing_output)
+        use_multiview = bpy.context.scene.render.use_multiview
 
-        # if append to existing output is turned on the existing folder is searched for the highest occurring
-        # index, which is then used as starting point for this run
+        def write_frame(frame: int):
+            hdf5_path = os.path.join(output_dir_path, str(frame + frame_offset) + ".hdf5")
+            print(f"Merging data for frame {frame} into {hdf5_path}")
+            frame_data = WriterUtility.load_registered_frame_outputs(keys, frame)
+            executor = ThreadPoolExecutor(max_workers=encoding_threads) if encoding_threads > 0 else None
+            try:
+                WriterUtility._write_hdf5_frame(hdf5_path, frame_data, stereo_separate_keys, use_multiview,
+                                                compression, compression_per_key, executor)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+        return write_frame
+
+    @staticmethod
+    def _get_hdf5_frame_offset(output_dir_path: str, append_to_existing_output: bool) -> int:
+        """
+        Returns the number of the first .hdf5 container, which should be written by this run.
+
+        :param output_dir_path: The folder path in which the .hdf5 containers are generated.
+        :param append_to_existing_output: If this is True, the output folder is searched for the highest occurring
+                                          index, which is then used as starting point for this run.
+        :return: The offset, which is added to the frame numbers.
+        """
+        frame_offset = 0
         if append_to_existing_output:
-            frame_offset = 0
             # Look for hdf5 file with highest index
             for path in os.listdir(output_dir_path):
                 if path.endswith(".hdf5"):
                     index = path[:-len(".hdf5")]
                     if index.isdigit():
                         frame_offset = max(frame_offset, int(index) + 1)
-        else:
-            frame_offset = 0
+        return frame_offset
+
+    @staticmethod
+    @Tracer.traced("writer")
+    def _write_hdf5_frame(hdf5_path: str, frame_data: Dict[str, np.ndarray], stereo_separate_keys: bool,
+                          use_multiview: bool, compression: str, compression_per_key: Dict[str, str],
+                          executor: Union[ThreadPoolExecutor, None]):
+        """
+        Saves the data of one frame into a new .hdf5 container.
+
+        :param hdf5_path: The path of the .hdf5 container.
+        :param frame_data: A dict mapping each output key to the data of this frame.
+        :param stereo_separate_keys: If this is True, stereo images are saved in separate keys.
+        :param use_multiview: Whether the rendering was done in stereo mode.
+        :param compression: The codec used for all keys, which are not in compression_per_key.
+        :param compression_per_key: A dict mapping output keys to codecs.
+        :param executor: If given, gzip compressed images are compressed in parallel by this executor.
+        """
+        with h5py.File(hdf5_path, "w") as file:
+            # Go through all the output types
+            for key, used_data_block in frame_data.items():
+                used_compression = compression_per_key.get(key, compression)
+                if stereo_separate_keys and (use_multiview or used_data_block.shape[0] == 2):
+                    # stereo mode was activated
+                    WriterUtility._write_to_hdf_file(file, key + "_0", used_data_block[0], used_compression, executor)
+                    WriterUtility._write_to_hdf_file(file, key + "_1", used_data_block[1], used_compression, executor)
+                else:
+                    WriterUtility._write_to_hdf_file(file, key, used_data_block, used_compression, executor)
+            blender_proc_version = Utility.get_current_version()
+            if blender_proc_version:
+                WriterUtility._write_to_hdf_file(file, "blender_proc_version", np.string_(blender_proc_version))
 
-        if amount_of_frames != bpy.context.scene.frame_end - bpy.context.scene.frame_start:
-            raise Exception("The amount of images stored in the output_data_dict does not correspond with the amount"
-                            "of images specified by frame_start to frame_end.")
+    @staticmethod
+    @Tracer.traced("writer")
+    def save_to_hdf5_container(container_path: str, output_data_dict: Union[Dict[str, List[np.ndarray]], Iterable[Dict[str, np.ndarray]]],
+                               stereo_separate_keys: bool = False, compression: str = "gzip",
+                               compression_per_key: Dict[str, str] = None, run_seed: int = None):
+        """
+        Appends all frames of the output_data_dict to one .hdf5 container, which can be shared by many runs.
 
-        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
-            # for each frame a new .hdf5 file is generated
-            hdf5_path = os.path.join(output_dir_path, str(frame + frame_offset) + ".hdf5")
-            with h5py.File(hdf5_path, "w") as file:
-                # Go through all the output types
-                print(f"Merging data for frame {frame} into {hdf5_path}")
-
-                for key, data_block in output_data_dict.items():
-                    if frame < len(data_block):
-                        # get the current data block for the current frame
-                        used_data_block = data_block[frame]
-                        if stereo_separate_keys and (bpy.context.scene.render.use_multiview or
-                                                     used_data_block.shape[0] == 2):
-                            # stereo mode was activated
-                            WriterUtility._write_to_hdf_file(file, key + "_0", data_block[frame][0])
-                            WriterUtility._write_to_hdf_file(file, key + "_1", data_block[frame][1])
+        Each key is stored as one extendable dataset, whose first dimension is the frame index over all runs, s.t.
+        the n-th frame can be read via file[key][n]. Each frame is stored in its own chunk(s), so slicing single frames
+        stays cheap. Additionally, the group "index" contains the datasets "run_seed", "run_frame" and "cam2world",
+        which map each frame to the seed of its run, the frame number inside of this run and the camera pose. The same
+        index is also appended as json lines to a sidecar file next to the container ("<container>.index.jsonl"), s.t.
+        frames can be filtered without opening the container.
+
+        Several runs can append to the same container at the same time, the access is serialized via a lock file.
+
+        :param container_path: The path to the .hdf5 container. It is created if it does not exist.
+        :param output_data_dict: The container, which keeps the different images, which should be saved to disc.
+                                 Each key will be saved as its own dataset in the .hdf5 container. Instead of a dict of
+                                 lists, also an iterable of per frame dicts can be given, e.g. from
+                                 stream_registered_outputs(), then only one frame is kept in memory at a time.
+        :param stereo_separate_keys: If this is True and the rendering was done in stereo mode, the stereo images
+                                     are saved in separate keys: for example for colors in colors_0 and colors_1.
+        :param compression: The codec used for all keys, which are not in compression_per_key. Available: ["gzip",
+                            "gzip:<level>", "lzf", "none"].
+        :param compression_per_key: A dict mapping output keys to codecs, e.g. {"distance": "lzf", "segmap": "gzip:9"}.
+        :param run_seed: The seed, which is stored in the index for the frames of this run. If None is given, the seed
+                         from the "BLENDER_PROC_RANDOM_SEED" environment variable is used or -1 if it is not set.
+        """
+        if compression_per_key is None:
+            compression_per_key = {}
+        if run_seed is None:
+            run_seed = int(os.environ.get("BLENDER_PROC_RANDOM_SEED", -1))
+
+        container_dir = os.path.dirname(os.path.abspath(container_path))
+        if not os.path.exists(container_dir):
+            os.makedirs(container_dir)
+
+        frames = range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)
+        if isinstance(output_data_dict, dict):
+            for key, data_block in output_data_dict.items():
+                if isinstance(data_block, list) and len(data_block) != len(frames):
+                    raise Exception(f"The amount of blocks of information {len(data_block)} for key {key} does not "
+                                    f"correspond with the amount of frames specified by frame_start to frame_end.")
+
+        # The camera poses are collected before the container is locked
+        cam2world_matrices = []
+        current_frame = bpy.context.scene.frame_current
+        for frame in frames:
+            bpy.context.scene.frame_set(frame)
+            cam2world_matrices.append(np.array(bpy.context.scene.camera.matrix_world, dtype=np.float64))
+        bpy.context.scene.frame_set(current_frame)
+
+        with FileLock(container_path + ".lock"):
+            with h5py.File(container_path, "a") as file:
+                frame_offset = int(file.attrs.get("num_frames", 0))
+                print(f"Appending frames {frame_offset} to {frame_offset + len(frames) - 1} to {container_path}")
+
+                amount_of_written_frames = 0
+                for frame_index, (frame, frame_data) in enumerate(zip(frames, WriterUtility.iterate_frames(output_data_dict))):
+                    for key, used_data_block in frame_data.items():
+                        used_compression = compression_per_key.get(key, compression)
+                        if stereo_separate_keys and isinstance(used_data_block, np.ndarray) and used_data_block.ndim > 0 \
+                                and (bpy.context.scene.render.use_multiview or used_data_block.shape[0] == 2):
+                            WriterUtility._append_to_hdf_dataset(file, key + "_0", frame_offset + frame_index, used_data_block[0], used_compression)
+                            WriterUtility._append_to_hdf_dataset(file, key + "_1", frame_offset + frame_index, used_data_block[1], used_compression)
                         else:
-                            WriterUtility._write_to_hdf_file(file, key, data_block[frame])
-                    else:
-                        raise Exception(f"There are more frames {frame} then there are blocks of information "
-                                        f" {len(data_block)} in the given list for key {key}.")
+                            WriterUtility._append_to_hdf_dataset(file, key, frame_offset + frame_index, used_data_block, used_compression)
+
+                    WriterUtility._append_to_hdf_dataset(file, "index/run_seed", frame_offset + frame_index, np.int64(run_seed), "none")
+                    WriterUtility._append_to_hdf_dataset(file, "index/run_frame", frame_offset + frame_index, np.int64(frame), "none")
+                    WriterUtility._append_to_hdf_dataset(file, "index/cam2world", frame_offset + frame_index, cam2world_matrices[frame_index], "none")
+                    amount_of_written_frames += 1
+                if amount_of_written_frames != len(frames):
+                    raise Exception(f"Only {amount_of_written_frames} frames were given, but frame_start to frame_end "
+                                    f"specifies {len(frames)} frames.")
+
+                num_frames = frame_offset + len(frames)
+                # Keys which are not part of this run are padded, s.t. all datasets are indexed by the same frames
+                file.visititems(lambda name, item: item.resize(num_frames, axis=0)
+                                if isinstance(item, h5py.Dataset) and item.maxshape[0] is None else None)
+                file.attrs["num_frames"] = num_frames
                 blender_proc_version = Utility.get_current_version()
                 if blender_proc_version:
-                    WriterUtility._write_to_hdf_file(file, "blender_proc_version", np.string_(blender_proc_version))
+                    file.attrs["blender_proc_version"] = blender_proc_version
+
+            with open(container_path + ".index.jsonl", "a") as f:
+                for frame_index, frame in enumerate(frames):
+                    f.write(json.dumps({"frame": frame_offset + frame_index, "run_seed": run_seed, "run_frame": frame,
+                                        "cam2world": cam2world_matrices[frame_index].tolist()}) + "\n")
+
+    @staticmethod
+    def _append_to_hdf_dataset(file, key: str, frame: int, data: np.ndarray, compression: str = "gzip"):
+        """ Writes the given data as the entry of the given frame into an extendable dataset of the given hdf5 file.
+
+        The dataset is created on first use, its first dimension is the frame index and every frame gets its own chunks.
+        Strings and lists of dicts (e.g. object states) are stored as variable length byte strings.
+
+        :param file: The hdf5 file handle. Type: hdf5.File
+        :param key: The key of the dataset in the hdf5 file.
+        :param frame: The frame index at which the data should be stored.
+        :param data: The data of this one frame.
+        :param compression: The codec to use. Available: ["gzip", "gzip:<level>", "lzf", "none"].
+        """
+        if isinstance(data, list):
+            if len(data) > 0 and isinstance(data[0], dict):
+                data = np.string_(json.dumps(data))
+            data = np.array(data)
+        elif not isinstance(data, (np.ndarray, np.generic)):
+            raise Exception(f"This fct. expects the data for key {key} to be a np.ndarray not a {type(data)}!")
+
+        if data.dtype.char == 'S':
+            if key not in file:
+                file.create_dataset(key, shape=(0,), maxshape=(None,), chunks=(64,), dtype=h5py.special_dtype(vlen=bytes))
+            dataset = file[key]
+            data = data.tobytes()
+        else:
+            if key not in file:
+                compression, compression_level = WriterUtility._parse_compression(compression)
+                frame_chunk_shape = WriterUtility._get_image_chunk_shape(data.shape, data.itemsize) or data.shape
+                # Scalars per frame are combined into larger chunks
+                chunk_shape = (1,) + tuple(frame_chunk_shape) if data.ndim > 0 else (1024,)
+                file.create_dataset(key, shape=(0,) + data.shape, maxshape=(None,) + data.shape, dtype=data.dtype,
+                                    chunks=chunk_shape, compression=compression, compression_opts=compression_level)
+            dataset = file[key]
+            if dataset.shape[1:] != data.shape:
+                raise Exception(f"The data for key {key} has the shape {data.shape}, but the existing dataset in the "
+                                f"container stores frames of shape {dataset.shape[1:]}.")
+
+        if dataset.shape[0] <= frame:
+            dataset.resize(frame + 1, axis=0)
+        dataset[frame] = data
 
     @staticmethod
-    def _write_to_hdf_file(file, key: str, data: np.ndarray, compression: str = "gzip"):
+    def _parse_compression(compression: Union[str, None]) -> Tuple[Union[str, None], Union[int, None]]:
+        """ Splits the given codec into the h5py compression filter and its level.
+
+        :param compression: The codec. Available: ["gzip", "gzip:<level>", "lzf", "none"]. None is the same as "none".
+        :return: The name of the h5py filter (None for no compression) and the compression level.
+        """
+        if compression is None or compression.lower() == "none":
+            return None, None
+        name, _, level = compression.lower().partition(":")
+        if name == "gzip":
+            # 4 is the default level of h5py
+            return name, int(level) if level else 4
+        elif name == "lzf" and not level:
+            return name, None
+        raise Exception("Unknown hdf5 compression: {}, available: gzip, gzip:<level>, lzf, none".format(compression))
+
+    @staticmethod
+    def _get_image_chunk_shape(shape: Tuple[int, ...], itemsize: int, chunk_size: int = 1 << 20) -> Union[Tuple[int, ...], None]:
+        """ Returns a chunk shape, which splits images into blocks of full rows.
+
+        All leading dimensions (e.g. the two images of a stereo pair) get their own chunks.
+
+        :param shape: The shape of the data, the image dimensions are either the last two [H, W] or, if the last dimension has at most four entries, the last three [H, W, C].
+        :param itemsize: The size of one element in bytes.
+        :param chunk_size: The approximate size of one chunk in bytes.
+        :return: The chunk shape or None, if the data does not look like an image.
+        """
+        image_dims = 3 if len(shape) >= 3 and shape[-1] <= 4 else 2
+        if len(shape) < 2 or min(shape) == 0:
+            return None
+        row_size = int(np.prod(shape[len(shape) - image_dims + 1:])) * itemsize
+        rows = int(min(shape[-image_dims], max(1, chunk_size // row_size)))
+        return (1,) * (len(shape) - image_dims) + (rows,) + tuple(shape[len(shape) - image_dims + 1:])
+
+    @staticmethod
+    def _write_to_hdf_file(file, key: str, data: np.ndarray, compression: str = "gzip", executor: ThreadPoolExecutor = None):
         """ Adds the given data as a new entry to the given hdf5 file.
 
+        Images are stored in chunks of full rows. If an executor is given and gzip is used, the chunks are compressed
+        in parallel by the executor and are then written directly into the file.
+
         :param file: The hdf5 file handle. Type: hdf5.File
         :param key: The key at which the data should be stored in the hdf5 file.
         :param data: The data to store.
+        :param compression: The codec to use. Available: ["gzip", "gzip:<level>", "lzf", "none"].
+        :param executor: The thread pool used for compressing the chunks.
         """
         if not isinstance(data, np.ndarray) and not isinstance(data, np.bytes_):
             if isinstance(data, list):
@@ -323,5 +696,27 @@ def _write_to_hdf_file(file, key: str, data: np.ndarray, compression: str = "gzi
 
         if data.dtype.char == 'S':
             file.create_dataset(key, data=data, dtype=data.dtype)
+            return
+
+        compression, compression_level = WriterUtility._parse_compression(compression)
+        chunk_shape = WriterUtility._get_image_chunk_shape(data.shape, data.itemsize) if compression is not None else None
+        if chunk_shape is None:
+            file.create_dataset(key, data=data, compression=compression, compression_opts=compression_level)
+        elif executor is None or compression != "gzip" or data.dtype == bool:
+            file.create_dataset(key, data=data, chunks=chunk_shape, compression=compression, compression_opts=compression_level)
         else:
-            file.create_dataset(key, data=data, compression=compression)
+            dataset = file.create_dataset(key, shape=data.shape, dtype=data.dtype, chunks=chunk_shape,
+                                          compression=compression, compression_opts=compression_level)
+            # The hdf5 gzip filter stores plain zlib streams, so the chunks can be compressed outside of h5py,
+            # zlib releases the GIL while compressing
+            compressed_chunks = []
+            for offset in itertools.product(*[range(0, size, chunk) for size, chunk in zip(data.shape, chunk_shape)]):
+                chunk = data[tuple(slice(start, start + length) for start, length in zip(offset, chunk_shape))]
+                if chunk.shape != chunk_shape:
+                    # Chunks at the border are always stored in full size
+                    padded_chunk = np.zeros(chunk_shape, dtype=data.dtype)
+                    padded_chunk[tuple(slice(0, length) for length in chunk.shape)] = chunk
+                    chunk = padded_chunk
+                compressed_chunks.append((offset, executor.submit(zlib.compress, np.ascontiguousarray(chunk).tobytes(), compression_level)))
+            for offset, compressed_chunk in compressed_chunks:
+                dataset.id.write_direct_chunk(offset, compressed_chunk.result())
@@ -5,16 +5,68 @@
 import sys
 import numpy as np
 import mathutils
-from mathutils import Matrix
-from typing import Union, List
+from mathutils import Matrix, Vector
+from typing import Union, List, Tuple
 
+from src.utility.BVHUtility import TriangleBVH
 from src.utility.MeshObjectUtility import MeshObject
+from src.utility.Tracer import Tracer
 
 
 class CameraValidation:
 
     @staticmethod
-    def perform_obstacle_in_view_check(cam2world_matrix: Union[Matrix, np.ndarray], proximity_checks: dict, bvh_tree: mathutils.bvhtree.BVHTree, sqrt_number_of_rays: int = 10) -> bool:
+    def _compute_camera_rays(cam2world_matrix: Matrix, sqrt_number_of_rays: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Computes a grid of rays, which go from the camera position through its near plane.
+
+        :param cam2world_matrix: Transformation matrix that transforms from the camera space to the world space.
+        :param sqrt_number_of_rays: The square root of the number of rays.
+        :return: The camera position and the direction of each ray. Type: numpy arrays of shape [3] and [sqrt_number_of_rays ** 2, 3].
+        """
+        cam2world_matrix = np.array(cam2world_matrix)
+        cam = bpy.context.scene.camera.data
+        # Get position of the corners of the near plane and bring them to world space
+        frame = np.array([list(v) for v in cam.view_frame(scene=bpy.context.scene)])
+        frame = frame @ cam2world_matrix[:3, :3].T + cam2world_matrix[:3, 3]
+
+        # Compute vectors along both sides of the plane
+        vec_x = frame[1] - frame[0]
+        vec_y = frame[3] - frame[0]
+
+        # Go in discrete grid-like steps over plane (x is the outer and y the inner dimension)
+        steps = np.arange(sqrt_number_of_rays) / float(sqrt_number_of_rays - 1)
+        x, y = np.meshgrid(steps, steps, indexing="ij")
+        ends = frame[0] + x.reshape(-1, 1) * vec_x + y.reshape(-1, 1) * vec_y
+
+        position = cam2world_matrix[:3, 3]
+        return position, ends - position
+
+    @staticmethod
+    @Tracer.traced("raycast")
+    def _cast_rays_into_scene(position: np.ndarray, directions: np.ndarray, scene_bvh: TriangleBVH = None) -> Tuple[np.ndarray, list]:
+        """ Casts the given rays into the scene and returns which objects were hit.
+
+        :param position: The origin of all rays.
+        :param directions: The directions of the rays. Type: numpy array of shape [N, 3].
+        :param scene_bvh: A tree containing all visible objects of the scene. If None is given, every ray is cast separately via bpy.types.Scene.ray_cast().
+        :return: For each ray the index of the hit object (-1 if nothing was hit) and the list of objects the indices refer to.
+        """
+        if scene_bvh is not None:
+            _, _, _, hit_object_indices, _ = scene_bvh.ray_cast(position, directions)
+            return hit_object_indices, [obj.blender_obj for obj in scene_bvh.objects]
+
+        hit_objects = []
+        hit_object_indices = np.full(len(directions), -1)
+        for i, direction in enumerate(directions):
+            hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, Vector(position), Vector(direction))
+            if hit:
+                if hit_object not in hit_objects:
+                    hit_objects.append(hit_object)
+                hit_object_indices[i] = hit_objects.index(hit_object)
+        return hit_object_indices, hit_objects
+
+    @staticmethod
+    def perform_obstacle_in_view_check(cam2world_matrix: Union[Matrix, np.ndarray], proximity_checks: dict, bvh_tree: Union[mathutils.bvhtree.BVHTree, TriangleBVH], sqrt_number_of_rays: int = 10) -> bool:
         """ Check if there are obstacles in front of the camera which are too far or too close based on the given proximity_checks.
 
         :param cam2world_matrix: Transformation matrix that transforms from the camera space to the world space.
@@ -22,29 +74,13 @@ def perform_obstacle_in_view_check(cam2world_matrix: Union[Matrix, np.ndarray],
                                  thresholds in the form of {"min": 1.0, "max":4.0} or just the numerical threshold in case of max or min.
                                  The operators are combined in conjunction (i.e boolean AND). This can also be used to avoid the
                                  background in images, with the no_background: True option.
-        :param bvh_tree: A bvh tree containing all objects that should be considered here.
+        :param bvh_tree: A bvh tree containing all objects that should be considered here. If a TriangleBVH is given, all rays are cast at once.
         :param sqrt_number_of_rays: The square root of the number of rays which will be used to determine the visible objects.
         :return: True, if the given camera pose does not violate any of the specified proximity_checks.
         """
         if not proximity_checks:  # if no checks are in the settings all positions are accepted
             return True
 
-        cam2world_matrix = Matrix(cam2world_matrix)
-        
-        cam_ob = bpy.context.scene.camera
-        cam = cam_ob.data
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        sum = 0.0
-        sum_sq = 0.0
-
         range_distance = sys.float_info.max
 
         # Input validation
@@ -66,52 +102,38 @@ def perform_obstacle_in_view_check(cam2world_matrix: Union[Matrix, np.ndarray],
             else:
                 range_distance = proximity_checks["min"]
 
-        no_range_distance = False
-        if "no_background" in proximity_checks and proximity_checks["no_background"]:
+        no_background = "no_background" in proximity_checks and proximity_checks["no_background"]
+        if no_background:
             # when no background is on, it can not be combined with a reduced range distance
-            no_range_distance = True
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, sqrt_number_of_rays):
-            for y in range(0, sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(sqrt_number_of_rays - 1) + vec_y * y / float(sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                if no_range_distance:
-                    _, _, _, dist = bvh_tree.ray_cast(position, end - position)
-                else:
-                    _, _, _, dist = bvh_tree.ray_cast(position, end - position, range_distance)
-
-                # Check if something was hit and how far it is away
-                if dist is not None:
-                    if "min" in proximity_checks and dist <= proximity_checks["min"]:
-                        return False
-                    if "max" in proximity_checks and dist >= proximity_checks["max"]:
-                        return False
-                    if "avg" in proximity_checks:
-                        sum += dist
-                    if "var" in proximity_checks:
-                        if not "avg" in proximity_checks:
-                            sum += dist
-                        sum_sq += dist * dist
-                elif "no_background" in proximity_checks and proximity_checks["no_background"]:
-                    return False
+            range_distance = sys.float_info.max
 
+        # Send all rays from the camera position through the grid on the near plane
+        position, directions = CameraValidation._compute_camera_rays(cam2world_matrix, sqrt_number_of_rays)
+        if isinstance(bvh_tree, TriangleBVH):
+            hit, _, _, _, distances = bvh_tree.ray_cast(position, directions, range_distance)
+        else:
+            distances = np.array([bvh_tree.ray_cast(Vector(position), Vector(direction), range_distance)[3] for direction in directions], dtype=np.float64)
+            hit = ~np.isnan(distances)
+        distances = distances[hit]
+
+        # Check if something was hit and how far it is away
+        if "min" in proximity_checks and np.any(distances <= proximity_checks["min"]):
+            return False
+        if "max" in proximity_checks and np.any(distances >= proximity_checks["max"]):
+            return False
+        if no_background and not np.all(hit):
+            return False
+
+        # Rays which hit nothing count as zero distance in the statistics
+        num_of_rays = sqrt_number_of_rays * sqrt_number_of_rays
+        avg = np.sum(distances) / num_of_rays
         if "avg" in proximity_checks:
-            avg = sum / (sqrt_number_of_rays * sqrt_number_of_rays)
             # Check that the average distance is not within the accepted interval
             if avg >= proximity_checks["avg"]["max"] or avg <= proximity_checks["avg"]["min"]:
                 return False
 
         if "var" in proximity_checks:
-            if not "avg" in proximity_checks:
-                avg = sum / (sqrt_number_of_rays * sqrt_number_of_rays)
-            sq_avg = avg * avg
-
-            avg_sq = sum_sq / (sqrt_number_of_rays * sqrt_number_of_rays)
-
-            var = avg_sq - sq_avg
+            var = np.sum(distances * distances) / num_of_rays - avg * avg
             # Check that the variance value of the distance is not within the accepted interval
             if var >= proximity_checks["var"]["max"] or var <= proximity_checks["var"]["min"]:
                 return False
@@ -119,45 +141,22 @@ def perform_obstacle_in_view_check(cam2world_matrix: Union[Matrix, np.ndarray],
         return True
 
     @staticmethod
-    def visible_objects(cam2world_matrix: Union[Matrix, np.ndarray], sqrt_number_of_rays: int) -> [MeshObject]:
+    def visible_objects(cam2world_matrix: Union[Matrix, np.ndarray], sqrt_number_of_rays: int, scene_bvh: TriangleBVH = None) -> [MeshObject]:
         """ Returns a set of objects visible from the given camera pose.
 
         Sends a grid of rays through the camera frame and returns all objects hit by at least one ray.
 
         :param cam2world_matrix: The world matrix which describes the camera orientation to check.
         :param sqrt_number_of_rays: The square root of the number of rays which will be used to determine the visible objects.
+        :param scene_bvh: A tree containing all visible objects of the scene (see TriangleBVH.from_scene()). If given, all rays are cast at once.
         :return: A set of objects visible hit by the sent rays.
         """
-        cam2world_matrix = Matrix(cam2world_matrix)
-        
-        visible_objects = set()
-        cam_ob = bpy.context.scene.camera
-        cam = cam_ob.data
-
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, sqrt_number_of_rays):
-            for y in range(0, sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(sqrt_number_of_rays - 1) + vec_y * y / float(sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                _, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, position, end - position)
-                # Add hit object to set
-                visible_objects.add(MeshObject(hit_object))
-
-        return visible_objects
+        position, directions = CameraValidation._compute_camera_rays(cam2world_matrix, sqrt_number_of_rays)
+        hit_object_indices, objects = CameraValidation._cast_rays_into_scene(position, directions, scene_bvh)
+        return set(MeshObject(objects[i]) for i in np.unique(hit_object_indices[hit_object_indices >= 0]))
 
     @staticmethod
-    def scene_coverage_score(cam2world_matrix: Union[Matrix, np.ndarray], special_objects: list = None, special_objects_weight: float = 2, sqrt_number_of_rays: int = 10) -> float:
+    def scene_coverage_score(cam2world_matrix: Union[Matrix, np.ndarray], special_objects: list = None, special_objects_weight: float = 2, sqrt_number_of_rays: int = 10, scene_bvh: TriangleBVH = None) -> float:
         """ Evaluate the interestingness/coverage of the scene.
 
         This module tries to look at as many objects at possible, this might lead to
@@ -172,61 +171,46 @@ def scene_coverage_score(cam2world_matrix: Union[Matrix, np.ndarray], special_ob
         :param special_objects_weight: Weighting factor for more special objects, used to estimate the interestingness of the scene. Default:
                                        2.0.
         :param sqrt_number_of_rays: The square root of the number of rays which will be used to determine the visible objects.
+        :param scene_bvh: A tree containing all visible objects of the scene (see TriangleBVH.from_scene()). If given, all rays are cast at once.
         :return: the scoring of the scene.
         """
-        cam2world_matrix = Matrix(cam2world_matrix)
-        
         if special_objects is None:
             special_objects = []
-        cam_ob = bpy.context.scene.camera
-        cam = cam_ob.data
 
         num_of_rays = sqrt_number_of_rays * sqrt_number_of_rays
         score = 0.0
         objects_hit = defaultdict(int)
 
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, sqrt_number_of_rays):
-            for y in range(0, sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(sqrt_number_of_rays - 1) + vec_y * y / float(sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, position, end - position)
-
-                if hit:
-                    is_of_special_dataset = "is_suncg" in hit_object or "is_3d_front" in hit_object
-                    if is_of_special_dataset and "type" in hit_object and hit_object["type"] == "Object":
-                        # calculate the score based on the type of the object,
-                        # wall, floor and ceiling objects have 0 score
-                        if "coarse_grained_class" in hit_object:
-                            object_class = hit_object["coarse_grained_class"]
-                            objects_hit[object_class] += 1
-                            if object_class in special_objects:
-                                score += special_objects_weight
-                            else:
-                                score += 1
-                        else:
-                            score += 1
-                    elif "category_id" in hit_object:
-                        object_class = hit_object["category_id"]
-                        if object_class in special_objects:
-                            score += special_objects_weight
-                        else:
-                            score += 1
-                        objects_hit[object_class] += 1
+        position, directions = CameraValidation._compute_camera_rays(cam2world_matrix, sqrt_number_of_rays)
+        hit_object_indices, objects = CameraValidation._cast_rays_into_scene(position, directions, scene_bvh)
+
+        # Count the rays per hit object, so the object properties only have to be looked up once per object
+        hit_object_indices, hit_counts = np.unique(hit_object_indices[hit_object_indices >= 0], return_counts=True)
+        for object_index, hit_count in zip(hit_object_indices, hit_counts):
+            hit_object = objects[object_index]
+            is_of_special_dataset = "is_suncg" in hit_object or "is_3d_front" in hit_object
+            if is_of_special_dataset and "type" in hit_object and hit_object["type"] == "Object":
+                # calculate the score based on the type of the object,
+                # wall, floor and ceiling objects have 0 score
+                if "coarse_grained_class" in hit_object:
+                    object_class = hit_object["coarse_grained_class"]
+                    objects_hit[object_class] += hit_count
+                    if object_class in special_objects:
+                        score += special_objects_weight * hit_count
                     else:
-                        objects_hit[hit_object] += 1
-                        score += 1
+                        score += hit_count
+                else:
+                    score += hit_count
+            elif "category_id" in hit_object:
+                object_class = hit_object["category_id"]
+                if object_class in special_objects:
+                    score += special_objects_weight * hit_count
+                else:
+                    score += hit_count
+                objects_hit[object_class] += hit_count
+            else:
+                objects_hit[hit_object] += hit_count
+                score += hit_count
         # For a scene with three different objects, the starting variance is 1.0, increases/decreases by '1/3' for
         # each object more/less, excluding floor, ceiling and walls
         scene_variance = len(objects_hit) / 3.0
@@ -235,7 +219,7 @@ def scene_coverage_score(cam2world_matrix: Union[Matrix, np.ndarray], special_ob
             # distribution of the objects in the scene
             scene_variance *= 1.0 - object_hit_value / float(num_of_rays)
         score = scene_variance * (score / float(num_of_rays))
-        return score
+        return float(score)
 
     @staticmethod
     def decrease_interest_score(interest_score: float, min_interest_score: float, interest_score_step: float):
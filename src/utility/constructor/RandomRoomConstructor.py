@@ -9,6 +9,7 @@
 import random
 
 from src.provider.getter.Material import Material
+from src.utility.BVHUtility import BVHCache
 from src.utility.BlenderUtility import get_bound_volume, check_bb_intersection_on_values
 from src.utility.CollisionUtility import CollisionUtility
 from src.utility.EntityUtility import Entity
@@ -360,7 +361,7 @@ def assign_materials_to_floor_wall_ceiling(floor_obj: MeshObject, wall_obj: Mesh
                           "No materials have been assigned to the walls, floors and possible ceiling.")
 
     @staticmethod
-    def sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache_for_intersection: dict, placed_objects: [MeshObject], wall_obj: MeshObject):
+    def sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache_for_intersection: BVHCache, placed_objects: [MeshObject], wall_obj: MeshObject):
         """
         Sample new object poses on the current `floor_obj`.
 
@@ -376,10 +377,6 @@ def sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache_
         current_obj.set_rotation_euler(random_placed_rotation)
         bpy.context.view_layer.update()
 
-        # Remove bvh cache, as object has changed
-        if current_obj.get_name() in bvh_cache_for_intersection:
-            del bvh_cache_for_intersection[current_obj.get_name()]
-
         # perform check if object can be placed there
         no_collision = CollisionUtility.check_intersections(current_obj,
                                                            bvh_cache=bvh_cache_for_intersection,
@@ -392,7 +389,7 @@ def construct(used_floor_area: float, interior_objects: [MeshObject], materials:
         # internally the first basic rectangular is counted as one
         amount_of_extrusions += 1
 
-        bvh_cache_for_intersection = {}
+        bvh_cache_for_intersection = BVHCache.get_scene_cache()
         placed_objects = []
 
         # construct a random room
@@ -478,8 +475,7 @@ def construct(used_floor_area: float, interior_objects: [MeshObject], materials:
                 total_acc_size += face_size
 
             # remove current obj from the bvh cache
-            if current_obj.get_name() in bvh_cache_for_intersection:
-                del bvh_cache_for_intersection[current_obj.get_name()]
+            bvh_cache_for_intersection.invalidate(current_obj)
             # if there was no collision save the object in the placed list
             if is_duplicated:
                 # delete the duplicated object
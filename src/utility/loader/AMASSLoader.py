@@ -17,6 +17,7 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class AMASSLoader:
@@ -35,6 +36,7 @@ class AMASSLoader:
 
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(data_path: str, used_sub_dataset_id: str, temp_dir: str, used_body_model_gender: str = None, used_subject_id: str = "", used_sequence_id: int = -1, used_frame_id: int = -1, num_betas: int = 10, num_dmpls: int = 10) -> List[MeshObject]:
         """
         use the pose parameters to generate the mesh and loads it to the scene.
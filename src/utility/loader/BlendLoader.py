@@ -12,6 +12,7 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.StructUtility import Struct
 from src.utility.Utility import Utility
+from src.utility.Tracer import Tracer
 
 
 class BlendLoader:
@@ -40,6 +41,7 @@ def _validate_and_standardizes_configured_list(config_value: Union[list, str], a
         return config_value
 
     @staticmethod
+    @Tracer.traced("loader")
     def load_random_from_directory(directory: str, obj_types: Union[list, str] = ["mesh", "empty"], name_regrex: str = None, data_blocks: Union[list, str] = "objects") -> List[MeshObject]:
         """
         Loads a random blender file from a given directory tree.
@@ -72,6 +74,7 @@ def load_random_from_directory(directory: str, obj_types: Union[list, str] = ["m
         return objects
 
     @staticmethod
+    @Tracer.traced("loader")
     def load_grouped(path: str, obj_types: Union[list, str] = ["mesh", "empty"], name_regrex: str = None, data_blocks: Union[list, str] = "objects") -> List[Struct]:
         """
         TODO: modify doc: this additionally groups by parent relationship and items in collections because it is
@@ -191,6 +194,7 @@ def load_grouped(path: str, obj_types: Union[list, str] = ["mesh", "empty"], nam
         return loaded_objects
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(path: str, obj_types: Union[list, str] = ["mesh", "empty"], name_regrex: str = None, data_blocks: Union[list, str] = "objects") -> List[Struct]:
         """
         Loads entities (everything that can be stored in a .blend file's folders, see Blender's documentation for
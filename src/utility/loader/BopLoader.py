@@ -11,16 +11,20 @@
 import numpy as np
 from mathutils import Matrix, Vector
 
+from src.utility.AssetCache import AssetCache
 from src.utility.CameraUtility import CameraUtility
 from src.utility.MeshObjectUtility import MeshObject
+from src.utility.PlyUtility import PlyUtility
 from src.utility.Utility import Utility
 from src.utility.MathUtility import MathUtility
+from src.utility.Tracer import Tracer
 
 
 
 class BopLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(bop_dataset_path: str, temp_dir: str, sys_paths: list, model_type: str = "", cam_type: str = "", split: str = "test", scene_id: int = -1, obj_ids: list = [], sample_objects: bool = False, num_of_objs_to_sample: int = None, obj_instances_limit: int = -1, move_origin_to_x_y_plane: bool = False, source_frame: list = ["X", "-Y", "-Z"], mm2m: bool = False) -> List[MeshObject]:
         """ Loads the 3D models of any BOP dataset and allows replicating BOP scenes
 
@@ -29,7 +33,7 @@ def load(bop_dataset_path: str, temp_dir: str, sys_paths: list, model_type: str
         - Sets real camera intrinsics
 
         :param bop_dataset_path: Full path to a specific bop dataset e.g. /home/user/bop/tless.
-        :param temp_dir: A temp directory which is used for writing the temporary .ply file.
+        :param temp_dir: A temp directory. It is not used anymore, as the .ply files are read directly.
         :param sys_paths: System paths to append.
         :param model_type: Optionally, specify type of BOP model.  Available: [reconst, cad or eval].
         :param cam_type: Camera type. If not defined, dataset-specific default camera type is used.
@@ -119,7 +123,7 @@ def load(bop_dataset_path: str, temp_dir: str, sys_paths: list, model_type: str
                         loaded_ids.update({random_id: 0})
                     # if there is no limit or if there is one, but it is not reached for this particular object
                     if obj_instances_limit == -1 or loaded_ids[random_id] < obj_instances_limit:
-                        cur_obj = BopLoader._load_mesh(random_id, model_p, bop_dataset_name, has_external_texture, temp_dir, allow_duplication, scale)
+                        cur_obj = BopLoader._load_mesh(random_id, model_p, bop_dataset_name, has_external_texture, allow_duplication, scale)
                         loaded_ids[random_id] += 1
                         loaded_amount += 1
                         loaded_objects.append(cur_obj)
@@ -129,7 +133,7 @@ def load(bop_dataset_path: str, temp_dir: str, sys_paths: list, model_type: str
                                                        loaded_amount, num_of_objs_to_sample))
             else:
                 for obj_id in obj_ids:
-                    cur_obj = BopLoader._load_mesh(obj_id, model_p, bop_dataset_name, has_external_texture, temp_dir, allow_duplication, scale)
+                    cur_obj = BopLoader._load_mesh(obj_id, model_p, bop_dataset_name, has_external_texture, allow_duplication, scale)
                     loaded_objects.append(cur_obj)
 
         # replicate scene: load scene objects, object poses, camera intrinsics and camera poses
@@ -146,7 +150,7 @@ def load(bop_dataset_path: str, temp_dir: str, sys_paths: list, model_type: str
                     cur_objs = []
                     # load scene objects and set their poses
                     for inst in insts:                           
-                        cur_objs.append(BopLoader._load_mesh(inst['obj_id'], model_p, bop_dataset_name, has_external_texture, temp_dir, allow_duplication, scale))
+                        cur_objs.append(BopLoader._load_mesh(inst['obj_id'], model_p, bop_dataset_name, has_external_texture, allow_duplication, scale))
                         BopLoader.set_object_pose(cur_objs[-1], inst, scale)
 
                 cam_H_c2w = BopLoader._compute_camera_to_world_trafo(cam_H_m2w_ref, cam_H_m2c_ref, source_frame)
@@ -262,14 +266,13 @@ def _get_loaded_obj(model_path: str) -> bpy.types.Object:
 
 
     @staticmethod
-    def _load_mesh(obj_id: int, model_p: dict, bop_dataset_name: str, has_external_texture: bool, temp_dir: str, allow_duplication: bool, scale: float = 1) -> MeshObject:
+    def _load_mesh(obj_id: int, model_p: dict, bop_dataset_name: str, has_external_texture: bool, allow_duplication: bool, scale: float = 1) -> MeshObject:
         """ Loads BOP mesh and sets category_id.
 
         :param obj_id: The obj_id of the BOP Object.
         :param model_p: model parameters defined in dataset_params.py in bop_toolkit.
         :param bop_dataset_name: The name of the used bop dataset.
         :param has_external_texture: Set to True, if the object has an external texture.
-        :param temp_dir: A temp directory which is used for writing the temporary .ply file.
         :param allow_duplication: If True, the object is duplicated if it already exists.
         :param scale: factor to transform set pose in mm or meters.
         :return: Loaded mesh object.
@@ -283,28 +286,12 @@ def _load_mesh(obj_id: int, model_p: dict, bop_dataset_name: str, has_external_t
         cur_obj = BopLoader._get_loaded_obj(model_path)
         # if the object was not previously loaded - load it, if duplication is allowed - duplicate it
         if cur_obj is None:
+            # the .ply file is read directly into a new mesh, or appended from the asset cache if it is enabled
+            cur_obj = AssetCache.import_cached(model_path, lambda: [PlyUtility.load(model_path)], "BopLoader", {"reader": "PlyUtility"})[-1]
             if has_external_texture:
-                if os.path.exists(model_path):
-                    new_file_ply_content = ""
-                    with open(model_path, "r") as file:
-                        new_file_ply_content = file.read()
-                        texture_pos = new_file_ply_content.find("comment TextureFile ") + len("comment TextureFile ")
-                        texture_file_name = new_file_ply_content[texture_pos:
-                                                                 new_file_ply_content.find("\n", texture_pos)]
-                        texture_file_path = os.path.join(os.path.dirname(model_path), texture_file_name)
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_u",
-                                                                            "property float s")
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_v",
-                                                                            "property float t")
-                    model_name = os.path.basename(model_path)
-                    tmp_ply_file = os.path.join(temp_dir, model_name)
-                    with open(tmp_ply_file, "w") as file:
-                        file.write(new_file_ply_content)
-                    bpy.ops.import_mesh.ply(filepath=tmp_ply_file)
-                    cur_obj = bpy.context.selected_objects[-1]
-            else:
-                bpy.ops.import_mesh.ply(filepath=model_path)
-                cur_obj = bpy.context.selected_objects[-1]
+                texture_file_name = PlyUtility.read_header(model_path)["texture_file"]
+                if texture_file_name is not None:
+                    texture_file_path = os.path.join(os.path.dirname(model_path), texture_file_name)
         elif allow_duplication:
             bpy.ops.object.duplicate({"object": cur_obj, "selected_objects": [cur_obj]})
             cur_obj = bpy.context.selected_objects[-1]
@@ -3,13 +3,16 @@
 
 import bpy
 
+from src.utility.MaterialCatalog import MaterialCatalog
 from src.utility.MaterialLoaderUtility import MaterialLoaderUtility
 from src.utility.MaterialUtility import Material
 from src.utility.Utility import Utility
+from src.utility.Tracer import Tracer
 
 class CCMaterialLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(folder_path: str = "resources/cctextures", used_assets: list = None, preload: bool = False,
              fill_used_empty_materials: bool = False, add_custom_properties: dict = None,
              use_all_materials: bool = False) -> List[Material]:
@@ -20,6 +23,9 @@ def load(folder_path: str = "resources/cctextures", used_assets: list = None, pr
 
         All materials will have the custom property "is_cc_texture": True, which will make the selection later on easier.
 
+        The content of the folder is indexed in a catalog (see :class:`src.utility.MaterialCatalog`), so only changed
+        asset folders are listed again in later runs.
+
         :param folder_path: The path to the downloaded cc0textures.
         :param used_assets: A list of all asset names, you want to use. The asset-name must not be typed in completely, only the
                             beginning the name starts with. By default all assets will be loaded, specified by an empty list.
@@ -44,7 +50,7 @@ def load(folder_path: str = "resources/cctextures", used_assets: list = None, pr
                                    "wood chips"]
         if not use_all_materials and used_assets is None:
             used_assets = probably_useful_texture
-        else:
+        elif used_assets is not None:
             used_assets = [asset.lower() for asset in used_assets]
 
         if add_custom_properties is None:
@@ -55,55 +61,49 @@ def load(folder_path: str = "resources/cctextures", used_assets: list = None, pr
 
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
             materials = []
-            for asset in os.listdir(folder_path):
-                if used_assets:
-                    skip_this_one = True
-                    for used_asset in used_assets:
-                        # lower is necessary here, as all used assets are made that that way
-                        if asset.lower().startswith(used_asset.replace(" ", "")):
-                            skip_this_one = False
-                            break
-                    if skip_this_one:
-                        continue
+            assets = MaterialCatalog.get_assets(folder_path)
+            # lower is necessary here, as all used assets are made that that way
+            used_prefixes = [used_asset.replace(" ", "") for used_asset in used_assets] if used_assets else None
+            for asset in MaterialCatalog.filter_assets(list(assets.keys()), used_prefixes, ignore_case=True):
                 current_path = os.path.join(folder_path, asset)
-                if os.path.isdir(current_path):
-                    base_image_path = os.path.join(current_path, "{}_2K_Color.jpg".format(asset))
-                    if not os.path.exists(base_image_path):
-                        continue
-
-                    # construct all image paths
-                    ambient_occlusion_image_path = base_image_path.replace("Color", "AmbientOcclusion")
-                    metallic_image_path = base_image_path.replace("Color", "Metalness")
-                    roughness_image_path = base_image_path.replace("Color", "Roughness")
-                    alpha_image_path = base_image_path.replace("Color", "Opacity")
-                    normal_image_path = base_image_path.replace("Color", "Normal")
-                    displacement_image_path = base_image_path.replace("Color", "Displacement")
-
-                    # if the material was already created it only has to be searched
-                    if fill_used_empty_materials:
-                        new_mat = MaterialLoaderUtility.find_cc_material_by_name(asset, add_custom_properties)
-                    else:
-                        new_mat = MaterialLoaderUtility.create_new_cc_material(asset, add_custom_properties)
-
-                    # if preload then the material is only created but not filled
-                    if preload:
-                        # Set alpha to 0 if the material has an alpha texture, so it can be detected e.q. in the material getter.
-                        nodes = new_mat.node_tree.nodes
-                        principled_bsdf = Utility.get_the_one_node_with_type(nodes, "BsdfPrincipled")
-                        principled_bsdf.inputs["Alpha"].default_value = 0 if os.path.exists(alpha_image_path) else 1
-                        # add it here for the preload case
-                        materials.append(Material(new_mat))
-                        continue
-                    elif fill_used_empty_materials and not MaterialLoaderUtility.is_material_used(new_mat):
-                        # now only the materials, which have been used should be filled
-                        continue
-
-                    # create material based on these image paths
-                    CCMaterialLoader.create_material(new_mat, base_image_path, ambient_occlusion_image_path,
-                                                     metallic_image_path, roughness_image_path, alpha_image_path,
-                                                     normal_image_path, displacement_image_path)
-
+                maps = MaterialCatalog.get_cc_maps(asset, assets[asset]).get("2K", {})
+                if "Color.jpg" not in maps:
+                    continue
+
+                # construct all image paths
+                base_image_path = os.path.join(current_path, "{}_2K_Color.jpg".format(asset))
+                ambient_occlusion_image_path = base_image_path.replace("Color", "AmbientOcclusion")
+                metallic_image_path = base_image_path.replace("Color", "Metalness")
+                roughness_image_path = base_image_path.replace("Color", "Roughness")
+                alpha_image_path = base_image_path.replace("Color", "Opacity")
+                normal_image_path = base_image_path.replace("Color", "Normal")
+                displacement_image_path = base_image_path.replace("Color", "Displacement")
+
+                # if the material was already created it only has to be searched
+                if fill_used_empty_materials:
+                    new_mat = MaterialLoaderUtility.find_cc_material_by_name(asset, add_custom_properties)
+                else:
+                    new_mat = MaterialLoaderUtility.create_new_cc_material(asset, add_custom_properties)
+
+                # if preload then the material is only created but not filled
+                if preload:
+                    # Set alpha to 0 if the material has an alpha texture, so it can be detected e.q. in the material getter.
+                    nodes = new_mat.node_tree.nodes
+                    principled_bsdf = Utility.get_the_one_node_with_type(nodes, "BsdfPrincipled")
+                    principled_bsdf.inputs["Alpha"].default_value = 0 if "Opacity.jpg" in maps else 1
+                    # add it here for the preload case
                     materials.append(Material(new_mat))
+                    continue
+                elif fill_used_empty_materials and not MaterialLoaderUtility.is_material_used(new_mat):
+                    # now only the materials, which have been used should be filled
+                    continue
+
+                # create material based on these image paths
+                CCMaterialLoader.create_material(new_mat, base_image_path, ambient_occlusion_image_path,
+                                                 metallic_image_path, roughness_image_path, alpha_image_path,
+                                                 normal_image_path, displacement_image_path)
+
+                materials.append(Material(new_mat))
             return materials
         else:
             raise Exception("The folder path does not exist: {}".format(folder_path))
@@ -1,8 +1,9 @@
+import hashlib
 import json
 import os
 import warnings
 from math import radians
-from typing import List, Mapping
+from typing import Dict, List, Mapping, Tuple
 import bpy
 import mathutils
 import numpy as np
@@ -15,6 +16,7 @@
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
 from src.utility.loader.TextureLoader import TextureLoader
+from src.utility.Tracer import Tracer
 
 
 class Front3DLoader:
@@ -32,7 +34,8 @@ class Front3DLoader:
     """
 
     @staticmethod
-    def load(json_path: str, future_model_path: str, front_3D_texture_path: str, label_mapping: LabelIdMapping, ceiling_light_strength: float = 0.8, lamp_light_strength: float = 7.0) -> List[MeshObject]:
+    @Tracer.traced("loader")
+    def load(json_path: str, future_model_path: str, front_3D_texture_path: str, label_mapping: LabelIdMapping, ceiling_light_strength: float = 0.8, lamp_light_strength: float = 7.0, cache_dir: str = None) -> List[MeshObject]:
         """ Loads the 3D-Front scene specified by the given json file.
 
         :param json_path: Path to the json file, where the house information is stored.
@@ -41,6 +44,8 @@ def load(json_path: str, future_model_path: str, front_3D_texture_path: str, lab
         :param label_mapping: A dict which maps the names of the objects to ids.
         :param ceiling_light_strength: Strength of the emission shader used in the ceiling.
         :param lamp_light_strength: Strength of the emission shader used in each lamp.
+        :param cache_dir: If given, the parsed house is stored as .npz file in this directory, s.t. loading the same house
+                          again does not require to parse the json file.
         :return: The list of loaded mesh objects.
         """
         json_path = Utility.resolve_path(json_path)
@@ -54,15 +59,15 @@ def load(json_path: str, future_model_path: str, front_3D_texture_path: str, lab
         if not os.path.exists(future_model_path):
             raise Exception("The 3D future model path does not exist: {}".format(future_model_path))
 
-        # load data from json file
-        with open(json_path, "r") as json_file:
-            data = json.load(json_file)
+        # load data from json file or from the cache
+        data, mesh_arrays = Front3DLoader._load_house(json_path, Utility.resolve_path(cache_dir) if cache_dir is not None else None)
 
         if "scene" not in data:
             raise Exception("There is no scene data in this json file: {}".format(json_path))
 
         created_objects = Front3DLoader._create_mesh_objects_from_file(data, front_3D_texture_path,
-                                                                       ceiling_light_strength, label_mapping, json_path)
+                                                                       ceiling_light_strength, label_mapping, json_path,
+                                                                       mesh_arrays)
 
         all_loaded_furniture = Front3DLoader._load_furniture_objs(data, future_model_path, lamp_light_strength, label_mapping)
 
@@ -74,6 +79,54 @@ def load(json_path: str, future_model_path: str, front_3D_texture_path: str, lab
 
         return created_objects
 
+    @staticmethod
+    def _load_house(json_path: str, cache_dir: str = None) -> Tuple[dict, List[Dict[str, np.ndarray]]]:
+        """ Loads the given house json file and converts the geometry of all its meshes into numpy arrays.
+
+        The geometry is removed from the returned json data. If a cache dir is given, the result is stored as .npz
+        file, which is named after the hash of the json path, its size and modification time. So the json file only
+        has to be parsed the first time a house is loaded.
+
+        :param json_path: Path to the json file, where the house information is stored.
+        :param cache_dir: The directory of the .npz cache. If None is given, no cache is used.
+        :return: The json data without the mesh geometry and for each mesh a dict with the arrays "xyz" [N, 3],
+                 "normal" [N, 3], "faces" [M] and "uv" [N, 2] (or [0, 2] if the mesh has no uv coordinates).
+        """
+        cache_path = None
+        if cache_dir is not None:
+            stat = os.stat(json_path)
+            key = json.dumps([os.path.abspath(json_path), stat.st_mtime_ns, stat.st_size])
+            cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npz")
+            if os.path.exists(cache_path):
+                with np.load(cache_path) as cache:
+                    data = json.loads(str(cache["house"]))
+                    mesh_arrays = [{array_name: cache["{}_{}".format(i, array_name)] for array_name in ["xyz", "normal", "faces", "uv"]}
+                                   for i in range(len(data.get("mesh", [])))]
+                return data, mesh_arrays
+
+        with open(json_path, "r") as json_file:
+            data = json.load(json_file)
+
+        mesh_arrays = []
+        for mesh_data in data.get("mesh", []):
+            # flip the y and z axis to map those to the blender coordinate system
+            vertices = np.array(mesh_data.pop("xyz"), dtype=np.float32).reshape(-1, 3)[:, [0, 2, 1]]
+            normal = np.array(mesh_data.pop("normal"), dtype=np.float32).reshape(-1, 3)[:, [0, 2, 1]]
+            faces = np.array(mesh_data.pop("faces"), dtype=np.int32)
+            # the missing uv coordinates are None, they get removed here
+            uv = np.array(mesh_data.pop("uv"), dtype=np.float64)
+            uv = uv[~np.isnan(uv)].astype(np.float32).reshape(-1, 2)
+            mesh_arrays.append({"xyz": vertices, "normal": normal, "faces": faces, "uv": uv})
+
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache = {"{}_{}".format(i, array_name): array for i, arrays in enumerate(mesh_arrays) for array_name, array in arrays.items()}
+            # Write into a temporary file first, s.t. no other run can read a half written file
+            temp_path = "{}.{}.tmp.npz".format(cache_path[:-len(".npz")], os.getpid())
+            np.savez(temp_path, house=np.array(json.dumps(data)), **cache)
+            os.replace(temp_path, cache_path)
+        return data, mesh_arrays
+
     @staticmethod
     def _extract_hash_nr_for_texture(given_url: str, front_3D_texture_path: str) -> str:
         """
@@ -120,7 +173,8 @@ def _get_used_image(hash_folder_path: str, saved_image_dict: Mapping[str, bpy.ty
 
     @staticmethod
     def _create_mesh_objects_from_file(data: dict, front_3D_texture_path: str, ceiling_light_strength: float,
-                                       label_mapping: LabelIdMapping, json_path: str) -> List[MeshObject]:
+                                       label_mapping: LabelIdMapping, json_path: str,
+                                       mesh_arrays: List[Dict[str, np.ndarray]]) -> List[MeshObject]:
         """
         This creates for a given data json block all defined meshes and assigns the correct materials.
         This means that the json file contains some mesh, like walls and floors, which have to built up manually.
@@ -132,6 +186,7 @@ def _create_mesh_objects_from_file(data: dict, front_3D_texture_path: str, ceili
         :param ceiling_light_strength: Strength of the emission shader used in the ceiling.
         :param label_mapping: A dict which maps the names of the objects to ids.
         :param json_path: Path to the json file, where the house information is stored.
+        :param mesh_arrays: The geometry of each mesh in data["mesh"], as returned by _load_house().
         :return: The list of loaded mesh objects.
         """
         # extract all used materials -> there are more materials defined than used
@@ -148,7 +203,7 @@ def _create_mesh_objects_from_file(data: dict, front_3D_texture_path: str, ceili
         used_materials_based_on_color = {}
         # materials based on texture to avoid recreating the same material over and over
         used_materials_based_on_texture = {}
-        for mesh_data in data["mesh"]:
+        for mesh_data, arrays in zip(data["mesh"], mesh_arrays):
             # extract the obj name, which also is used as the category_id name
             used_obj_name = mesh_data["type"].strip()
             if used_obj_name == "":
@@ -230,29 +285,14 @@ def _create_mesh_objects_from_file(data: dict, front_3D_texture_path: str, ceili
                     # as this material was just created the material is just append it to the empty list
                     obj.add_material(mat)
 
-            # extract the vertices from the mesh_data
-            vert = [float(ele) for ele in mesh_data["xyz"]]
-            # extract the faces from the mesh_data
-            faces = mesh_data["faces"]
-            # extract the normals from the mesh_data
-            normal = [float(ele) for ele in mesh_data["normal"]]
-
-            # map those to the blender coordinate system
-            num_vertices = int(len(vert) / 3)
-            vertices = np.reshape(np.array(vert), [num_vertices, 3])
-            normal = np.reshape(np.array(normal), [num_vertices, 3])
-            # flip the first and second value
-            vertices[:, 1], vertices[:, 2] = vertices[:, 2], vertices[:, 1].copy()
-            normal[:, 1], normal[:, 2] = normal[:, 2], normal[:, 1].copy()
-            # reshape back to a long list
-            vertices = np.reshape(vertices, [num_vertices * 3])
-            normal = np.reshape(normal, [num_vertices * 3])
+            vertices, normal, faces, uv = arrays["xyz"], arrays["normal"], arrays["faces"], arrays["uv"]
+            num_vertices = len(vertices)
 
             # add this new data to the mesh object
             mesh = obj.get_mesh()
             mesh.vertices.add(num_vertices)
-            mesh.vertices.foreach_set("co", vertices)
-            mesh.vertices.foreach_set("normal", normal)
+            mesh.vertices.foreach_set("co", vertices.ravel())
+            mesh.vertices.foreach_set("normal", normal.ravel())
 
             # link the faces as vertex indices
             num_vertex_indicies = len(faces)
@@ -262,24 +302,15 @@ def _create_mesh_objects_from_file(data: dict, front_3D_texture_path: str, ceili
             # the loops are set based on how the faces are a ranged
             num_loops = int(num_vertex_indicies / 3)
             mesh.polygons.add(num_loops)
-            # always 3 vertices form one triangle
-            loop_start = np.arange(0, num_vertex_indicies, 3)
-            # the total size of each triangle is therefore 3
-            loop_total = [3] * num_loops
-            mesh.polygons.foreach_set("loop_start", loop_start)
-            mesh.polygons.foreach_set("loop_total", loop_total)
-
-            # the uv coordinates are reshaped then the face coords are extracted
-            uv_mesh_data = [float(ele) for ele in mesh_data["uv"] if ele is not None]
-            # bb1737bf-dae6-4215-bccf-fab6f584046b.json includes one mesh which only has no UV mapping
-            if uv_mesh_data:
-                uv = np.reshape(np.array(uv_mesh_data), [num_vertices, 2])
-                used_uvs = uv[faces, :]
-                # and again reshaped back to the long list
-                used_uvs = np.reshape(used_uvs, [2 * num_vertex_indicies])
+            # always 3 vertices form one triangle, the total size of each triangle is therefore 3
+            mesh.polygons.foreach_set("loop_start", np.arange(0, 3 * num_loops, 3, dtype=np.int32))
+            mesh.polygons.foreach_set("loop_total", np.full(num_loops, 3, dtype=np.int32))
 
+            # bb1737bf-dae6-4215-bccf-fab6f584046b.json includes one mesh which only has no UV mapping
+            if len(uv) > 0:
+                # the uv coordinates of the face corners are extracted
                 mesh.uv_layers.new(name="new_uv_layer")
-                mesh.uv_layers[-1].data.foreach_set("uv", used_uvs)
+                mesh.uv_layers[-1].data.foreach_set("uv", uv[faces].ravel())
             else:
                 warnings.warn(f"This mesh {obj.name} does not have a specified uv map!")
 
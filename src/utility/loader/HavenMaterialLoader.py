@@ -1,11 +1,12 @@
-import glob
 import os
 
 import addon_utils
 import bpy
 
+from src.utility.MaterialCatalog import MaterialCatalog
 from src.utility.MaterialLoaderUtility import MaterialLoaderUtility
 from src.utility.Utility import Utility
+from src.utility.Tracer import Tracer
 
 
 class HavenMaterialLoader:
@@ -20,6 +21,7 @@ class HavenMaterialLoader:
     """
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(folder_path: str = "resources/haven", used_assets: list = [], preload: bool = False, fill_used_empty_materials: bool = False, add_cp: dict = {}):
         """ Loads all specified haven textures from the given directory.
 
@@ -38,58 +40,51 @@ def load(folder_path: str = "resources/haven", used_assets: list = [], preload:
         if preload and fill_used_empty_materials:
             raise Exception("Preload and fill used empty materials can not be done at the same time, check config!")
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
-            for asset in os.listdir(folder_path):
-                if used_assets:
-                    skip_this_one = True
-                    for used_asset in used_assets:
-                        if asset.startswith(used_asset):
-                            skip_this_one = False
-                            break
-                    if skip_this_one:
-                        continue
+            assets = MaterialCatalog.get_assets(folder_path)
+            for asset in MaterialCatalog.filter_assets(list(assets.keys()), used_assets):
                 current_path = os.path.join(folder_path, asset)
-                if os.path.isdir(current_path):
-                    # find the current base_image_path by search for _diff_, this make it independent of the used res
-                    all_paths = glob.glob(os.path.join(current_path, "*.jpg"))
-                    base_image_path = ""
+                # find the current base_image_path by search for _diff_, this make it independent of the used res
+                all_paths = [os.path.join(current_path, file_name) for file_name in assets[asset]
+                             if file_name.endswith(".jpg")]
+                base_image_path = ""
+                for path in all_paths:
+                    if "_diff_" in path:
+                        base_image_path = path
+                        break
+                if not base_image_path:
+                    continue
+
+                # if the material was already created it only has to be searched
+                if fill_used_empty_materials:
+                    new_mat = MaterialLoaderUtility.find_cc_material_by_name(asset, add_cp)
+                else:
+                    new_mat = MaterialLoaderUtility.create_new_cc_material(asset, add_cp)
+                if preload:
+                    # if preload then the material is only created but not filled
+                    continue
+                elif fill_used_empty_materials and not MaterialLoaderUtility.is_material_used(new_mat):
+                    # now only the materials, which have been used should be filled
+                    continue
+
+                # construct all image paths
+                # the images path contain the words named in this list, but some of them are differently
+                # capitalized, e.g. Nor, NOR, NoR, ...
+                used_elements = ["ao", "spec", "rough", "nor", "disp", "bump", "alpha"]
+                final_paths = {}
+                for ele in used_elements:
+                    new_path = base_image_path.replace("diff", ele).lower()
+                    found_path = ""
                     for path in all_paths:
-                        if "_diff_" in path:
-                            base_image_path = path
+                        if path.lower() == new_path:
+                            found_path = path
                             break
-                    if not os.path.exists(base_image_path):
-                        continue
-
-                    # if the material was already created it only has to be searched
-                    if fill_used_empty_materials:
-                        new_mat = MaterialLoaderUtility.find_cc_material_by_name(asset, add_cp)
-                    else:
-                        new_mat = MaterialLoaderUtility.create_new_cc_material(asset, add_cp)
-                    if preload:
-                        # if preload then the material is only created but not filled
-                        continue
-                    elif fill_used_empty_materials and not MaterialLoaderUtility.is_material_used(new_mat):
-                        # now only the materials, which have been used should be filled
-                        continue
-
-                    # construct all image paths
-                    # the images path contain the words named in this list, but some of them are differently
-                    # capitalized, e.g. Nor, NOR, NoR, ...
-                    used_elements = ["ao", "spec", "rough", "nor", "disp", "bump", "alpha"]
-                    final_paths = {}
-                    for ele in used_elements:
-                        new_path = base_image_path.replace("diff", ele).lower()
-                        found_path = ""
-                        for path in all_paths:
-                            if path.lower() == new_path:
-                                found_path = path
-                                break
-                        final_paths[ele] = found_path
-
-                    # create material based on these image paths
-                    HavenMaterialLoader.create_material(new_mat, base_image_path, final_paths["ao"],
-                                                        final_paths["spec"], final_paths["rough"],
-                                                        final_paths["alpha"], final_paths["nor"],
-                                                        final_paths["disp"], final_paths["bump"])
+                    final_paths[ele] = found_path
+
+                # create material based on these image paths
+                HavenMaterialLoader.create_material(new_mat, base_image_path, final_paths["ao"],
+                                                    final_paths["spec"], final_paths["rough"],
+                                                    final_paths["alpha"], final_paths["nor"],
+                                                    final_paths["disp"], final_paths["bump"])
         else:
             raise Exception("The folder path does not exist: {}".format(folder_path))
 
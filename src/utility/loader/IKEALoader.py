@@ -9,6 +9,7 @@
 
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class IKEALoader:
@@ -83,6 +84,7 @@ def _get_object_by_style(obj_style, obj_dict):
         return object_lst
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(data_dir: str = 'resources/IKEA', obj_categories: Union[list, str] = None, obj_style: str = None) -> List[MeshObject]:
         """ Loads ikea objects based on selected type and style.
 
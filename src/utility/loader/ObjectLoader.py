@@ -1,15 +1,17 @@
 import os
-import os
 from typing import List
 
 import bpy
 
+from src.utility.AssetCache import AssetCache
 from src.utility.MeshObjectUtility import MeshObject
+from src.utility.Tracer import Tracer
 
 
 class ObjectLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(filepath: str, cached_objects: dict = None, **kwargs) -> List[MeshObject]:
         """ Import all objects for the given file and returns the loaded objects
 
@@ -34,22 +36,26 @@ def load(filepath: str, cached_objects: dict = None, **kwargs) -> List[MeshObjec
                     cached_objects[filepath] = loaded_objects
                     return loaded_objects
             else:
-                # save all selected objects
-                previously_selected_objects = set(bpy.context.selected_objects)
-                if filepath.endswith('.obj'):
-                    # load an .obj file:
-                    bpy.ops.import_scene.obj(filepath=filepath, **kwargs)
-                elif filepath.endswith('.ply'):
-                    # load a .ply mesh
-                    bpy.ops.import_mesh.ply(filepath=filepath, **kwargs)
-                    # add a default material to ply file
-                    mat = bpy.data.materials.new(name="ply_material")
-                    mat.use_nodes = True
-                    loaded_objects = list(set(bpy.context.selected_objects) - previously_selected_objects)
-                    for obj in loaded_objects:
-                        obj.data.materials.append(mat)
-
-                # return all currently selected objects
-                return MeshObject.convert_to_meshes(list(set(bpy.context.selected_objects) - previously_selected_objects))
+                def import_file() -> List[bpy.types.Object]:
+                    # save all selected objects
+                    previously_selected_objects = set(bpy.context.selected_objects)
+                    if filepath.endswith('.obj'):
+                        # load an .obj file:
+                        bpy.ops.import_scene.obj(filepath=filepath, **kwargs)
+                    elif filepath.endswith('.ply'):
+                        # load a .ply mesh
+                        bpy.ops.import_mesh.ply(filepath=filepath, **kwargs)
+                        # add a default material to ply file
+                        mat = bpy.data.materials.new(name="ply_material")
+                        mat.use_nodes = True
+                        loaded_objects = list(set(bpy.context.selected_objects) - previously_selected_objects)
+                        for obj in loaded_objects:
+                            obj.data.materials.append(mat)
+
+                    # return all currently selected objects
+                    return list(set(bpy.context.selected_objects) - previously_selected_objects)
+
+                # reuse the result of a previous import from the persistent asset cache, if it is enabled
+                return MeshObject.convert_to_meshes(AssetCache.import_cached(filepath, import_file, "ObjectLoader", kwargs))
         else:
             raise Exception("The given filepath does not exist: {}".format(filepath))
\ No newline at end of file
@@ -8,6 +8,7 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class Pix3DLoader:
@@ -56,6 +57,7 @@ def get_files_with_category(used_category: str, data_path: str) -> list:
             raise Exception("The annotation file could not be found: {}".format(path_to_annotation_file))
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(used_category: str, data_path: str = 'resources/pix3d') -> List[MeshObject]:
         """ Loads one random Pix3D object from the given category.
 
@@ -5,11 +5,13 @@
 
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class ReplicaLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(data_path: str, data_set_name: str, use_smooth_shading: bool = False) -> List[MeshObject]:
         """ Just imports the configured .ply file straight into blender for the replica case.
 
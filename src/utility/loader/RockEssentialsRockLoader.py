@@ -7,12 +7,14 @@
 from mathutils import Vector
 
 from src.utility.MeshObjectUtility import MeshObject
+from src.utility.Tracer import Tracer
 
 
 class RockEssentialsRockLoader:
     """ Loads rocks/cliffs from a specified .blend Rocks Essentials file. """
 
     @staticmethod
+    @Tracer.traced("loader")
     def load_rocks(path: str, subsec_num: int, objects: list = [], sample_objects: bool = False, amount: int = None) -> List[MeshObject]:
         """ Loads rocks from the given blend file.
 
@@ -9,11 +9,13 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class SceneNetLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(file_path: str, texture_folder: str, label_mapping: LabelIdMapping, unknown_texture_folder: str = "unknown") -> List[MeshObject]:
         """ Loads all SceneNet objects at the given "file_path".
 
@@ -10,11 +10,13 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 
 
 class ShapeNetLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(data_path: str, used_synset_id: str, used_source_id: str = "", move_object_origin: bool = True) -> List[MeshObject]:
         """ This loads an object from ShapeNet based on the given synset_id, which specifies the category of objects to use.
 
@@ -42,20 +44,31 @@ def load(data_path: str, used_synset_id: str, used_source_id: str = "", move_obj
 
         ShapeNetLoader._correct_materials(loaded_obj)
 
+        ShapeNetLoader.normalize_meshes(loaded_obj, move_object_origin)
+        bpy.ops.object.select_all(action='DESELECT')
+
+        return loaded_obj
+
+    @staticmethod
+    def normalize_meshes(objects: List[MeshObject], move_object_origin: bool = True):
+        """ Applies the changes to the meshes of freshly imported ShapeNet objects, which are done by load().
+
+        This is also used to precompute convex decompositions, whose cache is keyed by the mesh content.
+
+        :param objects: The imported ShapeNet objects.
+        :param move_object_origin: Moves the object center to the bottom of the bounding box in Z direction and also in the middle of the X and Y plane, this does not change the `.location` of the object.
+        """
         # removes the x axis rotation found in all ShapeNet objects, this is caused by importing .obj files
         # the object has the same pose as before, just that the rotation_euler is now [0, 0, 0]
-        for obj in loaded_obj:
+        for obj in objects:
             obj.persist_transformation_into_mesh(location=False, rotation=True, scale=False)
 
         # check if the move_to_world_origin flag is set
         if move_object_origin:
             # move the origin of the object to the world origin and on top of the X-Y plane
             # makes it easier to place them later on, this does not change the `.location`
-            for obj in loaded_obj:
+            for obj in objects:
                 obj.move_origin_to_bottom_mean_point()
-        bpy.ops.object.select_all(action='DESELECT')
-
-        return loaded_obj
 
     @staticmethod
     def _get_files_with_synset(used_synset_id: str, used_source_id: str, path_to_taxonomy_file: str, data_path: str) -> list:
@@ -14,11 +14,13 @@
 from src.utility.MeshObjectUtility import MeshObject
 from src.utility.Utility import Utility
 from src.utility.loader.ObjectLoader import ObjectLoader
+from src.utility.Tracer import Tracer
 from typing import Tuple
 
 class SuncgLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(house_path: str, label_mapping: LabelIdMapping, suncg_dir: str = None) -> List[MeshObject]:
         """ Loads a house.json file into blender.
 
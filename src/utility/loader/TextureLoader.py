@@ -6,11 +6,13 @@
 import bpy
 
 from src.utility.Utility import Utility
+from src.utility.Tracer import Tracer
 
 
 class TextureLoader:
 
     @staticmethod
+    @Tracer.traced("loader")
     def load(path: str, colorspace: str = "sRGB") -> List[bpy.types.Texture]:
         """ Loads images and creates image textures.
 
@@ -1,3 +1,5 @@
+from typing import List
+
 import bpy
 import mathutils
 import numpy as np
@@ -14,7 +16,7 @@ def simulate_and_fix_final_poses(min_simulation_time: float = 4.0, max_simulatio
         """ Simulates the current scene and in the end fixes the final poses of all active objects.
 
         The simulation is run for at least `min_simulation_time` seconds and at a maximum `max_simulation_time` seconds.
-        Every `check_object_interval` seconds, it is checked if the maximum object movement in the last second is below a given threshold.
+        Every `check_object_interval` seconds, it is checked if the movement of every object in the last second is below the given thresholds.
         If that is the case, the simulation is stopped.
 
         After performing the simulation, the simulation cache is removed, the rigid body components are disabled and the pose of the active objects is set to their final pose in the simulation.
@@ -23,9 +25,9 @@ def simulate_and_fix_final_poses(min_simulation_time: float = 4.0, max_simulatio
         :param max_simulation_time: The maximum number of seconds to simulate.
         :param check_object_interval: The interval in seconds at which all objects should be checked if they are still moving. If all objects
                                       have stopped moving, than the simulation will be stopped.
-        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the location that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_rotation_threshold: The maximum rotation angle (in radians) per second that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
         :param substeps_per_frame: Number of simulation steps taken per frame.
         :param solver_iters: Number of constraint solver iterations made per simulation step.
@@ -61,12 +63,103 @@ def simulate_and_fix_final_poses(min_simulation_time: float = 4.0, max_simulatio
             # Disable the rigidbody element of the object
             obj.disable_rigidbody()
 
+    @staticmethod
+    def simulate_and_fix_final_poses_in_cells(cells: List[List[MeshObject]], cell_margin: float = 1.0, min_simulation_time: float = 4.0, max_simulation_time: float = 40.0, check_object_interval: float = 2.0, object_stopped_location_threshold: float = 0.01, object_stopped_rotation_threshold: float = 0.1, substeps_per_frame: int = 10, solver_iters: int = 10):
+        """ Simulates multiple independent scenes ("cells") together in one rigid body world and fixes their final poses.
+
+        Instead of running one simulation per small scene, the cells are laid out next to each other on a grid, s.t.
+        they are far enough apart to never interact. Then all cells are simulated at once via simulate_and_fix_final_poses()
+        and afterwards every cell is moved back to its original place. As gravity is the same everywhere, shifting a cell
+        does not change its simulation.
+
+        Each cell is a list of objects, e.g. a tote and the objects dropped into it. Objects which have a parent (e.g.
+        the parts of a convex decomposition) are moved together with their parent. Passive rigid bodies which are not
+        part of any cell are simulated at their current place, which is also the place of the first cell. Active rigid
+        bodies which are not part of any cell would fall into the first cell, therefore they form an extra cell and a
+        warning is printed.
+
+        :param cells: A list of cells, each given as the list of objects it consists of.
+        :param cell_margin: The minimum distance in meter between the bounding boxes of two cells during the simulation.
+        :param min_simulation_time: The minimum number of seconds to simulate.
+        :param max_simulation_time: The maximum number of seconds to simulate.
+        :param check_object_interval: The interval in seconds at which all objects should be checked if they are still moving. If all objects
+                                      have stopped moving, than the simulation will be stopped.
+        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the location that is allowed, such
+                                                  that an object is still recognized as 'stopped moving'.
+        :param object_stopped_rotation_threshold: The maximum rotation angle (in radians) per second that is allowed, such
+                                                  that an object is still recognized as 'stopped moving'.
+        :param substeps_per_frame: Number of simulation steps taken per frame.
+        :param solver_iters: Number of constraint solver iterations made per simulation step.
+        """
+        # Only move the top level objects, children follow their parents
+        cells = [[obj for obj in cell if obj.get_parent() is None] for cell in cells]
+        cells = [cell for cell in cells if cell]
+
+        # Active rigid bodies without a cell are simulated in their own cell, s.t. they do not end up in the first cell
+        objects_in_cells = set(obj.blender_obj for cell in cells for obj in cell)
+        objects_without_cell = [MeshObject(obj) for obj in get_all_blender_mesh_objects()
+                                if obj.rigid_body is not None and obj.rigid_body.type == 'ACTIVE' and obj.parent is None and obj not in objects_in_cells]
+        if objects_without_cell:
+            print("Warning: The active rigid bodies " + ", ".join(obj.get_name() for obj in objects_without_cell) +
+                  " are not part of any cell, they are simulated together in an extra cell.")
+            cells.append(objects_without_cell)
+
+        offsets = PhysicsSimulation._compute_cell_offsets(cells, cell_margin)
+
+        for cell, offset in zip(cells, offsets):
+            for obj in cell:
+                obj.set_location(obj.get_location() + offset)
+
+        try:
+            PhysicsSimulation.simulate_and_fix_final_poses(min_simulation_time, max_simulation_time, check_object_interval, object_stopped_location_threshold, object_stopped_rotation_threshold, substeps_per_frame, solver_iters)
+        finally:
+            # Split the cells again by moving them back to their original places
+            for cell, offset in zip(cells, offsets):
+                for obj in cell:
+                    obj.set_location(obj.get_location() - offset)
+
+    @staticmethod
+    def _compute_cell_offsets(cells: List[List[MeshObject]], cell_margin: float) -> np.ndarray:
+        """ Computes for every cell a shift in the xy-plane, which lays out all cells on a square grid without overlaps.
+
+        The first cell stays at its place, the others are placed in rows next to it. The grid spacing is determined
+        by the biggest cell.
+
+        :param cells: A list of cells, each given as the non-empty list of its top level objects.
+        :param cell_margin: The minimum distance between the bounding boxes of two cells.
+        :return: The offsets of all cells. Type: numpy array of shape [K, 3].
+        """
+        if not cells:
+            return np.zeros((0, 3))
+
+        # The bounding box of every cell in world coordinates (including the children of its objects)
+        cell_bounds = []
+        for cell in cells:
+            # Collect all objects of the cell including the children of its objects
+            blender_objects = [obj.blender_obj for obj in cell]
+            for blender_obj in blender_objects:
+                blender_objects.extend(blender_obj.children)
+            bound_boxes = np.concatenate([MeshObject(blender_obj).get_bound_box() for blender_obj in blender_objects if blender_obj.type == "MESH"])
+            cell_bounds.append((bound_boxes.min(axis=0), bound_boxes.max(axis=0)))
+        cell_bounds = np.array(cell_bounds)
+        cell_centers = (cell_bounds[:, 0] + cell_bounds[:, 1]) / 2
+        spacing = np.max(cell_bounds[:, 1, :2] - cell_bounds[:, 0, :2]) + cell_margin
+
+        grid_size = int(np.ceil(np.sqrt(len(cells))))
+        grid_indices = np.arange(len(cells))
+        grid_positions = np.stack([grid_indices % grid_size, grid_indices // grid_size, np.zeros(len(cells))], axis=1) * spacing
+
+        offsets = cell_centers[0] + grid_positions - cell_centers
+        # Only shift in the xy-plane, s.t. every cell keeps its height
+        offsets[:, 2] = 0
+        return offsets
+
     @staticmethod
     def simulate(min_simulation_time: float = 4.0, max_simulation_time: float = 40.0, check_object_interval: float = 2.0, object_stopped_location_threshold: float = 0.01, object_stopped_rotation_threshold: float = 0.1, substeps_per_frame: int = 10, solver_iters: int = 10) -> dict:
         """ Simulates the current scene.
 
         The simulation is run for at least `min_simulation_time` seconds and at a maximum `max_simulation_time` seconds.
-        Every `check_object_interval` seconds, it is checked if the maximum object movement in the last second is below a given threshold.
+        Every `check_object_interval` seconds, it is checked if the movement of every object in the last second is below the given thresholds.
         If that is the case, the simulation is stopped.
 
         The origin of all objects is set to their center of mass in this function which is necessary to achieve a realistic simulation in blender (see https://blender.stackexchange.com/questions/167488/physics-not-working-as-expected)
@@ -76,9 +169,9 @@ def simulate(min_simulation_time: float = 4.0, max_simulation_time: float = 40.0
         :param max_simulation_time: The maximum number of seconds to simulate.
         :param check_object_interval: The interval in seconds at which all objects should be checked if they are still moving. If all objects
                                       have stopped moving, than the simulation will be stopped.
-        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the location that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_rotation_threshold: The maximum rotation angle (in radians) per second that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
         :param substeps_per_frame: Number of simulation steps taken per frame.
         :param solver_iters: Number of constraint solver iterations made per simulation step.
@@ -126,88 +219,107 @@ def _frames_to_seconds(frames: int) -> float:
     def _do_simulation(min_simulation_time: float, max_simulation_time: float, check_object_interval: float, object_stopped_location_threshold: float, object_stopped_rotation_threshold: float):
         """ Perform the simulation.
 
-        This method bakes the simulation for the configured number of iterations and returns all object positions at the last frame.
+        The rigid body world is advanced incrementally by setting one frame after another, so every frame is only
+        simulated once and the simulation never has to be restarted. Every `check_object_interval` seconds, the poses
+        of all active objects are compared to their poses one second earlier and the simulation is stopped as soon as
+        all objects are at rest. In the end, the scene is at the last simulated frame.
+
         :param min_simulation_time: The minimum number of seconds to simulate.
         :param max_simulation_time: The maximum number of seconds to simulate.
         :param check_object_interval: The interval in seconds at which all objects should be checked if they are still moving. If all objects
                                       have stopped moving, than the simulation will be stopped.
-        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the location that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_rotation_threshold: The maximum rotation angle per second that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
         """
-        # Run simulation
         point_cache = bpy.context.scene.rigidbody_world.point_cache
         point_cache.frame_start = 1
 
         if min_simulation_time >= max_simulation_time:
             raise Exception("max_simulation_iterations has to be bigger than min_simulation_iterations")
 
-        # Run simulation starting from min to max in the configured steps
-        for current_time in np.arange(min_simulation_time, max_simulation_time, check_object_interval):
-            current_frame = PhysicsSimulation._seconds_to_frames(current_time)
-            print("Running simulation up to " + str(current_time) + " seconds (" + str(current_frame) + " frames)")
-
-            # Simulate current interval
-            point_cache.frame_end = current_frame
-            bpy.ops.ptcache.bake({"point_cache": point_cache}, bake=True)
-
-            # Go to second last frame and get poses
-            bpy.context.scene.frame_set(current_frame - PhysicsSimulation._seconds_to_frames(1))
-            old_poses = PhysicsSimulation._get_pose()
-
-            # Go to last frame of simulation and get poses
-            bpy.context.scene.frame_set(current_frame)
-            new_poses = PhysicsSimulation._get_pose()
-
-            # If objects have stopped moving between the last two frames, then stop here
-            if PhysicsSimulation._have_objects_stopped_moving(old_poses, new_poses, object_stopped_location_threshold, object_stopped_rotation_threshold):
-                print("Objects have stopped moving after " + str(current_time) + "  seconds (" + str(current_frame) + " frames)")
+        check_times = np.arange(min_simulation_time, max_simulation_time, check_object_interval)
+        check_frames = [PhysicsSimulation._seconds_to_frames(check_time) for check_time in check_times]
+        # Every check compares the poses with the ones one second earlier
+        reference_frames = [max(check_frame - PhysicsSimulation._seconds_to_frames(1), point_cache.frame_start) for check_frame in check_frames]
+        # The cache has to cover all frames, which might be simulated, otherwise the simulation stops at its end
+        point_cache.frame_end = max(check_frames)
+
+        active_objects = [obj for obj in get_all_blender_mesh_objects() if obj.rigid_body is not None and obj.rigid_body.type == 'ACTIVE']
+        frames_to_record = set(reference_frames)
+        recorded_poses = {}
+
+        # Going to the first frame of the cache resets the rigid body world to the initial poses
+        current_frame = point_cache.frame_start
+        bpy.context.scene.frame_set(current_frame)
+        if current_frame in frames_to_record:
+            recorded_poses[current_frame] = PhysicsSimulation._get_pose_matrices(active_objects)
+
+        for check_time, check_frame, reference_frame in zip(check_times, check_frames, reference_frames):
+            print("Running simulation up to " + str(check_time) + " seconds (" + str(check_frame) + " frames)")
+
+            # Advance the simulation frame by frame, blender only steps the rigid body world between consecutive frames
+            while current_frame < check_frame:
+                current_frame += 1
+                bpy.context.scene.frame_set(current_frame)
+                if current_frame in frames_to_record:
+                    recorded_poses[current_frame] = PhysicsSimulation._get_pose_matrices(active_objects)
+
+            # If objects have stopped moving during the last second, then stop here
+            objects_at_rest = PhysicsSimulation._get_objects_at_rest(recorded_poses[reference_frame], PhysicsSimulation._get_pose_matrices(active_objects),
+                                                                     object_stopped_location_threshold, object_stopped_rotation_threshold)
+            if np.all(objects_at_rest):
+                print("Objects have stopped moving after " + str(check_time) + "  seconds (" + str(check_frame) + " frames)")
                 break
-            elif current_time + check_object_interval >= max_simulation_time:
+            elif check_time + check_object_interval >= max_simulation_time:
                 print("Stopping simulation as configured max_simulation_time has been reached")
             else:
-                # Free bake (this will not completely remove the simulation cache, so further simulations can reuse the already calculated frames)
-                bpy.ops.ptcache.free_bake({"point_cache": point_cache})
+                print(str(np.count_nonzero(~objects_at_rest)) + " of " + str(len(active_objects)) + " objects are still moving")
 
     @staticmethod
-    def _get_pose() -> dict:
-        """ Returns position and rotation values of all objects in the scene with ACTIVE rigid_body type.
+    def _get_pose_matrices(objects: list) -> np.ndarray:
+        """ Returns the world matrices of the given objects at the current frame.
 
-        :return: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
+        :param objects: The list of blender objects.
+        :return: The world matrices as numpy array of shape [N, 4, 4].
         """
-        objects_poses = {}
-        for obj in get_all_blender_mesh_objects():
-            if obj.rigid_body.type == 'ACTIVE':
-                location = bpy.context.scene.objects[obj.name].matrix_world.translation.copy()
-                rotation = mathutils.Vector(bpy.context.scene.objects[obj.name].matrix_world.to_euler())
-                objects_poses.update({obj.name: {'location': location, 'rotation': rotation}})
-
-        return objects_poses
+        return np.array([obj.matrix_world for obj in objects], dtype=np.float64).reshape(-1, 4, 4)
 
     @staticmethod
-    def _have_objects_stopped_moving(last_poses: dict, new_poses: dict, object_stopped_location_threshold: float, object_stopped_rotation_threshold: float) -> bool:
-        """ Check if the difference between the two given poses per object is smaller than the configured threshold.
+    def _get_objects_at_rest(last_poses: np.ndarray, new_poses: np.ndarray, object_stopped_location_threshold: float, object_stopped_rotation_threshold: float) -> np.ndarray:
+        """ Checks for each object, if the difference between its two given poses is smaller than the configured thresholds.
 
-        :param last_poses: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
-        :param new_poses: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
-        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param last_poses: The earlier world matrices of all objects. Type: numpy array of shape [N, 4, 4].
+        :param new_poses: The later world matrices of all objects. Type: numpy array of shape [N, 4, 4].
+        :param object_stopped_location_threshold: The maximum difference per coordinate in the location that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation Euler vector that is allowed. such
+        :param object_stopped_rotation_threshold: The maximum rotation angle between both poses that is allowed, such
                                                   that an object is still recognized as 'stopped moving'.
-        :return: True, if no objects are moving anymore.
+        :return: A boolean numpy array of shape [N], which is True for all objects which are not moving anymore.
         """
-        stopped = True
-        for obj_name in last_poses:
-            # Check location difference
-            location_diff = last_poses[obj_name]['location'] - new_poses[obj_name]['location']
-            stopped = stopped and not any(location_diff[i] > object_stopped_location_threshold for i in range(3))
+        location_diff = np.abs(new_poses[:, :3, 3] - last_poses[:, :3, 3]).max(axis=1, initial=0)
 
-            # Check rotation difference
-            rotation_diff = last_poses[obj_name]['rotation'] - new_poses[obj_name]['rotation']
-            stopped = stopped and not any(rotation_diff[i] > object_stopped_rotation_threshold for i in range(3))
+        # Remove the scale, s.t. only the rotations are compared
+        last_rotations = last_poses[:, :3, :3] / np.linalg.norm(last_poses[:, :3, :3], axis=1, keepdims=True)
+        new_rotations = new_poses[:, :3, :3] / np.linalg.norm(new_poses[:, :3, :3], axis=1, keepdims=True)
+        # The angle of the relative rotation R_last^T @ R_new, its trace is the sum of the element wise product
+        cos_angle = (np.einsum("nij,nij->n", last_rotations, new_rotations) - 1) / 2
+        rotation_diff = np.arccos(np.clip(cos_angle, -1, 1))
 
-            if not stopped:
-                break
+        return (location_diff <= object_stopped_location_threshold) & (rotation_diff <= object_stopped_rotation_threshold)
 
-        return stopped
+    @staticmethod
+    def _get_pose() -> dict:
+        """ Returns position and rotation values of all objects in the scene with ACTIVE rigid_body type.
+
+        :return: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
+        """
+        objects_poses = {}
+        for obj in get_all_blender_mesh_objects():
+            if obj.rigid_body is not None and obj.rigid_body.type == 'ACTIVE':
+                location = obj.matrix_world.translation.copy()
+                rotation = mathutils.Vector(obj.matrix_world.to_euler())
+                objects_poses.update({obj.name: {'location': location, 'rotation': rotation}})
+
+        return objects_poses
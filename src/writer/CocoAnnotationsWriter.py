@@ -39,6 +39,16 @@ class CocoAnnotationsWriter(WriterInterface):
         * - mask_encoding_format
           - Encoding format of the binary masks. Default: 'rle'. Available: 'rle', 'polygon'.
           - string
+        * - use_annotation_store
+          - If true, the annotations are appended to an append-only store in coco_data/annotation_store instead of
+            rewriting the whole coco_annotations.json, see CocoAnnotationStore. The store is always appended to.
+            Default: False.
+          - bool
+        * - compact_annotation_store
+          - If true and the annotation store is used, the coco_annotations.json is written from the store after each
+            run. This reads the whole store, so per default the store is only compacted once at the end via
+            scripts/compact_coco_annotations.py. Default: False.
+          - bool
     """
 
     def __init__(self, config):
@@ -50,6 +60,8 @@ def __init__(self, config):
         self.segcolormap_output_key = self.config.get_string("segcolormap_output_key", "segcolormap")
         self.mask_encoding_format = self.config.get_string("mask_encoding_format", "rle")
         self._append_to_existing_output = self.config.get_bool("append_to_existing_output", False)
+        self._use_annotation_store = self.config.get_bool("use_annotation_store", False)
+        self._compact_annotation_store = self.config.get_bool("compact_annotation_store", False)
 
     def run(self):
         """ Writes coco annotations in the following steps:
@@ -76,4 +88,6 @@ def run(self):
                                 segmap_output_key=self.segmap_output_key,
                                 segcolormap_output_key=self.segcolormap_output_key,
                                 rgb_output_key=self.rgb_output_key,
-                                label_mapping=label_mapping)
\ No newline at end of file
+                                label_mapping=label_mapping,
+                                use_annotation_store=self._use_annotation_store,
+                                compact_annotation_store=self._compact_annotation_store)
\ No newline at end of file
@@ -4,6 +4,7 @@
 SetupUtility.setup_pip(["h5py"])
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 import h5py
@@ -11,6 +12,7 @@
 
 from src.main.GlobalStorage import GlobalStorage
 from src.writer.WriterInterface import WriterInterface
+from src.utility.BackgroundWriter import BackgroundWriter
 from src.utility.Utility import Utility
 
 
@@ -31,8 +33,35 @@ class Hdf5Writer(WriterInterface):
             with already existing hdf5 files in the output directory. Default: False
           - bool
         * - compression
-          - The compression technique that should be used when storing data in a hdf5 file.
+          - The compression technique that should be used when storing data in a hdf5 file. Default: "gzip".
+            Available: ["gzip", "gzip:<level>", "lzf", "none"].
           - string
+        * - compression_per_key
+          - A dict, which maps output keys to the compression technique that should be used for them, e.g.
+            {"distance": "lzf", "normals": "lzf", "segmap": "gzip:9"}. All other keys use `compression`. Default: {}.
+          - dict
+        * - encoding_threads
+          - If bigger than zero, gzip compressed images are split into row chunks, which are compressed in parallel
+            by this amount of threads. Default: 0.
+          - int
+        * - container_path
+          - If given, all frames are appended to this one hdf5 container instead of writing one hdf5 file per frame,
+            see WriterUtility.save_to_hdf5_container(). A relative path is relative to the output directory. Several
+            runs can share the same container. Default: "".
+          - string
+        * - write_during_rendering
+          - If true, all per frame outputs of a renderer are written into the hdf5 files while the next frames are
+            rendered, instead of after all frames have been rendered. Outputs registered after the rendering (e.g. the
+            camera poses) and outputs with postprocessing modules are added to the same files when this module runs.
+            Not available together with container_path. Default: False.
+          - bool
+        * - writer_threads
+          - If write_during_rendering is set, the number of threads writing frames in parallel. Default: 1.
+          - int
+        * - max_pending_frames
+          - If write_during_rendering is set, the maximum amount of rendered frames, which wait for being written.
+            If the writer threads cannot keep up, the rendering waits. Default: 2.
+          - int
         * - delete_temporary_files_afterwards
           - True, if all temporary files should be deleted after merging. Default value: True.
           - bool
@@ -46,77 +75,193 @@ def __init__(self, config):
         WriterInterface.__init__(self, config)
         self._append_to_existing_output = self.config.get_bool("append_to_existing_output", False)
         self._output_dir = self._determine_output_dir(False)
+        self._compression = self.config.get_string("compression", "gzip")
+        self._compression_per_key = self.config.get_raw_dict("compression_per_key", {})
+        self._encoding_threads = self.config.get_int("encoding_threads", 0)
+        self._container_path = self.config.get_string("container_path", "")
+        if self._container_path:
+            self._container_path = os.path.join(self._output_dir, self._container_path)
+
+        self._frame_offset = None
+        self._executor = None
+        self._written_keys = set()
+        self._created_frames = set()
+        self._writer_threads = self.config.get_int("writer_threads", 1)
+        self._max_pending_frames = self.config.get_int("max_pending_frames", 2)
+        if self.config.get_bool("write_during_rendering", False) and not self._avoid_output \
+                and not self._container_path:
+            # The offset has to be fixed before the first frame is written
+            self._frame_offset = self._determine_frame_offset()
+            if self._encoding_threads > 0:
+                self._executor = ThreadPoolExecutor(max_workers=self._encoding_threads)
+            # The renderers create a background writer via this factory right before rendering
+            GlobalStorage.set("background_writer_factory", self._create_background_writer)
 
     def run(self):
         if self._avoid_output:
             print("Avoid output is on, no output produced!")
             return
 
+        if self._container_path:
+            self._write_to_container()
+            return
+
+        if not GlobalStorage.is_in_storage("output"):
+            print("No output was designed in prior models!")
+            return
+
+        if self._frame_offset is None:
+            self._frame_offset = self._determine_frame_offset()
+        if self._executor is None and self._encoding_threads > 0:
+            self._executor = ThreadPoolExecutor(max_workers=self._encoding_threads)
+
+        # Outputs, which have already been written during the rendering, are skipped
+        output_types = [output_type for output_type in GlobalStorage.get("output")
+                        if output_type["key"] not in self._written_keys]
+
+        # Go through all frames
+        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+            self._write_frame(frame, output_types, write_version=True)
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _determine_frame_offset(self) -> int:
+        """ Determines the number of the first hdf5 file written by this run.
+
+        :return: The offset, which is added to the frame numbers.
+        """
+        frame_offset = 0
         if self._append_to_existing_output:
-            frame_offset = 0
             # Look for hdf5 file with highest index
             for path in os.listdir(self._output_dir):
                 if path.endswith(".hdf5"):
                     index = path[:-len(".hdf5")]
                     if index.isdigit():
                         frame_offset = max(frame_offset, int(index) + 1)
-        else:
-            frame_offset = 0
+        return frame_offset
 
-        # Go through all frames
-        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+    def _create_background_writer(self) -> BackgroundWriter:
+        """ Creates a writer, which writes all per frame outputs of a renderer, while the frames are rendered.
 
-            # Create output hdf5 file
-            hdf5_path = os.path.join(self._output_dir, str(frame + frame_offset) + ".hdf5")
-            with h5py.File(hdf5_path, "w") as f:
-
-                if not GlobalStorage.is_in_storage("output"):
-                    print("No output was designed in prior models!")
-                    return
-                # Go through all the output types
-                print("Merging data for frame " + str(frame) + " into " + hdf5_path)
-
-                for output_type in GlobalStorage.get("output"):
-                    # Build path (path attribute is format string)
-                    file_path = output_type["path"]
-                    if '%' in file_path:
-                        file_path = file_path % frame
-
-                    # Check if file exists
-                    if not os.path.exists(file_path):
-                        # If not try stereo suffixes
-                        path_l, path_r = WriterUtility._get_stereo_path_pair(file_path)
-                        if not os.path.exists(path_l) or not os.path.exists(path_r):
-                            raise Exception("File not found: " + file_path)
-                        else:
-                            use_stereo = True
-                    else:
-                        use_stereo = False
+        This is called by the renderers, if write_during_rendering is set.
 
-                    if use_stereo:
-                        path_l, path_r = WriterUtility._get_stereo_path_pair(file_path)
+        :return: The background writer, which is handed to RendererUtility.render().
+        """
+        output_types = []
 
-                        img_l, new_key, new_version = self._load_and_postprocess(path_l, output_type["key"],
-                                                                                   output_type["version"])
-                        img_r, new_key, new_version = self._load_and_postprocess(path_r, output_type["key"],
-                                                                                   output_type["version"])
+        def collect_output_types():
+            # Called right before rendering, when the renderer has registered all its outputs
+            # Postprocessing modules may access blender data (e.g. the camera intrinsics), which is not allowed in the
+            # writer threads, so these outputs are loaded, postprocessed and written in run() instead
+            output_types.extend(output_type for output_type in GlobalStorage.get("output")
+                                if '%' in output_type["path"] and output_type["key"] not in self._written_keys
+                                and output_type["key"] not in self.postprocessing_modules_per_output)
+            self._written_keys.update(output_type["key"] for output_type in output_types)
 
-                        if self.config.get_bool("stereo_separate_keys", False):
-                            WriterUtility._write_to_hdf_file(f, new_key + "_0", img_l)
-                            WriterUtility._write_to_hdf_file(f, new_key + "_1", img_r)
-                        else:
-                            data = np.array([img_l, img_r])
-                            WriterUtility._write_to_hdf_file(f, new_key, data)
+        return BackgroundWriter(lambda frame: self._write_frame(frame, output_types),
+                                self._writer_threads, self._max_pending_frames, collect_output_types)
 
+    def _write_frame(self, frame: int, output_types: list, write_version: bool = False):
+        """ Writes the given outputs of one frame into the hdf5 file of this frame.
+
+        The first call per frame creates the hdf5 file, all later calls add their outputs to it.
+
+        :param frame: The number of the frame.
+        :param output_types: The registered outputs, which should be written.
+        :param write_version: If True, the version of BlenderProc is written as well.
+        """
+        # Create output hdf5 file
+        hdf5_path = os.path.join(self._output_dir, str(frame + self._frame_offset) + ".hdf5")
+        mode = "a" if frame in self._created_frames else "w"
+        self._created_frames.add(frame)
+        with h5py.File(hdf5_path, mode) as f:
+            # Go through all the output types
+            print("Merging data for frame " + str(frame) + " into " + hdf5_path)
+
+            for output_type in output_types:
+                # Build path (path attribute is format string)
+                file_path = output_type["path"]
+                if '%' in file_path:
+                    file_path = file_path % frame
+
+                # Check if file exists
+                if not os.path.exists(file_path):
+                    # If not try stereo suffixes
+                    path_l, path_r = WriterUtility._get_stereo_path_pair(file_path)
+                    if not os.path.exists(path_l) or not os.path.exists(path_r):
+                        raise Exception("File not found: " + file_path)
+                    else:
+                        use_stereo = True
+                else:
+                    use_stereo = False
+
+                if use_stereo:
+                    path_l, path_r = WriterUtility._get_stereo_path_pair(file_path)
+
+                    img_l, new_key, new_version = self._load_and_postprocess(path_l, output_type["key"],
+                                                                               output_type["version"])
+                    img_r, new_key, new_version = self._load_and_postprocess(path_r, output_type["key"],
+                                                                               output_type["version"])
+
+                    compression = self._compression_per_key.get(new_key, self._compression)
+                    if self.config.get_bool("stereo_separate_keys", False):
+                        WriterUtility._write_to_hdf_file(f, new_key + "_0", img_l, compression, self._executor)
+                        WriterUtility._write_to_hdf_file(f, new_key + "_1", img_r, compression, self._executor)
                     else:
-                        data, new_key, new_version = self._load_and_postprocess(file_path, output_type["key"],
-                                                                                output_type["version"])
+                        data = np.array([img_l, img_r])
+                        WriterUtility._write_to_hdf_file(f, new_key, data, compression, self._executor)
 
-                        WriterUtility._write_to_hdf_file(f, new_key, data)
+                else:
+                    data, new_key, new_version = self._load_and_postprocess(file_path, output_type["key"],
+                                                                            output_type["version"])
 
-                    WriterUtility._write_to_hdf_file(f, new_key + "_version", np.string_([new_version]))
+                    compression = self._compression_per_key.get(new_key, self._compression)
+                    WriterUtility._write_to_hdf_file(f, new_key, data, compression, self._executor)
 
+                WriterUtility._write_to_hdf_file(f, new_key + "_version", np.string_([new_version]))
+
+            if write_version:
                 blender_proc_version = Utility.get_current_version()
                 if blender_proc_version:
                     WriterUtility._write_to_hdf_file(f, "blender_proc_version", np.string_(blender_proc_version))
 
+    def _write_to_container(self):
+        """ Loads the registered outputs frame by frame and appends them to the hdf5 container. """
+        if not GlobalStorage.is_in_storage("output"):
+            print("No output was designed in prior models!")
+            return
+
+        WriterUtility.save_to_hdf5_container(self._container_path, self._iterate_frames(),
+                                             self.config.get_bool("stereo_separate_keys", False),
+                                             self._compression, self._compression_per_key)
+
+    def _iterate_frames(self):
+        """ Loads the registered outputs of one frame after the other.
+
+        :return: An iterator over dicts, which map each output key to the data of one frame.
+        """
+        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+            frame_data = {}
+            for output_type in GlobalStorage.get("output"):
+                file_path = output_type["path"]
+                if '%' in file_path:
+                    file_path = file_path % frame
+
+                if os.path.exists(file_path):
+                    data, new_key, new_version = self._load_and_postprocess(file_path, output_type["key"],
+                                                                            output_type["version"])
+                else:
+                    path_l, path_r = WriterUtility._get_stereo_path_pair(file_path)
+                    if not os.path.exists(path_l) or not os.path.exists(path_r):
+                        raise Exception("File not found: " + file_path)
+                    img_l, new_key, new_version = self._load_and_postprocess(path_l, output_type["key"],
+                                                                               output_type["version"])
+                    img_r, new_key, new_version = self._load_and_postprocess(path_r, output_type["key"],
+                                                                               output_type["version"])
+                    data = np.array([img_l, img_r])
+
+                frame_data[new_key] = data
+                frame_data[new_key + "_version"] = np.string_(new_version)
+            yield frame_data